@@ -1,55 +1,73 @@
 import argparse
 import multiprocessing
+import os
 import time
 import sys
 from threading import Thread
 
-import nltk
-import webview
-from dash import Dash, html, page_container
-from dash.dcc import Location
-from dash_bootstrap_components import NavbarSimple, NavItem, NavLink, themes
-from utils import database as db
+from utils.paths import data_dir
 
 PAGE_TITLE_BASE = "FysioPraxis"
 PAGE_TITLE_SEPERATOR = " - "
 
-app = Dash(
-    __name__,
-    title=PAGE_TITLE_BASE,
-    use_pages=True,
-    external_stylesheets=[themes.BOOTSTRAP],
-    # Remove errors due callbacks depending on unrendered DOM elements.
-    suppress_callback_exceptions=True,
+# State of the background callbacks, shared between the server and the
+# processes running them
+CALLBACK_CACHE_DIR = os.environ.get(
+    'CALLBACK_CACHE_DIR',
+    os.path.join(data_dir(), 'callback_cache')
 )
 
-app.layout = html.Div([
-    Location(id='url', refresh=True),
-    NavbarSimple(
-        children=[
-            NavItem(NavLink("Grafieken", href="/grafieken")),
-            NavItem(NavLink("Pagina Resultaten", href="/pagina_resultaten")),
-            NavItem(NavLink("PDF's", href="/pdf_beheren")),
-            NavItem(NavLink("Woorden", href="/woorden_beheren")),
-            NavItem(NavLink("Help", href="/help")),
-        ],
-        brand=html.Span([
-            html.Img(
-                src='/assets/book-svgrepo-com(3).svg',
-                height="50px",
-                style={'marginRight': '10px'}
-            ),
-            "FysioPraxis Analyse Platform"
-        ]),
-        brand_href="/",
-        color="primary",
-        dark=True,
-    ),
-    page_container,
-])
-
-
-def register_callbacks():
+
+def create_app():
+    # Dash is imported here instead of at the top of the file: worker
+    # processes re-import this file, and must not build the app or import
+    # every page (and the topic models behind them).
+    import diskcache
+    from dash import Dash, DiskcacheManager, html, page_container
+    from dash.dcc import Location
+    from dash_bootstrap_components import NavbarSimple, NavItem, NavLink, themes
+
+    app = Dash(
+        __name__,
+        title=PAGE_TITLE_BASE,
+        use_pages=True,
+        external_stylesheets=[themes.BOOTSTRAP],
+        background_callback_manager=DiskcacheManager(
+            diskcache.Cache(CALLBACK_CACHE_DIR)
+        ),
+        # Remove errors due callbacks depending on unrendered DOM elements.
+        suppress_callback_exceptions=True,
+    )
+
+    app.layout = html.Div([
+        Location(id='url', refresh=True),
+        NavbarSimple(
+            children=[
+                NavItem(NavLink("Grafieken", href="/grafieken")),
+                NavItem(NavLink("Pagina Resultaten", href="/pagina_resultaten")),
+                NavItem(NavLink("PDF's", href="/pdf_beheren")),
+                NavItem(NavLink("Woorden", href="/woorden_beheren")),
+                NavItem(NavLink("Help", href="/help")),
+            ],
+            brand=html.Span([
+                html.Img(
+                    src='/assets/book-svgrepo-com(3).svg',
+                    height="50px",
+                    style={'marginRight': '10px'}
+                ),
+                "FysioPraxis Analyse Platform"
+            ]),
+            brand_href="/",
+            color="primary",
+            dark=True,
+        ),
+        page_container,
+    ])
+
+    return app
+
+
+def register_callbacks(app):
     from pages.magazine import register_magazine_callbacks
     register_magazine_callbacks(app)
     from pages.dashboard import register_dashboard_callbacks
@@ -64,10 +82,10 @@ def register_callbacks():
 
 if __name__ == '__main__':
     if hasattr(sys, 'frozen'):
+        # Frozen worker processes start here, before any heavy import
         multiprocessing.freeze_support()
 
-    register_callbacks()
-    nltk.download('stopwords')
+    from utils import database as db
 
     # Parse command line arguments
     parser = argparse.ArgumentParser()
@@ -76,10 +94,32 @@ if __name__ == '__main__':
         action='store_true',
         help='Run in debug mode with no webview'
     )
+    parser.add_argument(
+        '--compact-db',
+        action='store_true',
+        help='Compress the stored page texts and shrink the database file, '
+             'then exit (close the app first)'
+    )
     args = parser.parse_args()
 
+    if args.compact_db:
+        before, after = db.compact_database()
+        print(
+            f"Database compacted: {before:,} -> {after:,} bytes, "
+            f"{before - after:,} bytes saved."
+        )
+        sys.exit()
+
+    import nltk
+    import webview
+
+    # The schema is upgraded before the pages are imported and read from it
+    nltk.download('stopwords')
     db.init_db(args.debug)
 
+    app = create_app()
+    register_callbacks(app)
+
     if args.debug:
         print("Debug mode enabled, webview is disabled.")
         app.run(debug=True)
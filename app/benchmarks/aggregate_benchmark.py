@@ -0,0 +1,138 @@
+"""
+Complexity chart reads summing the paragraph scores on every call against
+the score aggregates stored on Page and MagazineSummary.
+
+The corpus is ingested with write_page_batches, which stores the aggregates
+together with the paragraphs. Both reads are checked to give the same
+numbers before the timings are reported.
+
+Run from the app folder:
+    python -m benchmarks.aggregate_benchmark --magazines 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+from utils import database as db
+from utils.complexity import Lexicon
+
+from .corpus import create_benchmark_engine, generate_magazines
+
+
+def summed_page_complexity(magazine_ids):
+    with Session(db.DB_READ_ENGINE) as session:
+        return session.execute(
+            select(
+                db.Page.magazine_id,
+                db.Page.page_number,
+                func.coalesce(func.sum(db.Paragraph.score), 0),
+                func.coalesce(func.sum(
+                    case((db.Paragraph.score > 0, db.Paragraph.score), else_=0)
+                ), 0),
+                func.coalesce(func.sum(
+                    case((db.Paragraph.score < 0, db.Paragraph.score), else_=0)
+                ), 0)
+            )
+            .outerjoin(db.Paragraph, db.Paragraph.page_id == db.Page.id)
+            .where(db.Page.magazine_id.in_(magazine_ids))
+            .group_by(db.Page.id)
+            .order_by(db.Page.magazine_id, db.Page.page_number)
+        ).all()
+
+
+def summed_magazine_complexity(magazine_ids):
+    with Session(db.DB_READ_ENGINE) as session:
+        return dict(session.execute(
+            select(
+                db.Page.magazine_id,
+                func.coalesce(func.sum(db.Paragraph.score), 0)
+            )
+            .outerjoin(db.Paragraph, db.Paragraph.page_id == db.Page.id)
+            .where(db.Page.magazine_id.in_(magazine_ids))
+            .group_by(db.Page.magazine_id)
+        ).all())
+
+
+def seed(engine, magazines, pages):
+    with Session(engine) as session:
+        lexicon = Lexicon.from_session(session)
+
+    for i, magazine in enumerate(generate_magazines(magazines, pages)):
+        magazine_id = db.create_magazine(f"hash-{i}", {}, f"magazine-{i}.pdf")
+        db.add_magazine_pages(
+            magazine_id,
+            [
+                (page_number, [' '.join(p) for p in page], page)
+                for page_number, page in enumerate(magazine, start=1)
+            ],
+            lexicon
+        )
+
+
+def comparable(result):
+    # Rows are compared as plain tuples, dicts as they are
+    return [tuple(row) for row in result] if isinstance(result, list) else result
+
+
+def time_read(read, magazine_ids, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read(magazine_ids)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--magazines', type=int, default=200)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    engine = create_benchmark_engine(path)
+    db.DB_ENGINE = engine
+    db.DB_READ_ENGINE = engine
+
+    start = time.perf_counter()
+    seed(engine, args.magazines, args.pages)
+    seed_seconds = time.perf_counter() - start
+
+    all_ids = list(range(1, args.magazines + 1))
+    two_ids = random.Random(0).sample(all_ids, 2)
+    reads = {
+        'page chart, 2 magazines': (
+            summed_page_complexity, db.page_complexity, two_ids
+        ),
+        'magazine chart, 2 magazines': (
+            summed_magazine_complexity, db.magazine_complexity, two_ids
+        ),
+        'magazine chart, all magazines': (
+            summed_magazine_complexity, db.magazine_complexity, all_ids
+        ),
+    }
+
+    print(
+        f"{args.magazines} magazines, {args.magazines * args.pages} pages "
+        f"ingested in {seed_seconds:.1f}s"
+    )
+    print(f"{'read':<32}{'summed':>12}{'stored':>12}{'speedup':>10}")
+    for name, (summed, stored, magazine_ids) in reads.items():
+        assert comparable(summed(magazine_ids)) == \
+            comparable(stored(magazine_ids)), name
+
+        before = time_read(summed, magazine_ids, args.repeat)
+        after = time_read(stored, magazine_ids, args.repeat)
+        print(
+            f"{name:<32}{before * 1000:10.2f}ms{after * 1000:10.2f}ms"
+            f"{before / after:9.1f}x"
+        )
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
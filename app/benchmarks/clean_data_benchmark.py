@@ -0,0 +1,113 @@
+"""
+Throughput of pdf_processing.clean_data against the previous
+character-by-character implementation. tests/test_clean_data.py checks the
+output against the one recorded with that implementation.
+
+Run from the app folder:
+    python -m benchmarks.clean_data_benchmark --pages 5000
+"""
+import argparse
+import random
+import re
+import time
+
+from unidecode import unidecode
+from utils import pdf_processing as pdf
+
+from .corpus import FILLER_WORDS, load_asset_words
+
+
+def legacy_clean_data(page_text):
+    bad_chars = (',', '.', '!', '?', ':', '"', '(', ')', '')
+    cleaned_page_text = []
+    numeric_regex = re.compile(r'\b\d+\b')
+    merge_next_word = False
+    next_word = ''
+
+    for paragraph in page_text:
+        cleaned_paragraph = []
+
+        for word in paragraph:
+            word = word.lower()
+            word = unidecode(word)
+
+            if numeric_regex.search(word):
+                continue
+
+            if 'www' in word or '@' in word:
+                continue
+
+            if word.startswith("'") and not word.endswith("'"):
+                word = word[1:]
+
+            if word.endswith("'") and not word.startswith("'"):
+                word = word[:-1]
+
+            cleaned_word = ''.join(
+                char for char in word if char not in bad_chars
+            )
+
+            if merge_next_word:
+                cleaned_word = next_word + cleaned_word
+                merge_next_word = False
+            elif len(cleaned_word) == 1:
+                continue
+
+            if word.endswith('-'):
+                next_word = cleaned_word[:-1]
+                merge_next_word = True
+            else:
+                if cleaned_word:
+                    cleaned_paragraph.append(cleaned_word)
+
+        if cleaned_paragraph:
+            cleaned_page_text.append(cleaned_paragraph)
+
+    return cleaned_page_text
+
+
+def generate_raw_pages(pages, paragraphs=8, words=60, seed=7):
+    rng = random.Random(seed)
+    lexicon_words = [word['word'] for word in load_asset_words('wordlist.json')]
+    vocabulary = (
+        [word.capitalize() for word in FILLER_WORDS] * 4
+        + [word + ',' for word in FILLER_WORDS] * 2
+        + FILLER_WORDS * 8 + lexicon_words
+    )
+
+    return [
+        [
+            [rng.choice(vocabulary) for _ in range(rng.randint(0, words))]
+            for _ in range(paragraphs)
+        ]
+        for _ in range(pages)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=5000)
+    args = parser.parse_args()
+
+    raw_pages = generate_raw_pages(args.pages)
+    tokens = sum(len(paragraph) for page in raw_pages for paragraph in page)
+
+    start = time.perf_counter()
+    for page in raw_pages:
+        legacy_clean_data(page)
+    legacy_time = time.perf_counter() - start
+
+    pdf.normalise_word.cache_clear()
+    start = time.perf_counter()
+    for page in raw_pages:
+        pdf.clean_data(page)
+    new_time = time.perf_counter() - start
+
+    print(f"{len(raw_pages)} pages, {tokens} tokens")
+    print(f"Legacy clean_data : {tokens / legacy_time:12,.0f} tokens/s")
+    print(f"clean_data        : {tokens / new_time:12,.0f} tokens/s "
+          f"({legacy_time / new_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
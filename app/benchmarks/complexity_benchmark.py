@@ -0,0 +1,105 @@
+"""
+Per-paragraph scoring cost of calc_complexity, before and after compiling
+the Wordlist into a Lexicon.
+
+Run from the app folder:
+    python -m benchmarks.complexity_benchmark --magazines 300
+"""
+import argparse
+import time
+
+from sqlalchemy.orm import Session
+from utils import database as db
+from utils.complexity import Lexicon, calc_complexity
+
+from .corpus import create_benchmark_engine, generate_magazines
+
+
+def legacy_calc_complexity(session, split_text):
+    """The previous implementation: three Wordlist queries per paragraph."""
+    antonyms = {word.word for word in session.query(db.WordObject.word).filter(db.WordObject.type == 3)}
+    reductionistic_words = {word.word: {'gewicht': word.weight, 'frequentie': 0} for word in
+                            session.query(db.WordObject).filter(db.WordObject.type == 1)}
+    complex_words = {word.word: {'gewicht': word.weight, 'frequentie': 0} for word in
+                     session.query(db.WordObject).filter(db.WordObject.type == 2)}
+
+    complex_count = 0
+    reductionistic_count = 0
+
+    for i in range(1, len(split_text)):
+        current_word = split_text[i]
+        previous_word = split_text[i - 1]
+
+        if current_word in reductionistic_words:
+            gewicht = reductionistic_words[current_word]['gewicht']
+            if gewicht > 0:
+                if previous_word in antonyms:
+                    complex_count += gewicht
+                else:
+                    reductionistic_count += gewicht
+                reductionistic_words[current_word]['frequentie'] += 1
+
+        elif current_word in complex_words:
+            gewicht = complex_words[current_word]['gewicht']
+            if gewicht > 0:
+                if previous_word in antonyms:
+                    reductionistic_count += gewicht
+                else:
+                    complex_count += gewicht
+                complex_words[current_word]['frequentie'] += 1
+
+    filtered_word_frequencies = {
+        word: {'frequentie': data['frequentie'], 'gewicht': data['gewicht']}
+        for word, data in {**reductionistic_words, **complex_words}.items()
+        if data['frequentie'] > 0
+    }
+
+    return int(complex_count - reductionistic_count), filtered_word_frequencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--magazines', type=int, default=300)
+    parser.add_argument(
+        '--legacy-sample',
+        type=int,
+        default=2000,
+        help='Number of paragraphs scored with the legacy implementation'
+    )
+    args = parser.parse_args()
+
+    engine = create_benchmark_engine()
+    paragraphs = [
+        paragraph
+        for magazine in generate_magazines(args.magazines)
+        for page in magazine
+        for paragraph in page
+    ]
+    sample = paragraphs[:args.legacy_sample]
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        legacy_results = [legacy_calc_complexity(session, p) for p in sample]
+        legacy_cost = (time.perf_counter() - start) / len(sample)
+
+        start = time.perf_counter()
+        lexicon = Lexicon.from_session(session)
+        compiled_results = [calc_complexity(lexicon, p) for p in paragraphs]
+        compiled_total = time.perf_counter() - start
+
+    assert compiled_results[:len(sample)] == legacy_results, \
+        'compiled lexicon scores differ from the legacy implementation'
+
+    compiled_cost = compiled_total / len(paragraphs)
+
+    print(f"Corpus: {args.magazines} magazines, {len(paragraphs)} paragraphs")
+    print(f"Legacy   : {legacy_cost * 1e6:10.1f} us/paragraph "
+          f"(sample of {len(sample)})")
+    print(f"Compiled : {compiled_cost * 1e6:10.1f} us/paragraph "
+          f"(full corpus in {compiled_total:.2f}s, lexicon build included)")
+    print(f"Speed-up : {legacy_cost / compiled_cost:10.1f}x")
+    print(f"Legacy full-corpus estimate: {legacy_cost * len(paragraphs):.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Synthetic corpus helpers shared by the benchmark scripts.
+
+The generated text mixes words from the shipped word lists with filler
+tokens, so scoring and filtering hit roughly the same ratio of lexicon
+words as real FysioPraxis pages.
+"""
+import json
+import os
+import random
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from utils import database as db
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets')
+
+FILLER_WORDS = [
+    'patient', 'behandeling', 'onderzoek', 'klachten', 'praktijk', 'zorg',
+    'oefeningen', 'pijn', 'beweging', 'resultaten', 'studie', 'rug', 'knie',
+    'schouder', 'functie', 'herstel', 'belasting', 'training', 'sport',
+    'richtlijn', 'diagnose', 'interventie', 'effect', 'kwaliteit', 'team',
+]
+
+
+def load_asset_words(filename):
+    with open(os.path.join(ASSETS_DIR, filename), 'r') as f:
+        return json.load(f)['words_data']
+
+
+def generate_magazines(magazines, pages=40, paragraphs=8, words=60, seed=42):
+    """Yields magazines as lists of pages of paragraphs of tokens."""
+    rng = random.Random(seed)
+    lexicon_words = [word['word'] for word in load_asset_words('wordlist.json')]
+    vocabulary = FILLER_WORDS * 8 + lexicon_words
+
+    for _ in range(magazines):
+        yield [
+            [
+                [rng.choice(vocabulary) for _ in range(words)]
+                for _ in range(paragraphs)
+            ]
+            for _ in range(pages)
+        ]
+
+
+def create_benchmark_engine(path=None, pragmas=None):
+    """
+    Creates a scratch database seeded with the shipped word lists, a file
+    database uses the engine profile of the app unless `pragmas` are given.
+    """
+    engine = (
+        db.create_db_engine(path, pragmas=pragmas) if path
+        else create_engine('sqlite://')
+    )
+    db.SQLAlchemyBaseClass.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        session.add_all(
+            db.WordObject(word=w['word'], type=w['type'], weight=w['weight'])
+            for w in load_asset_words('wordlist.json')
+        )
+        session.add_all(
+            db.BadWord(word=w['word'])
+            for w in load_asset_words('badwordlist.json')
+        )
+        session.commit()
+
+    return engine
+
+
+def generate_pdf(pages=40, paragraphs=6, lines=6, words=10, seed=42):
+    """Builds an uncompressed PDF with plain Helvetica text paragraphs."""
+    rng = random.Random(seed)
+    lexicon_words = [word['word'] for word in load_asset_words('wordlist.json')]
+    vocabulary = FILLER_WORDS * 8 + lexicon_words
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Title (Benchmark) /CreationDate (D:20240101120000+01'00') >>",
+    ]
+    page_ids = []
+
+    for _ in range(pages):
+        content = [b"BT /F1 9 Tf 11 TL"]
+        y = 800
+        for _ in range(paragraphs):
+            content.append(f"1 0 0 1 50 {y} Tm".encode())
+            for _ in range(lines):
+                line = ' '.join(rng.choice(vocabulary) for _ in range(words))
+                content.append(f"({line}) Tj T*".encode())
+            y -= lines * 11 + 24
+        content.append(b"ET")
+        stream = b"\n".join(content)
+
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream
+            + b"\nendstream"
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (len(objects))
+        )
+        page_ids.append(len(objects))
+
+    objects[1] = (
+        b"<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids))
+    )
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += (
+        b"trailer\n<< /Size %d /Root 1 0 R /Info 4 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref_offset)
+    )
+
+    return bytes(output)
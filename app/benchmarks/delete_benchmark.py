@@ -0,0 +1,131 @@
+"""
+Deleting magazines the way the magazine table did, loading every magazine
+and deleting it through the ORM cascade, against delete_magazines.
+
+Both run on a copy of the same ingested database. Afterwards the remaining
+rows of both copies are compared, and the copy of delete_magazines is
+checked to have no rows left of the deleted magazines.
+
+Run from the app folder:
+    python -m benchmarks.delete_benchmark --magazines 60 --delete 50
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.orm import Session
+from utils import database as db
+from utils.complexity import Lexicon
+
+from .corpus import create_benchmark_engine, generate_magazines
+
+TABLES = [db.Magazine, db.MagazineSummary, db.Page, db.Paragraph, db.WordOccurrence]
+
+
+def seed(path, magazines, pages):
+    engine = create_benchmark_engine(path)
+    db.DB_ENGINE = engine
+
+    with Session(engine) as session:
+        lexicon = Lexicon.from_session(session)
+
+    for i, magazine in enumerate(generate_magazines(magazines, pages)):
+        magazine_id = db.create_magazine(f"hash-{i}", {}, f"magazine-{i}.pdf")
+        db.add_magazine_pages(
+            magazine_id,
+            [
+                (page_number, [' '.join(p) for p in page], page)
+                for page_number, page in enumerate(magazine, start=1)
+            ],
+            lexicon
+        )
+
+    with engine.connect() as connection:
+        connection.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+    engine.dispose()
+
+
+def delete_per_row(session, magazine_ids):
+    for magazine_id in magazine_ids:
+        magazine = session.query(db.Magazine).filter_by(id=magazine_id).first()
+        session.delete(magazine)
+    session.commit()
+
+
+def delete_in_bulk(session, magazine_ids):
+    db.delete_magazines(session.connection(), magazine_ids)
+    session.commit()
+
+
+def run(path, delete, magazine_ids):
+    engine = db.create_db_engine(path)
+    statements = []
+    event.listen(
+        engine,
+        'before_cursor_execute',
+        lambda *args: statements.append(args[2])
+    )
+
+    start = time.perf_counter()
+    with Session(engine) as session:
+        delete(session, magazine_ids)
+    seconds = time.perf_counter() - start
+
+    with engine.connect() as connection:
+        counts = {
+            table.__tablename__: connection.execute(
+                select(func.count()).select_from(table)
+            ).scalar()
+            for table in TABLES
+        }
+        orphans = connection.execute(
+            select(func.count())
+            .select_from(db.WordOccurrence)
+            .where(db.WordOccurrence.page_id.not_in(select(db.Page.id)))
+        ).scalar()
+
+    engine.dispose()
+    return seconds, len(statements), counts, orphans
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--magazines', type=int, default=60)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--delete', type=int, default=50)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'benchmark.db')
+    seed(path, args.magazines, args.pages)
+    magazine_ids = list(range(1, args.delete + 1))
+
+    results = {}
+    for name, delete in (('per row', delete_per_row), ('bulk', delete_in_bulk)):
+        copy = os.path.join(directory, f"{name.replace(' ', '_')}.db")
+        shutil.copy(path, copy)
+        results[name] = run(copy, delete, magazine_ids)
+
+    _, _, row_counts, _ = results['per row']
+    _, _, bulk_counts, bulk_orphans = results['bulk']
+    assert bulk_orphans == 0, 'word index rows of deleted pages are left'
+    for table in ('Magazine', 'Page', 'Paragraph'):
+        assert row_counts[table] == bulk_counts[table], table
+
+    print(
+        f"deleting {args.delete} of {args.magazines} magazines "
+        f"of {args.pages} pages"
+    )
+    for name, (seconds, statements, counts, orphans) in results.items():
+        print(
+            f"{name:<8} {seconds * 1000:9.1f} ms  {statements:6} statements  "
+            f"{orphans:7} orphaned word index rows  "
+            f"{counts['MagazineSummary']} summaries left"
+        )
+
+
+if __name__ == '__main__':
+    main()
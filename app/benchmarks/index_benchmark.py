@@ -0,0 +1,134 @@
+"""
+Lookup query timings on a large corpus without secondary indexes and after
+upgrade_schema has created them.
+
+The corpus is written straight into the tables, with small pages, since only
+the lookups are measured. The word index rows are left out, its indexes
+predate this benchmark.
+
+Run from the app folder:
+    python -m benchmarks.index_benchmark --magazines 1000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import func, insert, inspect, select, text
+from utils import database as db
+
+from .corpus import create_benchmark_engine
+
+QUERIES = {
+    'duplicate check (Magazine.hash)': lambda ids: (
+        select(db.Magazine.id, db.Magazine.page_count)
+        .where(db.Magazine.hash == f"hash-{ids[0]}")
+    ),
+    'pages of 2 magazines (Page.magazine_id)': lambda ids: (
+        select(db.Page.id, db.Page.page_number, db.Page.page_topic)
+        .where(db.Page.magazine_id.in_(ids[:2]))
+        .order_by(db.Page.magazine_id, db.Page.page_number)
+    ),
+    'stored page numbers (resume)': lambda ids: (
+        select(db.Page.page_number).where(db.Page.magazine_id == ids[0])
+    ),
+    'stored page counts of 8 magazines': lambda ids: (
+        select(db.Page.magazine_id, func.count(db.Page.id))
+        .where(db.Page.magazine_id.in_(ids[:8]))
+        .group_by(db.Page.magazine_id)
+    ),
+    'complex words (Wordlist.type)': lambda ids: (
+        select(db.WordObject.word, db.WordObject.weight)
+        .where(db.WordObject.type == '2')
+    ),
+}
+
+
+def seed(engine, magazines, pages, paragraphs):
+    rng = random.Random(42)
+    raw_text = db.encode_raw_text([' '.join(['woord'] * 20)] * paragraphs)
+
+    with engine.begin() as connection:
+        connection.execute(insert(db.Magazine), [
+            {'name': f"magazine-{i}.pdf", 'hash': f"hash-{i}", 'page_count': pages}
+            for i in range(1, magazines + 1)
+        ])
+        # Pages of several magazines are interleaved, as with parallel ingestion
+        rows = [
+            {
+                'magazine_id': magazine_id,
+                'page_number': page_number,
+                'raw_text': raw_text,
+                'page_topic': json.dumps('onderwerp'),
+                'scored_version': 1,
+            }
+            for page_number in range(1, pages + 1)
+            for magazine_id in range(1, magazines + 1)
+        ]
+        rng.shuffle(rows)
+        connection.execute(insert(db.Page), rows)
+
+
+def drop_secondary_indexes(engine):
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in ('Magazine', 'Page', 'Wordlist'):
+            for index in inspector.get_indexes(table):
+                connection.execute(text(f'DROP INDEX "{index["name"]}"'))
+        connection.execute(text('ANALYZE'))
+
+
+def time_queries(engine, magazines, repeat):
+    rng = random.Random(0)
+    timings = {}
+
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                ids = rng.sample(range(1, magazines + 1), 8)
+                connection.execute(query(ids)).all()
+            timings[name] = (time.perf_counter() - start) / repeat
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--magazines', type=int, default=1000)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--paragraphs', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    engine = create_benchmark_engine(path)
+    seed(engine, args.magazines, args.pages, args.paragraphs)
+    drop_secondary_indexes(engine)
+
+    before = time_queries(engine, args.magazines, args.repeat)
+
+    start = time.perf_counter()
+    db.upgrade_schema(engine)
+    upgrade_seconds = time.perf_counter() - start
+
+    after = time_queries(engine, args.magazines, args.repeat)
+
+    print(
+        f"{args.magazines} magazines, {args.magazines * args.pages} pages, "
+        f"schema upgrade {upgrade_seconds:.2f}s"
+    )
+    print(f"{'query':<42}{'before':>12}{'after':>12}{'speedup':>10}")
+    for name in QUERIES:
+        print(
+            f"{name:<42}{before[name] * 1000:10.2f}ms{after[name] * 1000:10.2f}ms"
+            f"{before[name] / after[name]:9.1f}x"
+        )
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Sustained ingestion throughput with every worker committing its own page
+batches against the single PageWriter that group-commits them.
+
+Workers score and store pre-extracted pages, so the benchmark measures the
+scoring and write path without the PDF layout analysis in front of it.
+
+Run from the app folder:
+    python -m benchmarks.page_writer_benchmark --workers 1 4 16
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from utils import database as db
+from utils.ingestion import JOB_OK, IngestionScheduler, send_output
+from utils.ingestion_worker import get_worker_context
+from utils.page_writer import PageWriter
+
+from .corpus import create_benchmark_engine, generate_magazines
+
+
+def use_database(path):
+    """Points the database module of a worker process at the benchmark file."""
+    if str(db.DB_ENGINE.url) != f"sqlite:///{path}":
+        db.DB_ENGINE = db.create_db_engine(path)
+
+
+def store_pages(path, magazine_id, pages, single_writer):
+    use_database(path)
+    db.add_magazine_pages(
+        magazine_id,
+        pages,
+        write_batch=send_output if single_writer else None
+    )
+    return JOB_OK
+
+
+def build_jobs(path, magazines, single_writer):
+    jobs = []
+
+    for i, magazine in enumerate(magazines):
+        magazine_id = db.create_magazine(f"hash-{i}", {}, f"magazine-{i}.pdf")
+        pages = [
+            (page_number, [' '.join(p) for p in page], page)
+            for page_number, page in enumerate(magazine, start=1)
+        ]
+        jobs.append((f"magazine-{i}", (path, magazine_id, pages, single_writer)))
+
+    return jobs
+
+
+def run(workers, magazines, pages, single_writer):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'benchmark.db')
+    create_benchmark_engine(path).dispose()
+    use_database(path)
+
+    jobs = build_jobs(
+        path,
+        generate_magazines(magazines, pages, seed=workers),
+        single_writer
+    )
+
+    writer = PageWriter()
+    scheduler = IngestionScheduler(
+        store_pages,
+        workers=workers,
+        timeout=600,
+        context=get_worker_context(),
+        output_callback=writer.put if single_writer else None
+    )
+
+    with writer:
+        start = time.perf_counter()
+        results = scheduler.run(jobs)
+        writer.flush()
+        seconds = time.perf_counter() - start
+
+    with Session(db.DB_ENGINE) as session:
+        stored = session.scalar(select(func.count(db.Page.id)))
+
+    failed = [result for result in results if result.status != JOB_OK]
+    commits = writer.commits if single_writer else stored // db.PAGE_BATCH_SIZE
+
+    print(
+        f"{'single writer' if single_writer else 'direct writes':<14} "
+        f"{workers:3d} workers: {stored / seconds:8,.0f} pages/s   "
+        f"{stored:6d}/{magazines * pages} pages stored   "
+        f"~{commits:5d} commits   {len(failed)} failed jobs"
+    )
+    for result in failed[:3]:
+        print(f"    {result.name}: {result.detail}")
+
+    db.DB_ENGINE.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--magazines', type=int, default=32)
+    parser.add_argument('--pages', type=int, default=48)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cpus, {args.magazines} magazines of {args.pages} pages")
+    for workers in args.workers:
+        for single_writer in (False, True):
+            run(workers, args.magazines, args.pages, single_writer)
+
+
+if __name__ == '__main__':
+    main()
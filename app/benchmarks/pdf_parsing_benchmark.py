@@ -0,0 +1,71 @@
+"""
+Ingestion parsing cost of one parse per PDF versus the previous three
+passes (extractability check, extract_pages and a metadata parse).
+
+Run from the app folder:
+    python -m benchmarks.pdf_parsing_benchmark --pages 200
+"""
+import argparse
+import time
+from io import BytesIO
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfparser import PDFParser
+from utils import pdf_processing as pdf
+
+from .corpus import generate_pdf
+
+
+def legacy_parse(stream):
+    stream.seek(0)
+    document = PDFDocument(PDFParser(stream))
+    assert document.is_extractable
+
+    pages = [
+        pdf.extract_layout_text(page_layout)
+        for page_layout in extract_pages(stream, laparams=LAParams())
+    ]
+
+    stream.seek(0)
+    metadata = pdf.decode_metadata(PDFDocument(PDFParser(stream)).info)
+
+    return pages, metadata
+
+
+def single_parse(stream):
+    document = pdf.ParsedPdf(stream)
+    return list(pdf.iter_page_texts(document)), document.metadata
+
+
+def best_of(repeats, function, *args):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    stream = BytesIO(generate_pdf(pages=args.pages))
+    print(f"PDF: {args.pages} pages, {len(stream.getvalue()) / 1e6:.1f} MB")
+
+    legacy_time, legacy_result = best_of(args.repeats, legacy_parse, stream)
+    single_time, single_result = best_of(args.repeats, single_parse, stream)
+
+    assert legacy_result == single_result, 'single parse output differs'
+
+    print(f"Three passes : {legacy_time:8.2f}s")
+    print(f"Single parse : {single_time:8.2f}s "
+          f"({(1 - single_time / legacy_time) * 100:.1f}% saved)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Size of the page raw text stored as JSON text against zlib compressed JSON,
+and the time to load Page objects with and without their raw text.
+
+The pages are written in the format of the versions before compression and
+compacted with compact_database, as an existing database would be. The
+synthetic corpus repeats a small vocabulary, so it compresses better than
+real text does. The raw text of every page is compared with the original
+after compacting.
+
+Run from the app folder:
+    python -m benchmarks.raw_text_benchmark --magazines 100
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import Session, undefer
+from utils import database as db
+
+from .corpus import create_benchmark_engine, generate_magazines
+
+
+def seed(engine, magazines, pages):
+    raw_texts = [
+        json.dumps([' '.join(paragraph) for paragraph in page])
+        for magazine in generate_magazines(magazines, pages)
+        for page in magazine
+    ]
+
+    with engine.begin() as connection:
+        connection.execute(insert(db.Magazine), [
+            {'name': f"magazine-{i}.pdf", 'hash': f"hash-{i}", 'page_count': pages}
+            for i in range(1, magazines + 1)
+        ])
+        # Written as text, the way the versions before compression stored it
+        connection.execute(
+            text(
+                'INSERT INTO "Page" (magazine_id, page_number, raw_text) '
+                'VALUES (:magazine_id, :page_number, :raw_text)'
+            ),
+            [
+                {
+                    'magazine_id': i // pages + 1,
+                    'page_number': i % pages + 1,
+                    'raw_text': raw_text
+                }
+                for i, raw_text in enumerate(raw_texts)
+            ]
+        )
+
+    # Only the database file itself is compared, not the write-ahead log
+    with engine.connect() as connection:
+        connection.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+
+    return raw_texts
+
+
+def load_pages(engine, options=()):
+    start = time.perf_counter()
+    with Session(engine) as session:
+        pages = session.scalars(select(db.Page).options(*options)).all()
+    return len(pages), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--magazines', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=40)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    engine = create_benchmark_engine(path)
+    raw_texts = seed(engine, args.magazines, args.pages)
+
+    text_count, text_seconds = load_pages(engine, [undefer(db.Page.raw_text)])
+    before, after = db.compact_database(engine)
+    compressed_count, compressed_seconds = load_pages(
+        engine, [undefer(db.Page.raw_text)]
+    )
+    deferred_count, deferred_seconds = load_pages(engine)
+
+    with Session(engine) as session:
+        stored = session.scalars(select(db.Page.raw_text).order_by(db.Page.id))
+        assert [db.decode_raw_text(value) for value in stored] == \
+            [json.loads(raw_text) for raw_text in raw_texts], 'raw text differs'
+    assert text_count == compressed_count == deferred_count
+
+    print(f"{len(raw_texts)} pages")
+    print(f"database before compacting        {before / 2**20:8.1f} MiB")
+    print(f"database after compacting         {after / 2**20:8.1f} MiB")
+    print(f"saved                             {(before - after) / 2**20:8.1f} MiB")
+    print(f"load pages with text raw_text     {text_seconds:8.3f}s")
+    print(f"load pages with zlib raw_text     {compressed_seconds:8.3f}s")
+    print(f"load pages with deferred raw_text {deferred_seconds:8.3f}s")
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
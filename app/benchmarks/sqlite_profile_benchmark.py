@@ -0,0 +1,163 @@
+"""
+Dashboard reads during ingestion, with the SQLite defaults against the engine
+profile of utils.database (WAL, busy timeout, larger cache, mmap).
+
+A writer process commits page batches the way the ingestion writer does,
+while reader threads (the Dash request threads) load the page complexity of
+a random magazine. Reported are the read latencies, reads that failed on a
+locked database and the pages the writer committed in the meantime.
+
+Run from the app folder:
+    python -m benchmarks.sqlite_profile_benchmark --readers 4 --seconds 10
+"""
+import argparse
+import copy
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+from threading import Thread
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from utils import database as db
+from utils.complexity import Lexicon
+
+from .corpus import create_benchmark_engine, generate_magazines
+
+# Connection settings of the previous `create_engine('sqlite:///bigdata.db')`
+SQLITE_DEFAULTS = {}
+
+
+def page_batch(engine, magazine_id, magazine):
+    """Scores the pages of a magazine as the ingestion workers do."""
+    with Session(engine) as session:
+        lexicon = Lexicon.from_session(session)
+
+    return db.build_page_batch(
+        magazine_id,
+        [
+            (page_number, [' '.join(p) for p in page], page)
+            for page_number, page in enumerate(magazine, start=1)
+        ],
+        lexicon
+    )
+
+
+def seed(path, pragmas, magazines, pages):
+    engine = create_benchmark_engine(path, pragmas)
+    db.DB_ENGINE = engine
+
+    for i, magazine in enumerate(generate_magazines(magazines, pages)):
+        with engine.begin() as connection:
+            magazine_id = connection.execute(
+                insert(db.Magazine).values(name=f"magazine-{i}.pdf")
+            ).inserted_primary_key[0]
+        db.write_page_batch(page_batch(engine, magazine_id, magazine))
+
+    engine.dispose()
+
+
+def write(path, pragmas, seconds, connection):
+    """Commits batches of PAGE_BATCH_SIZE pages until `seconds` have passed."""
+    db.DB_ENGINE = db.create_db_engine(path, pragmas=pragmas)
+    magazine = next(generate_magazines(1, db.PAGE_BATCH_SIZE, seed=0))
+    batch = page_batch(db.DB_ENGINE, 1, magazine)
+
+    pages = 0
+    failures = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        try:
+            # The rows get their page ids filled in while being written
+            db.write_page_batch(copy.deepcopy(batch))
+            pages += len(batch)
+        except OperationalError:
+            failures += 1
+
+    db.DB_ENGINE.dispose()
+    connection.send((pages, failures))
+
+
+def read(magazines, end, latencies, failures):
+    rng = random.Random()
+
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        try:
+            db.page_complexity([rng.randint(1, magazines)])
+            latencies.append(time.perf_counter() - start)
+        except OperationalError:
+            failures.append(time.perf_counter() - start)
+
+
+def run(name, pragmas, read_only, readers, seconds, magazines, pages):
+    path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    seed(path, pragmas, magazines, pages)
+
+    engine = db.create_db_engine(path, read_only=read_only, pragmas=pragmas)
+    # The dashboard queries read through the read engine of the module
+    db.DB_READ_ENGINE = engine
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    writer = multiprocessing.Process(
+        target=write,
+        args=(path, pragmas, seconds, sender)
+    )
+    writer.start()
+
+    latencies = []
+    failures = []
+    end = time.perf_counter() + seconds
+    threads = [
+        Thread(target=read, args=(magazines, end, latencies, failures))
+        for _ in range(readers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    written, write_failures = receiver.recv()
+    writer.join()
+    engine.dispose()
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+    print(
+        f"{name:<8} {len(latencies) / seconds:7,.0f} reads/s   "
+        f"p50 {statistics.median(latencies or [0]) * 1000:6.1f} ms   "
+        f"p95 {p95 * 1000:6.1f} ms   "
+        f"max {max(latencies or [0]) * 1000:7.1f} ms   "
+        f"{len(failures)} failed reads   "
+        f"{written / seconds:6,.0f} pages/s written, "
+        f"{write_failures} failed commits"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--magazines', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=40)
+    args = parser.parse_args()
+
+    print(
+        f"{os.cpu_count()} cpus, {args.readers} readers, "
+        f"{args.magazines} magazines of {args.pages} pages"
+    )
+    for name, pragmas, read_only in (
+        ('defaults', SQLITE_DEFAULTS, False),
+        ('profile', None, True),
+    ):
+        run(
+            name, pragmas, read_only, args.readers, args.seconds,
+            args.magazines, args.pages
+        )
+
+
+if __name__ == '__main__':
+    main()
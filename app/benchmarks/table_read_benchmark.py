@@ -0,0 +1,106 @@
+"""
+Page reads of the dashboard callbacks, reading the whole Page table as
+get_table_as_df did against the projected, filtered reads of read_table.
+
+The pages are written straight into the table with the raw text of a
+synthetic magazine page, since only the reads are measured. Both reads are
+checked to give the same topics before the timings are reported.
+
+Run from the app folder:
+    python -m benchmarks.table_read_benchmark --magazines 500
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import insert
+from utils import database as db
+
+from .corpus import create_benchmark_engine, generate_magazines
+
+TOPICS = ['sport-voetbal', 'politiek-verkiezing', 'zorg-ziekenhuis', 'unknown']
+
+
+def seed(engine, magazines, pages):
+    rng = random.Random(42)
+
+    with engine.begin() as connection:
+        connection.execute(insert(db.Magazine), [
+            {'name': f"magazine-{i}.pdf", 'hash': f"hash-{i}", 'page_count': pages}
+            for i in range(1, magazines + 1)
+        ])
+        connection.execute(insert(db.Page), [
+            {
+                'magazine_id': magazine_id,
+                'page_number': page_number,
+                'raw_text': db.encode_raw_text(
+                    [' '.join(paragraph) for paragraph in page]
+                ),
+                'page_topic': json.dumps(rng.choice(TOPICS)),
+                'scored_version': 1,
+            }
+            for magazine_id, magazine in enumerate(
+                generate_magazines(magazines, pages), start=1
+            )
+            for page_number, page in enumerate(magazine, start=1)
+        ])
+
+
+def whole_table(magazine_ids):
+    page_df = pd.read_sql_table(db.Page.__tablename__, db.DB_READ_ENGINE)
+    filtered_pages = page_df[page_df['magazine_id'].isin(magazine_ids)]
+    return filtered_pages['page_topic'].apply(json.loads).tolist()
+
+
+def projected(magazine_ids):
+    return db.read_table(
+        db.Page,
+        ['page_topic'],
+        magazine_ids=magazine_ids,
+        order_by=[db.Page.id]
+    )['page_topic'].tolist()
+
+
+def time_reads(read, magazines, repeat):
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read(rng.sample(range(1, magazines + 1), 2))
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--magazines', type=int, default=500)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    engine = create_benchmark_engine(path)
+    seed(engine, args.magazines, args.pages)
+    db.upgrade_schema(engine)
+    db.DB_READ_ENGINE = engine
+
+    assert whole_table([1, 2]) == projected([1, 2]), 'the reads differ'
+
+    before = time_reads(whole_table, args.magazines, args.repeat)
+    after = time_reads(projected, args.magazines, args.repeat)
+
+    print(
+        f"{args.magazines} magazines, {args.magazines * args.pages} pages, "
+        f"database {db.database_size(path) / 2**20:.1f} MiB"
+    )
+    print(f"topics of 2 magazines, whole table  {before * 1000:9.1f} ms")
+    print(f"topics of 2 magazines, read_table   {after * 1000:9.1f} ms")
+    print(f"speedup                             {before / after:9.1f}x")
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
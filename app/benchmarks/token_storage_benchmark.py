@@ -0,0 +1,156 @@
+"""
+Size and load time of the paragraph tokens stored as JSON lists of words
+against arrays of Vocabulary ids.
+
+Both databases hold only the paragraphs of the same synthetic corpus. The
+corpus draws from a small vocabulary, real text has a larger one and longer
+tail words, so the JSON size is on the low side here. The decoded words of
+both formats are compared before the timings are reported.
+
+Run from the app folder:
+    python -m benchmarks.token_storage_benchmark --magazines 100
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import Session
+from utils import database as db
+
+from .corpus import create_benchmark_engine, generate_magazines
+
+
+def paragraphs(magazines, pages):
+    return [
+        paragraph
+        for magazine in generate_magazines(magazines, pages)
+        for page in magazine
+        for paragraph in page
+    ]
+
+
+def store_json(path, corpus):
+    connection = sqlite3.connect(path)
+    connection.execute(
+        'CREATE TABLE "Paragraph" (id INTEGER PRIMARY KEY, tokens TEXT)'
+    )
+    connection.executemany(
+        'INSERT INTO "Paragraph" (tokens) VALUES (?)',
+        ((json.dumps(paragraph),) for paragraph in corpus)
+    )
+    connection.commit()
+    connection.execute('VACUUM')
+    connection.close()
+
+
+def store_vocabulary(path, corpus):
+    engine = create_benchmark_engine(path)
+    rows = [
+        {'page_id': i, 'paragraph_index': 0, 'tokens': paragraph}
+        for i, paragraph in enumerate(corpus, start=1)
+    ]
+
+    with engine.begin() as connection:
+        db.encode_paragraphs(connection, rows)
+        connection.execute(insert(db.Paragraph), rows)
+
+    with engine.connect() as connection:
+        connection.execute(text('VACUUM'))
+
+    return engine
+
+
+def tokens_size(path):
+    connection = sqlite3.connect(path)
+    size = connection.execute(
+        'SELECT sum(length(CAST(tokens AS BLOB))) FROM "Paragraph"'
+    ).fetchone()[0]
+    connection.close()
+    return size
+
+
+def load_json(path):
+    connection = sqlite3.connect(path)
+    start = time.perf_counter()
+    words = [
+        json.loads(tokens)
+        for tokens, in connection.execute('SELECT tokens FROM "Paragraph" ORDER BY id')
+    ]
+    seconds = time.perf_counter() - start
+    connection.close()
+    return words, seconds
+
+
+def load_ids(engine):
+    start = time.perf_counter()
+    with Session(engine) as session:
+        ids = [
+            db.token_ids(tokens)
+            for tokens in session.scalars(
+                select(db.Paragraph.tokens).order_by(db.Paragraph.id)
+            )
+        ]
+    return ids, time.perf_counter() - start
+
+
+def load_words(engine):
+    # The vocabulary is loaded once per process, include it in the timing
+    db._vocabulary = None
+    start = time.perf_counter()
+    with Session(engine) as session:
+        words = db.decode_paragraphs(session.scalars(
+            select(db.Paragraph.tokens).order_by(db.Paragraph.id)
+        ))
+    return words, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--magazines', type=int, default=100)
+    parser.add_argument('--pages', type=int, default=40)
+    args = parser.parse_args()
+
+    corpus = paragraphs(args.magazines, args.pages)
+    token_count = sum(len(paragraph) for paragraph in corpus)
+    directory = tempfile.mkdtemp()
+    json_path = os.path.join(directory, 'json.db')
+    vocabulary_path = os.path.join(directory, 'vocabulary.db')
+
+    store_json(json_path, corpus)
+    engine = store_vocabulary(vocabulary_path, corpus)
+    db.DB_READ_ENGINE = engine
+
+    json_words, json_seconds = load_json(json_path)
+    ids, ids_seconds = load_ids(engine)
+    words, words_seconds = load_words(engine)
+
+    assert json_words == corpus, 'JSON tokens differ from the corpus'
+    assert words == corpus, 'decoded Vocabulary tokens differ from the corpus'
+    assert sum(len(paragraph_ids) for paragraph_ids in ids) == token_count
+
+    with Session(engine) as session:
+        vocabulary_size = len(session.scalars(select(db.Vocabulary.id)).all())
+
+    print(
+        f"{len(corpus)} paragraphs, {token_count} tokens, "
+        f"{vocabulary_size} distinct words"
+    )
+    for name, path in (('JSON', json_path), ('Vocabulary', vocabulary_path)):
+        print(
+            f"{name:<11} database {os.path.getsize(path) / 2**20:7.1f} MiB   "
+            f"tokens {tokens_size(path) / 2**20:7.1f} MiB   "
+            f"{tokens_size(path) / token_count:5.2f} bytes/token"
+        )
+    print(f"load with json.loads            {json_seconds:7.3f}s")
+    print(f"load as id arrays (frombuffer)  {ids_seconds:7.3f}s")
+    print(f"load as words (vocabulary)      {words_seconds:7.3f}s")
+
+    engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
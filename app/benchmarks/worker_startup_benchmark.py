@@ -0,0 +1,108 @@
+"""
+Startup time and memory of an ingestion worker process.
+
+Compares the lightweight worker entry point, started from a preloaded
+forkserver and with spawn, against a worker that imports the module graph the
+workers used to inherit from the Dash pages (Dash, pandas and the topic
+models). Graphs that cannot be imported in this environment are skipped.
+
+Run from the app folder:
+    python -m benchmarks.worker_startup_benchmark --workers 8
+"""
+import argparse
+import importlib
+import multiprocessing
+import statistics
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+WORKER_MODULES = ['utils.ingestion_worker']
+PREVIOUS_MODULES = [
+    'dash',
+    'pandas',
+    'utils.ingestion_worker',
+    'utils.topic.page_topic',
+    'utils.topic.paragraph_topic',
+]
+
+
+def probe(connection, modules):
+    """Imports `modules` and reports the peak memory of the worker."""
+    try:
+        for module in modules:
+            importlib.import_module(module)
+    except ImportError as e:
+        connection.send((None, None, str(e)))
+        return
+
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    max_rss = None
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            max_rss *= 1024
+
+    connection.send((max_rss, len(sys.modules), 'torch' in sys.modules))
+
+
+def start_worker(context, modules):
+    """Returns (seconds until the worker is ready, probe result)."""
+    parent_connection, child_connection = context.Pipe()
+
+    start = time.perf_counter()
+    process = context.Process(target=probe, args=(child_connection, modules))
+    process.start()
+    result = parent_connection.recv()
+    seconds = time.perf_counter() - start
+
+    process.join()
+    return seconds, result
+
+
+def measure(label, context, modules, workers):
+    timings = []
+    results = []
+
+    for _ in range(workers):
+        seconds, result = start_worker(context, modules)
+        if result[0] is None and result[1] is None:
+            print(f"{label:<36} skipped: {result[2]}")
+            return
+
+        timings.append(seconds)
+        results.append(result)
+
+    max_rss, module_count, torch_loaded = results[-1]
+    # The first forkserver worker also pays for starting the server
+    steady = timings[1:] or timings
+
+    print(
+        f"{label:<36} first {timings[0] * 1000:8.1f} ms   "
+        f"median {statistics.median(steady) * 1000:8.1f} ms   "
+        + (f"peak rss {max_rss / 2**20:7.1f} MiB   " if max_rss else '')
+        + f"{module_count:5d} modules   torch: {'yes' if torch_loaded else 'no'}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args()
+
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        forkserver = multiprocessing.get_context('forkserver')
+        forkserver.set_forkserver_preload(WORKER_MODULES)
+        measure('forkserver, worker entry point', forkserver, WORKER_MODULES, args.workers)
+
+    spawn = multiprocessing.get_context('spawn')
+    measure('spawn, worker entry point', spawn, WORKER_MODULES, args.workers)
+    measure('spawn, previous module graph', spawn, PREVIOUS_MODULES, args.workers)
+
+
+if __name__ == '__main__':
+    main()
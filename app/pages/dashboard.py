@@ -1,8 +1,6 @@
-import plotly.express as px
 import json
 import urllib
 
-import numpy as np
 import pandas as pd
 import plotly.express as px
 from dash import Dash, Input, Output, register_page
@@ -14,6 +12,7 @@ from wordcloud import WordCloud
 
 from app import PAGE_TITLE_BASE, PAGE_TITLE_SEPERATOR
 from utils import database as db
+from utils.stopwords import get_stopwords
 
 WORDCLOUD_KEY = "Wordcloud"
 COMPLEXITY_GRAPH_KEY = "Complexity Graph"
@@ -24,7 +23,7 @@ PLOTLY_MARKER_SIZE = 8
 
 def load_layout():
     load_stopwords()
-    load_page_df()
+    load_page_topics()
     load_magazine_df()
     generate_color_map()
 
@@ -41,9 +40,8 @@ def load_layout():
     topic_dropdown_options = (
         [
             {'label': topic, 'value': topic}
-            for topic in page_df['page_topic'].apply(eval).unique().tolist()
+            for topic in page_topics
         ]
-        if not page_df.empty else []
     )
 
     return Container([
@@ -115,33 +113,21 @@ register_page(
 
 def load_stopwords():
     global stop_words
-    stop_words = set(db.get_table_as_df(db.BadWord)['word'].to_list())
+    stop_words = get_stopwords()
 
 
 def load_magazine_df():
     global magazine_df
-    magazine_df = db.get_table_as_df(db.Magazine)
-
-
-def load_page_df():
-    global page_df
-
-    def remove_stopwords(text):
-        return [
-            word
-            for paragraph in text
-            for word in paragraph
-            if word.strip() not in stop_words
-        ]
+    magazine_df = db.read_table(db.Magazine, ['id', 'name', 'creation_date'])
 
-    df = db.get_table_as_df(db.Page)
 
-    if not df.empty:
-        df['tokenized_text'] = (
-            df['tokenized_text'].apply(eval).apply(remove_stopwords)
-        )
-
-    page_df = df
+def load_page_topics():
+    global page_topics
+    page_topics = db.read_table(
+        db.Page,
+        ['page_topic'],
+        where=[db.Page.page_topic.is_not(None)]
+    )['page_topic'].unique().tolist()
 
 
 def generate_color_map():
@@ -153,9 +139,6 @@ def generate_color_map():
     """
     global topic_color_map
 
-    # Assuming 'page_df' contains the topics
-    topics = page_df['page_topic'].apply(eval).unique().tolist()
-
     px_colors = px.colors.qualitative
     color_cycle = px_colors.Plotly + px_colors.Light24 + px_colors.Dark24
 
@@ -164,7 +147,7 @@ def generate_color_map():
     topic_color_map = {}
     cycle_length = len(color_cycle)
 
-    for i, topic in enumerate(topics):
+    for i, topic in enumerate(page_topics):
         # Use modulo to cycle through colors
         color = color_cycle[i % cycle_length]
         topic_color_map[topic] = color
@@ -179,14 +162,10 @@ def create_magazine_word_cloud(
     if not selected_magazine_ids:
         return P("Nog geen tijdschrift geselecteerd.")
 
-    filtered_pages = page_df[
-        page_df['magazine_id'].isin(selected_magazine_ids)
-    ]
-
     filtered_text = ' '.join([
         word
-        for sublist in filtered_pages['tokenized_text']
-        for word in sublist
+        for word in db.magazine_words(selected_magazine_ids)
+        if word.strip() not in stop_words
     ])
 
     wordcloud = WordCloud(
@@ -217,9 +196,11 @@ def create_topic_word_cloud(
     if not selected_magazine_ids:
         return P("Nog geen tijdschrift geselecteerd.")
 
-    filtered_pages = page_df[
-        page_df['magazine_id'].isin(selected_magazine_ids)
-    ]
+    filtered_pages = db.read_table(
+        db.Page,
+        ['page_topic'],
+        magazine_ids=selected_magazine_ids
+    )
 
     filtered_text = ' '.join([
         str(topic)
@@ -319,11 +300,12 @@ def topic_pie_url(selected_magazine_ids):
     if not selected_magazine_ids:
         return P("Nog geen tijdschrift geselecteerd.")
 
-    filtered_pages = page_df[
-        page_df['magazine_id'].isin(selected_magazine_ids)
-    ]
+    filtered_pages = db.read_table(
+        db.Page,
+        ['page_topic'],
+        magazine_ids=selected_magazine_ids
+    )
     page_topic_sum = filtered_pages['page_topic']\
-        .apply(eval)\
         .value_counts()\
         .reset_index()
 
@@ -357,23 +339,14 @@ def create_complexity_graph(selected_magazine_ids):
     if not selected_magazine_ids:
         return P("Nog geen tijdschrift geselecteerd.")
 
-    # Filter pages based on magazine IDs
-    filtered_pages = page_df[page_df['magazine_id'].isin(
-        selected_magazine_ids)]
-
     # Calculate the complexity sums for each magazine
     magazine_complexity_sums = {}
-    for _, row in filtered_pages.iterrows():
-        complexity_scores = json.loads(row['complexity_scores'])
-        page_complexity_sum = sum(
-            scores[0] for scores in complexity_scores if scores
-        )
-
+    for magazine_id, complexity_sum in \
+            db.magazine_complexity(selected_magazine_ids).items():
         magazine_name = magazine_df.loc[magazine_df['id']
-                                        == row['magazine_id'], 'name'].values[0]
+                                        == magazine_id, 'name'].values[0]
         magazine_complexity_sums[magazine_name] = (
-            magazine_complexity_sums.get(
-                magazine_name, 0) + page_complexity_sum
+            magazine_complexity_sums.get(magazine_name, 0) + complexity_sum
         )
 
     # Sort magazines based on creation_date
@@ -423,23 +396,10 @@ def create_complexity_v_topic_scatter_plot(selected_magazine_ids):
     if not selected_magazine_ids:
         return P("Nog geen tijdschrift geselecteerd.")
 
-    def extract_complexity_scores(stored_score_info):
-        return [score[0] for score in stored_score_info if score]
-
-    data = db.get_table_as_df(db.Page)
-    data = data[data['magazine_id'].isin(selected_magazine_ids)]
-
-    data['page_topic'] = data['page_topic'].apply(eval)
-    data['complexity_scores'] = data['complexity_scores']\
-        .apply(eval)\
-        .apply(extract_complexity_scores)
-    data['mean_complexity_score'] = data['complexity_scores'].apply(np.mean)
-
-    grouped_data = data.groupby('page_topic').agg(
-        mean_complexity_score=('mean_complexity_score', 'mean'),
-        # Counting the occurrences of each topic
-        topic_count=('page_topic', 'size')
-    ).reset_index()
+    grouped_data = pd.DataFrame(
+        db.page_topic_complexity(selected_magazine_ids),
+        columns=['page_topic', 'mean_complexity_score', 'topic_count']
+    ).sort_values('page_topic')
 
     fig = go.Figure()
 
@@ -486,10 +446,21 @@ def create_topic_popularity_graph(selected_topics):
 
     if type(selected_topics) is str:
         selected_topics = [selected_topics]
-    data = db.get_table_as_df(db.Page)
-    magazine_data = db.get_table_as_df(db.Magazine)
-
-    data['page_topic'] = data['page_topic'].apply(eval)
+    data = db.read_table(
+        db.Page,
+        ['magazine_id', 'page_topic'],
+        where=[db.Page.page_topic.in_(
+            [json.dumps(topic) for topic in selected_topics]
+        )]
+    )
+    # Every year with a stored magazine gets a bar, with or without the topics
+    magazine_data = db.read_table(
+        db.Magazine,
+        ['id', 'creation_date'],
+        where=[db.Magazine.pages.any()]
+    )
+    magazine_data['creation_date'] = pd.to_datetime(
+        magazine_data['creation_date']).dt.year
 
     topic_df = pd.merge(
         data,
@@ -498,18 +469,15 @@ def create_topic_popularity_graph(selected_topics):
         right_on='id',
         how='inner'
     )
-    topic_df['creation_date'] = pd.to_datetime(
-        topic_df['creation_date']).dt.year
 
     fig = go.Figure()
 
     for topic in selected_topics:
 
-        df_specific_topic = topic_df[topic_df['page_topic'].apply(
-            lambda topics: topic in topics)]
+        df_specific_topic = topic_df[topic_df['page_topic'] == topic]
 
         unique_dates = pd.DataFrame(
-            topic_df['creation_date'].unique(), columns=['creation_date'])
+            magazine_data['creation_date'].unique(), columns=['creation_date'])
 
         count_by_date = df_specific_topic.groupby(
             'creation_date').size().reset_index(name='count')
@@ -1,19 +1,23 @@
-import base64
-import io
-import time
-from multiprocessing import Process, cpu_count
+from multiprocessing import cpu_count
 
-import pandas as pd
 from dash import Dash, Input, Output, State, no_update, register_page
 from dash.dash_table import DataTable
 from dash.dcc import Upload
 from dash.html import H1, A, Div
-from dash_bootstrap_components import Button, Container, Spinner
+from dash_bootstrap_components import Button, Container, Progress, Spinner
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from utils import pdf_processing as pdf
-from utils import scraper
-from utils.database import DB_ENGINE, Magazine, add_magazine, get_table_as_df
+from utils import scraper, spool
+from utils.checkpoint import IngestionProgress, plan_retries
+from utils.complexity import get_lexicon
+from utils.database import (DB_ENGINE, Magazine, delete_magazines,
+                            dispose_inherited_connections, magazine_is_stored,
+                            read_table)
+from utils.ingestion import JOB_DUPLICATE, IngestionScheduler, JobResult
+from utils.ingestion_worker import get_worker_context, upload_pdf_job
 from utils.logging import build_logger
+from utils.page_writer import PageWriter
+from utils.preflight import preflight_queue
 from utils.topic import page_topic, paragraph_topic
 
 from app import PAGE_TITLE_BASE, PAGE_TITLE_SEPERATOR
@@ -23,11 +27,13 @@ log = build_logger(__name__)
 
 MAGAZINE_PAGE_PATH = '/pdf_beheren'
 
-pdfs_to_process = []
+PROGRESS_HIDDEN = {'display': 'none'}
+PROGRESS_VISIBLE = {'display': 'block', 'marginBottom': '1rem'}
 
 
 def load_layout():
     load_magazine_df()
+    ingestion_results = spool.load_results()
 
     return Container(
         [
@@ -128,6 +134,27 @@ def load_layout():
                                 ),
                                 className="button-container"
                             ),
+                            Div(
+                                [
+                                    Progress(
+                                        id='ingestion-progress-bar',
+                                        value=0,
+                                        striped=True,
+                                        animated=True,
+                                        className='mb-2'
+                                    ),
+                                    Div(id='ingestion-progress-text'),
+                                    Button(
+                                        "Annuleren",
+                                        id="cancel-upload-process-btn",
+                                        className="my-2",
+                                        color="danger",
+                                        n_clicks=0
+                                    ),
+                                ],
+                                id='ingestion-progress',
+                                style=PROGRESS_HIDDEN
+                            ),
                             DataTable(
                                 id='magazine-to-process-table',
                                 columns=[
@@ -146,13 +173,31 @@ def load_layout():
                                         'cursor': 'not-allowed'
                                     },
                                 ],
-                                data=[{'name': dic['name']}
-                                      for dic in pdfs_to_process],
+                                data=[
+                                    {'id': entry['id'], 'name': entry['name']}
+                                    for entry in spool.queued_pdfs()
+                                ],
                                 style_table={
                                     'overflowY': 'auto',
                                     'maxHeight': '200px'
                                 },
                             ),
+                            DataTable(
+                                id='ingestion-results-table',
+                                columns=[
+                                    {'name': 'Laatst verwerkt', 'id': 'name'},
+                                    {'name': 'Status', 'id': 'status'},
+                                    {'name': 'Details', 'id': 'detail'},
+                                ],
+                                data=ingestion_results,
+                                page_action='native',
+                                style_table={
+                                    'overflowY': 'auto',
+                                    'maxHeight': '200px',
+                                    'marginTop': '1rem',
+                                    'display': 'block' if ingestion_results else 'none'
+                                },
+                            ),
                         ],
                         className="magazine-grid-item lower-magazine-grid-item"
                     ),
@@ -207,46 +252,28 @@ register_page(
 
 def load_magazine_df():
     global magazine_df
-    magazine_df = get_table_as_df(Magazine)
-
-    if magazine_df.empty:
-        data = {
-            'id': pd.Series(dtype='int'),
-            'name': pd.Series(dtype='object'),
-            'hash': pd.Series(dtype='object'),
-            'creation_date': pd.Series(dtype='datetime64[ns]'),
-            'meta_data': pd.Series(dtype='object')
-        }
-
-        magazine_df = pd.DataFrame(data)
-
+    magazine_df = read_table(Magazine, ['id', 'name', 'creation_date'])
 
-def upload_pdf_wrapper(data):
-    try:
-        log.info(f"Uploading {data['name']}")
-        upload_pdf(data['name'], data['content'])
-        log.info(f"Uploaded {data['name']}")
-    except Exception as e:
-        log.error(f"Failed to upload {data['name']}: {e}")
 
-    return data['name']
+def format_progress(snapshot):
+    """Returns the progress bar value, its label and the progress text."""
+    total_pages = snapshot['total_pages']
+    percentage = 100 * snapshot['pages_done'] / total_pages if total_pages else 100
 
+    if snapshot['eta'] is None:
+        eta = 'onbekend'
+    else:
+        minutes, seconds = divmod(int(snapshot['eta']), 60)
+        eta = f"{minutes}:{seconds:02d}"
 
-def upload_pdf(filename, content):
-    stream = io.BytesIO(base64.b64decode(content))
-    current_hash = pdf.generate_file_hash(stream)
-
-    load_magazine_df()
-    if any(magazine_df['hash'] == current_hash):
-        return
-
-    add_magazine(
-        df=pdf.extraction(stream),
-        hash=current_hash,
-        metadata=pdf.extract_metadata_pdf(stream),
-        filename=filename
+    text = (
+        f"{snapshot['pages_done']} van {total_pages} pagina's "
+        f"({snapshot['pages_per_second']:.1f} pagina's/s), "
+        f"{snapshot['files_done']} van {snapshot['file_count']} bestanden klaar, "
+        f"{snapshot['files_failed']} mislukt, resterende tijd {eta}"
     )
-    stream.close()
+
+    return percentage, f"{percentage:.0f}%", text
 
 
 def register_magazine_callbacks(app: Dash):
@@ -256,52 +283,85 @@ def register_magazine_callbacks(app: Dash):
             Output('url', 'href', allow_duplicate=True)
         ],
         Input('start-upload-process-btn', 'n_clicks'),
+        # Runs in a separate process, the server keeps answering other requests
+        background=True,
         running=[
             (Output("start-upload-process-btn", "disabled"), True, False),
+            (Output("ingestion-progress", "style"), PROGRESS_VISIBLE, PROGRESS_HIDDEN),
         ],
+        progress=[
+            Output('ingestion-progress-bar', 'value'),
+            Output('ingestion-progress-bar', 'label'),
+            Output('ingestion-progress-text', 'children'),
+        ],
+        # Pages committed before cancelling are kept, the queue is resumed later
+        cancel=[Input('cancel-upload-process-btn', 'n_clicks')],
         prevent_initial_call=True
     )
-    def handle_pdf_processing(n):
-        global pdfs_to_process
-
-        if not pdfs_to_process or n is None or n == 0:
+    def handle_pdf_processing(set_progress, n):
+        queued = spool.queued_pdfs()
+        if not queued or n is None or n == 0:
             return no_update, no_update
 
-        while(pdfs_to_process):
-            active_processes = []
-            processed_pdf_names = []
-
-            i = 0
-            while i < len(pdfs_to_process) or active_processes:
-                while len(active_processes) < cpu_count() and i < len(pdfs_to_process):
-                    pdf_data = pdfs_to_process[i]
-                    process = Process(target=upload_pdf_wrapper, args=(pdf_data,))
-                    process.start()
-                    active_processes.append((pdf_data, process, time.time()))
-                    i += 1
-
-                for pdf_data, process, start_time in active_processes[:]:
-                    elapsed_time = time.time() - start_time
-                    if not process.is_alive():
-                        process.join()
-                        processed_pdf_names.append(pdf_data['name'])
-                        active_processes.remove((pdf_data, process, start_time))
-                    elif elapsed_time > 90:
-                        process.terminate()
-                        process.join()
-                        log.error(
-                            f"Process for {pdf_data['name']} was "
-                            f"terminated after exceeding 90 seconds."
-                        )
-                        processed_pdf_names.append(pdf_data['name'])
-                        active_processes.remove((pdf_data, process, start_time))
-
-                pdfs_to_process = [
-                    pdf
-                    for pdf in pdfs_to_process
-                    if pdf['name'] not in processed_pdf_names
+        # Connections inherited from the server process must not be reused
+        dispose_inherited_connections()
+        spool.save_results([])
+
+        # Compile the scoring lexicon once and share it with every worker
+        lexicon = get_lexicon()
+
+        with PageWriter() as writer:
+            scheduler = IngestionScheduler(
+                upload_pdf_job,
+                workers=cpu_count(),
+                context=get_worker_context(),
+                output_callback=writer.put
+            )
+
+            # PDFs queued while a batch is processed are picked up afterwards,
+            # the ones kept in the queue are left for the next run
+            attempted = set()
+            while queued:
+                batch = queued
+                batch_results = []
+
+                # Largest first, duplicates and unreadable files never reach a worker
+                jobs, rejected = preflight_queue(batch, scheduler.workers)
+                batch_results.extend(rejected)
+
+                progress = IngestionProgress(jobs, len(batch))
+
+                def report_progress(results):
+                    set_progress(format_progress(progress.snapshot(batch_results)))
+
+                # Interrupted jobs come back as smaller sub-jobs for their missing pages
+                while jobs:
+                    results = scheduler.run(
+                        [
+                            (job.name, (job, lexicon), job.timeout)
+                            for job in jobs
+                        ],
+                        progress_callback=report_progress
+                    )
+
+                    writer.flush()
+                    jobs, finished = plan_retries(results)
+                    batch_results.extend(finished)
+
+                spool.add_results(batch_results)
+                # Failed and partially stored PDFs stay queued, a next run
+                # resumes them with their missing pages
+                for entry in batch:
+                    if magazine_is_stored(entry['hash']):
+                        spool.remove(entry['id'])
+
+                attempted.update(entry['id'] for entry in batch)
+                queued = [
+                    entry for entry in spool.queued_pdfs()
+                    if entry['id'] not in attempted
                 ]
 
+        set_progress((100, '100%', 'Topic modellen worden bijgewerkt...'))
         page_topic.run()
         paragraph_topic.run()
 
@@ -322,7 +382,7 @@ def register_magazine_callbacks(app: Dash):
         if n is None or n == 0:
             return no_update, no_update
 
-        pdfs_to_process.extend(scraper.scrape())
+        scraper.scrape()
 
         return no_update, MAGAZINE_PAGE_PATH
 
@@ -345,10 +405,14 @@ def register_magazine_callbacks(app: Dash):
         for content, filename in zip(contents, filenames):
             _, content = content.split(',')
 
-            pdfs_to_process.append({
-                "name": filename,
-                "content": content
-            })
+            entry = spool.spool_base64(filename, content)
+
+            # Re-uploaded magazines never enter the queue
+            if magazine_is_stored(entry['hash']):
+                spool.remove(entry['id'])
+                result = JobResult(filename, JOB_DUPLICATE)
+                IngestionScheduler.log_result(result)
+                spool.add_results([result])
 
         # Assuming MAGAZINE_PAGE_PATH is a general redirection after uploads
         return no_update, MAGAZINE_PAGE_PATH
@@ -360,19 +424,15 @@ def register_magazine_callbacks(app: Dash):
         prevent_initial_call=True
     )
     def update_pdf_to_process(data_previous, data_current):
-        global pdfs_to_process
-
-        if len(data_current) < len(data_previous):
-            new_names = {pdf['name'] for pdf in data_current}
-            pdfs_to_process = [
-                pdf
-                for pdf in pdfs_to_process
-                if pdf['name'] in new_names
-            ]
-        else:
-            for i, new_pdf in enumerate(data_current):
-                if pdfs_to_process[i]['name'] != new_pdf['name']:
-                    pdfs_to_process[i]['name'] = new_pdf['name']
+        previous_names = {row['id']: row['name'] for row in data_previous}
+        current_names = {row['id']: row['name'] for row in data_current}
+
+        for entry_id in previous_names.keys() - current_names.keys():
+            spool.remove(entry_id)
+
+        for entry_id, name in current_names.items():
+            if previous_names.get(entry_id, name) != name:
+                spool.rename(entry_id, name)
 
         return data_current
 
@@ -383,25 +443,24 @@ def register_magazine_callbacks(app: Dash):
         prevent_initial_call=True
     )
     def update_database(data_previous, data_current):
-        prev_dict = {item['id']: item for item in data_previous}
         current_dict = {item['id']: item for item in data_current}
 
-        all_ids = set(prev_dict.keys()).union(current_dict.keys())
-
-        zipped_data = [(prev_dict.get(id), current_dict.get(id))
-                       for id in all_ids]
-
+        deleted_ids = [
+            item['id'] for item in data_previous
+            if item['id'] not in current_dict
+        ]
+        renamed = [
+            {'id': item['id'], 'name': current_dict[item['id']]['name']}
+            for item in data_previous
+            if item['id'] in current_dict
+            and current_dict[item['id']]['name'] != item['name']
+        ]
+
+        # All edits are written at once, whatever the number of rows
         with Session(DB_ENGINE) as session:
-            for prev_row, current_row in zipped_data:
-                if prev_row != current_row:
-                    magazine = session.query(Magazine).filter_by(
-                        id=prev_row['id']
-                    ).first()
-
-                    if not current_row:
-                        session.delete(magazine)
-                    else:
-                        magazine.name = current_row['name']
+            if renamed:
+                session.execute(update(Magazine), renamed)
+            delete_magazines(session.connection(), deleted_ids)
 
             session.commit()
 
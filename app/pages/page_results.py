@@ -1,7 +1,4 @@
-import ast
-import json
 import re
-from collections import Counter
 
 from dash import Dash, Input, Output, dcc, html, register_page
 from dash_bootstrap_components import Badge, Col, Container, Row
@@ -12,7 +9,6 @@ from app import PAGE_TITLE_BASE, PAGE_TITLE_SEPERATOR
 
 
 def load_layout():
-    load_page_df()
     load_magazine_df()
     load_word_list()
 
@@ -79,21 +75,12 @@ register_page(
 
 def load_magazine_df():
     global magazine_df
-    magazine_df = db.get_table_as_df(db.Magazine)
-
-
-def load_page_df():
-    global page_df
-    page_df = db.get_table_as_df(db.Page)
-    if not page_df.empty:
-        page_df['pagina_nummer'] = \
-            page_df.groupby('magazine_id').cumcount() + 1
-        page_df['page_text'] = page_df['page_text'].apply(eval)
+    magazine_df = db.read_table(db.Magazine, ['id', 'name'])
 
 
 def load_word_list():
     global word_list_df
-    word_list_df = db.get_table_as_df(db.WordObject)
+    word_list_df = db.read_table(db.WordObject, ['word', 'type'])
 
 
 def mark_words_from_wordlist(text, topic_list, bar_data):
@@ -103,7 +90,9 @@ def mark_words_from_wordlist(text, topic_list, bar_data):
 
         # tijdelijke fix voor index error(topic index moet matchen met tekst)
         topic = topic_list[idx]
-        for topic_color in bar_data:
+        # Paragraphs get their topic when the topic models have run
+        color = 'secondary'
+        for topic_color in bar_data or []:
             if topic_color[0] == topic:
                 color = topic_color[1]
                 break
@@ -154,30 +143,15 @@ def create_complexity_graph_url(selected_magazine_id):
     if not isinstance(selected_magazine_id, list):
         selected_magazine_id = [selected_magazine_id]
 
-    filtered_pages = page_df[page_df['magazine_id'].isin(selected_magazine_id)]
-
     page_labels = []
     page_complexity_sums = []
     complex_only_sum = []
     reduc_only_sum = []
 
-    for _, row in filtered_pages.iterrows():
-        page_labels.append(row['pagina_nummer'])
-        complexity_scores = json.loads(row['complexity_scores'])
-
-        page_complexity_sum = 0
-        complex_sum = 0
-        reduc_sum = 0
-        for scores in complexity_scores:
-            if scores:
-                score = scores[0]
-                page_complexity_sum += score
-                if score > 0:
-                    complex_sum += score
-                elif score < 0:
-                    reduc_sum += score
-
-        page_complexity_sums.append(page_complexity_sum)
+    for _, page_number, total, complex_sum, reduc_sum in \
+            db.page_complexity(selected_magazine_id):
+        page_labels.append(page_number)
+        page_complexity_sums.append(total)
         complex_only_sum.append(complex_sum)
         reduc_only_sum.append(reduc_sum)
 
@@ -247,13 +221,9 @@ def topic_pie_url(selected_magazine_ids, page):
     if not selected_magazine_ids or not page:
         return go.Figure()
 
-    magazine = []
-    magazine.append(selected_magazine_ids)
-    filtered_pages = page_df[page_df['magazine_id'].isin(magazine)]
-    filtered_pages = filtered_pages.iloc[page-1]['par_topics']
-    filtered_pages = ast.literal_eval(filtered_pages)
-
-    page_topic_sum = Counter(filtered_pages)
+    page_topic_sum = db.paragraph_topic_counts(selected_magazine_ids, page)
+    if not page_topic_sum:
+        return go.Figure(), []
 
     labels = list(page_topic_sum.keys())
     values = list(page_topic_sum.values())
@@ -326,13 +296,16 @@ def register_page_result_callbacks(app: Dash):
             [selected_magazines] if not isinstance(selected_magazines, list)
             else selected_magazines
         )
-        filtered_pages = page_df[
-            page_df['magazine_id'].isin(selected_magazines)
-        ]
+        filtered_pages = db.read_table(
+            db.Page,
+            ['page_number'],
+            magazine_ids=selected_magazines,
+            order_by=[db.Page.magazine_id, db.Page.page_number]
+        )
 
-        page_dropdown_options = [{'label': str(row['pagina_nummer']),
-                                  'value': row['pagina_nummer']}
-                                 for _, row in filtered_pages.iterrows()]
+        page_dropdown_options = [{'label': str(page_number),
+                                  'value': page_number}
+                                 for page_number in filtered_pages['page_number'].tolist()]
 
         return page_dropdown_options
 
@@ -354,12 +327,10 @@ def register_page_result_callbacks(app: Dash):
     def update_text(selected_magazine, selected_page, bar_data):
         if selected_magazine is None or selected_page is None:
             return "Nog geen pagina geselecteerd"
-        selection_predicate = (page_df['magazine_id'] == selected_magazine) & (page_df['pagina_nummer'] == selected_page)
-
-        selected_text = page_df[selection_predicate]['page_text'].values[0]
-        selected_topics = page_df[selection_predicate]['par_topics'].values[0]
+        paragraphs = db.page_paragraphs(selected_magazine, selected_page)
 
-        selected_topics = ast.literal_eval(selected_topics)
+        selected_text = [tokens for tokens, _ in paragraphs]
+        selected_topics = [topic for _, topic in paragraphs]
 
         selected_text = mark_words_from_wordlist(
             selected_text,
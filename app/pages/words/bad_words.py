@@ -8,7 +8,8 @@ from dash_bootstrap_components import Button, Col
 from dash_bootstrap_components import Input as B_Input
 from dash_bootstrap_components import Row
 from sqlalchemy.orm import Session
-from utils.database import DB_ENGINE, BadWord, get_table_as_df
+from utils.database import (DB_ENGINE, STOPWORDS_CACHE, BadWord,
+                            bump_cache_version, read_table)
 
 from .main import WORDS_PAGE_PATH
 
@@ -49,7 +50,7 @@ def load_layout_bw_page():
                 }
             ],
             data=(
-                get_table_as_df(BadWord).to_dict("records")
+                read_table(BadWord).to_dict("records")
             ),
             editable=True,
             row_deletable=True,
@@ -98,6 +99,7 @@ def register_bad_words_callbacks(app: Dash):
                     else:
                         word.word = current_row['word']
 
+                    bump_cache_version(session, STOPWORDS_CACHE)
                     session.commit()
 
         return data_current
@@ -118,6 +120,7 @@ def register_bad_words_callbacks(app: Dash):
             session.add(
                 BadWord(word=word)
             )
+            bump_cache_version(session, STOPWORDS_CACHE)
             session.commit()
 
         return WORDS_PAGE_PATH
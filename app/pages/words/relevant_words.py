@@ -2,17 +2,24 @@
 
 from dash import Dash, Input, Output, State, no_update
 from dash.dash_table import DataTable
-from dash.dcc import Dropdown
-from dash.html import H1
+from dash.dcc import Dropdown, Store
+from dash.html import H1, Div
 from dash_bootstrap_components import Button, Col
 from dash_bootstrap_components import Input as B_Input
-from dash_bootstrap_components import Row
+from dash_bootstrap_components import Progress, Row
 from sqlalchemy.orm import Session
-from utils.database import DB_ENGINE, WordObject, get_table_as_df, recalculate_complexity_for_all_magazines
+from utils.database import (DB_ENGINE, WORDLIST_CACHE, WordObject,
+                            bump_cache_version, dispose_inherited_connections,
+                            get_cache_version, read_table,
+                            recalculate_complexity_for_all_magazines)
+from utils.recalculation import log_progress, rescore_words
 
 
 from .main import WORDS_PAGE_PATH
 
+PROGRESS_HIDDEN = {'display': 'none'}
+PROGRESS_VISIBLE = {'display': 'block', 'marginBottom': '1rem'}
+
 
 def load_layout_rw_page():
     return [
@@ -51,6 +58,24 @@ def load_layout_rw_page():
             )),
         ], className='my-4'),
 
+        Div(
+            [
+                Progress(
+                    id='recalculation-progress-bar',
+                    value=0,
+                    striped=True,
+                    animated=True,
+                    className='mb-2'
+                ),
+                Div(id='recalculation-progress-text'),
+            ],
+            id='recalculation-progress',
+            style=PROGRESS_HIDDEN
+        ),
+
+        # Words of the last table edit, rescored by a background callback
+        Store(id='edited-r-words'),
+
         DataTable(
             id='relevant-wordlist-table',
             columns=[
@@ -77,7 +102,7 @@ def load_layout_rw_page():
                     'type': 'numeric'
                 },
             ],
-            data=get_table_as_df(WordObject).to_dict("records"),
+            data=read_table(WordObject).to_dict("records"),
             editable=True,
             row_deletable=True,
             dropdown={
@@ -108,9 +133,25 @@ def load_layout_rw_page():
     ]
 
 
+def format_recalculation_progress(done, total, elapsed):
+    """Returns the progress bar value, its label and the progress text."""
+    percentage = 100 * done / total if total else 100
+    pages_per_second = done / elapsed if elapsed else 0
+
+    text = (
+        f"{done} van {total} pagina's herberekend "
+        f"({pages_per_second:.1f} pagina's/s)"
+    )
+
+    return percentage, f"{percentage:.0f}%", text
+
+
 def register_relevant_words_callbacks(app: Dash):
     @app.callback(
-        Output('relevant-wordlist-table', 'data'),
+        [
+            Output('relevant-wordlist-table', 'data'),
+            Output('edited-r-words', 'data')
+        ],
         Input('relevant-wordlist-table', 'data_previous'),
         State('relevant-wordlist-table', 'data'),
         prevent_initial_call=True
@@ -124,11 +165,17 @@ def register_relevant_words_callbacks(app: Dash):
         zipped_data = [(prev_dict.get(id), current_dict.get(id))
                        for id in all_ids]
 
+        edited_words = set()
+        version = None
+
         with Session(DB_ENGINE) as session:
+            previous_version = get_cache_version(session, WORDLIST_CACHE)
+
             for prev_row, current_row in zipped_data:
                 if prev_row != current_row:
                     word = session.query(WordObject).filter_by(
                         id=prev_row['id']).first()
+                    edited_words.add(word.word)
 
                     if not current_row:
                         session.delete(word)
@@ -136,18 +183,56 @@ def register_relevant_words_callbacks(app: Dash):
                         word.word = current_row['word']
                         word.type = current_row['type']
                         word.weight = current_row['weight']
+                        edited_words.add(word.word)
+
+            if edited_words:
+                version = bump_cache_version(session, WORDLIST_CACHE)
+            session.commit()
+
+        if not edited_words:
+            return data_current, no_update
 
-                    session.commit()
+        return data_current, {
+            'words': sorted(edited_words),
+            'previous_version': previous_version,
+            'version': version
+        }
 
-        return data_current
+    @app.callback(
+        Output("recalculation-loading-output", "children", allow_duplicate=True),
+        Input('edited-r-words', 'data'),
+        # Runs in a separate process, the table stays editable meanwhile
+        background=True,
+        prevent_initial_call=True
+    )
+    def rescore_edited_words(edited):
+        if not edited:
+            return no_update
+
+        # Connections inherited from the server process must not be reused
+        dispose_inherited_connections()
+
+        # Only the paragraphs containing an edited word need a new score
+        rescore_words(
+            set(edited['words']),
+            edited['previous_version'],
+            edited['version']
+        )
+
+        return no_update
 
     @app.callback(
         Output('url', 'href', allow_duplicate=True),
+        Input('add-r-word-btn', 'n_clicks'),
         [
-            Input('add-r-word-btn', 'n_clicks'),
-            Input('new-r-word-input', 'value'),
-            Input('new-r-word-type', 'value'),
-            Input('new-r-word-weight', 'value'),
+            State('new-r-word-input', 'value'),
+            State('new-r-word-type', 'value'),
+            State('new-r-word-weight', 'value'),
+        ],
+        # Runs in a separate process, the page is reloaded once it is rescored
+        background=True,
+        running=[
+            (Output("add-r-word-btn", "disabled"), True, False),
         ],
         prevent_initial_call=True
     )
@@ -155,7 +240,11 @@ def register_relevant_words_callbacks(app: Dash):
         if not n_clicks or not word or not type:
             return no_update
 
+        # Connections inherited from the server process must not be reused
+        dispose_inherited_connections()
+
         with Session(DB_ENGINE) as session:
+            previous_version = get_cache_version(session, WORDLIST_CACHE)
             session.add(
                 WordObject(
                     word=word,
@@ -163,23 +252,41 @@ def register_relevant_words_callbacks(app: Dash):
                     weight=weight
                 )
             )
+            version = bump_cache_version(session, WORDLIST_CACHE)
             session.commit()
 
+        rescore_words({word}, previous_version, version)
+
         return WORDS_PAGE_PATH
 
     @app.callback(
         Output("recalculation-loading-output",
                "children", allow_duplicate=True),
         Input('recalculate-complexity-scores-btn', 'n_clicks'),
+        # Runs in a separate process, the server keeps answering other requests
+        background=True,
         running=[
             (Output("recalculate-complexity-scores-btn", "disabled"), True, False),
+            (Output("recalculation-progress", "style"), PROGRESS_VISIBLE, PROGRESS_HIDDEN),
+        ],
+        progress=[
+            Output('recalculation-progress-bar', 'value'),
+            Output('recalculation-progress-bar', 'label'),
+            Output('recalculation-progress-text', 'children'),
         ],
         prevent_initial_call=True
     )
-    def recalculate_complexity_scores(n_clicks):
+    def recalculate_complexity_scores(set_progress, n_clicks):
         if not n_clicks:
             return no_update
 
-        recalculate_complexity_for_all_magazines()
+        # Connections inherited from the server process must not be reused
+        dispose_inherited_connections()
+
+        def report_progress(done, total, elapsed):
+            log_progress(done, total, elapsed)
+            set_progress(format_recalculation_progress(done, total, elapsed))
+
+        recalculate_complexity_for_all_magazines(progress_callback=report_progress)
 
         return no_update
@@ -0,0 +1,167 @@
+"""
+checkpoint.py
+Resumes ingestion jobs that timed out or whose worker crashed.
+
+Workers commit the pages of a magazine in small batches, so an interrupted
+job keeps everything it committed. The pages that are still missing are
+retried as smaller page-range sub-jobs, each with a timeout for its own
+size, which can run on different workers at the same time. A job is given
+up after MAX_ATTEMPTS attempts; the magazine then keeps the pages that were
+stored and is resumed when the same file is queued again.
+
+The committed pages also tell how far a run is, IngestionProgress turns
+them into the throughput and remaining time shown while PDFs are processed.
+"""
+import math
+import time
+
+from .database import stored_page_counts, stored_page_numbers
+from .ingestion import (JOB_CRASHED, JOB_DUPLICATE, JOB_FAILED, JOB_OK,
+                        JOB_TIMED_OUT, JobResult)
+from .logging import build_logger
+from .preflight import PreflightJob
+
+log = build_logger(__name__)
+
+MAX_ATTEMPTS = 3
+# Number of sub-jobs the remaining pages of an interrupted job are split into
+SPLIT_PARTS = 4
+
+RETRY_STATUSES = (JOB_TIMED_OUT, JOB_CRASHED)
+
+
+def remaining_page_numbers(job):
+    """Returns the pages of `job` that have not been committed yet."""
+    stored = stored_page_numbers(job.magazine_id)
+    return [i for i in job.page_numbers if i + 1 not in stored]
+
+
+def split_job(job, page_numbers, parts=SPLIT_PARTS):
+    """Splits `page_numbers` of `job` into at most `parts` sub-jobs."""
+    size = math.ceil(len(page_numbers) / parts)
+
+    return [
+        PreflightJob(
+            f"{job.data['name']} "
+            f"(p. {chunk[0] + 1}-{chunk[-1] + 1})",
+            job.data,
+            job.hash,
+            job.page_count,
+            job.magazine_id,
+            chunk,
+            job.attempt + 1
+        )
+        for chunk in (
+            page_numbers[i:i + size]
+            for i in range(0, len(page_numbers), size)
+        )
+    ]
+
+
+def plan_retries(results):
+    """
+    Splits the results of a scheduler run into sub-jobs to retry and
+    final results.
+
+    Args:
+        results: JobResults of jobs run as (PreflightJob, ...) arguments.
+
+    Returns:
+        tuple: The PreflightJobs to run next, largest first, and the
+            JobResults that are final.
+    """
+    retries = []
+    finished = []
+
+    for result in results:
+        job = result.job[0] if result.job else None
+
+        if result.status not in (JOB_OK, *RETRY_STATUSES) or job is None:
+            finished.append(result)
+            continue
+
+        # Pages of a finished job can be missing too, if writing them failed
+        page_numbers = remaining_page_numbers(job)
+
+        if not page_numbers:
+            if result.status != JOB_OK:
+                result = JobResult(
+                    result.name,
+                    JOB_OK,
+                    'All pages were committed before the job was stopped',
+                    result.seconds,
+                    result.job
+                )
+            finished.append(result)
+        elif job.attempt >= MAX_ATTEMPTS:
+            status = JOB_FAILED if result.status == JOB_OK else result.status
+            finished.append(JobResult(
+                result.name,
+                status,
+                f"{result.detail or 'Writing pages failed'}, "
+                f"{len(page_numbers)} pages were not stored "
+                f"after {job.attempt} attempts",
+                result.seconds,
+                result.job
+            ))
+        else:
+            sub_jobs = split_job(job, page_numbers)
+            log.info(
+                f"Retrying {len(page_numbers)} remaining pages of {result.name} "
+                f"as {len(sub_jobs)} sub-jobs"
+            )
+            retries.extend(sub_jobs)
+
+    retries.sort(key=lambda job: len(job.page_numbers), reverse=True)
+
+    return retries, finished
+
+
+class IngestionProgress:
+    """
+    Progress of a run over the accepted `jobs` of a queue of `file_count`
+    files, measured from the pages the workers have committed.
+    """
+
+    def __init__(self, jobs, file_count):
+        self.page_counts = {job.magazine_id: job.page_count for job in jobs}
+        self.total_pages = sum(len(job.page_numbers) for job in jobs)
+        self.file_count = file_count
+        self.started = time.time()
+        # Pages stored by earlier, interrupted runs are not part of this run
+        self.initial_pages = sum(stored_page_counts(self.page_counts).values())
+
+    def snapshot(self, final_results):
+        """
+        Returns a dictionary with the pages done, the pages per second, the
+        files done and failed and the estimated remaining seconds (None while
+        nothing has been committed yet).
+        """
+        stored = stored_page_counts(self.page_counts)
+        pages_done = sum(stored.values()) - self.initial_pages
+        elapsed = time.time() - self.started
+        pages_per_second = pages_done / elapsed if elapsed > 0 else 0
+
+        files_done = sum(
+            1 for magazine_id, page_count in self.page_counts.items()
+            if stored.get(magazine_id, 0) >= page_count
+        )
+        # Rejected files have no job, the sub-jobs of a file share its magazine
+        files_failed = len({
+            result.job[0].magazine_id if result.job else result.name
+            for result in final_results
+            if result.status not in (JOB_OK, JOB_DUPLICATE)
+        })
+
+        remaining = self.total_pages - pages_done
+        eta = remaining / pages_per_second if pages_per_second else None
+
+        return {
+            'pages_done': pages_done,
+            'total_pages': self.total_pages,
+            'pages_per_second': pages_per_second,
+            'files_done': files_done,
+            'files_failed': files_failed,
+            'file_count': self.file_count,
+            'eta': eta,
+        }
@@ -3,59 +3,150 @@ machine_learning.py
 This file is responsible for calculating the complexity score for each page of the magazine.
 The complexity score is calculated by the terms (reductive or complex) defined by the user.
 """
+from sqlalchemy.orm import Session
+
 from . import database as db
 
+REDUCTIONISTIC_TYPE = '1'
+COMPLEX_TYPE = '2'
+ANTONYM_TYPE = '3'
+
+_cached_lexicon = None
+
+
+class Lexicon:
+    """
+    Compiled snapshot of the Wordlist table used to score paragraphs.
+
+    Building a lexicon queries the database once, after which scoring a
+    paragraph is pure dictionary lookups. Lexicons are plain picklable
+    objects, so one instance can be handed to every worker of a job.
+    """
+
+    def __init__(self, antonyms, reductionistic_words, complex_words, version=0):
+        self.antonyms = frozenset(antonyms)
+        # word -> weight, only words with a positive weight can change a score
+        self.reductionistic_words = {
+            word: weight
+            for word, weight in reductionistic_words.items()
+            if weight is not None and weight > 0
+        }
+        self.complex_words = {
+            word: weight
+            for word, weight in complex_words.items()
+            if weight is not None and weight > 0
+        }
+        self.version = version
+
+        # Keep the table order for the reported word frequencies
+        self._order = {
+            word: i
+            for i, word in enumerate([*reductionistic_words, *complex_words])
+        }
 
-def calc_complexity(session, split_text):
-    # Extract words from the database based on antonym status
-    antonyms = {word.word for word in session.query(db.WordObject.word).filter(db.WordObject.type == 3)}
+    @classmethod
+    def from_session(cls, session):
+        antonyms = []
+        reductionistic_words = {}
+        complex_words = {}
 
-    # Get all WordObjects from database for counting
-    reductionistic_words = {word.word: {'gewicht': word.weight, 'frequentie': 0} for word in
-                            session.query(db.WordObject).filter(db.WordObject.type == 1)}
-    complex_words = {word.word: {'gewicht': word.weight, 'frequentie': 0} for word in
-                     session.query(db.WordObject).filter(db.WordObject.type == 2)}
+        for word in session.query(db.WordObject).order_by(db.WordObject.id):
+            word_type = str(word.type)
 
-    # Calculate reductionistic and complex count scores
-    complex_count = 0
-    reductionistic_count = 0
+            if word_type == ANTONYM_TYPE:
+                antonyms.append(word.word)
+            elif word_type == REDUCTIONISTIC_TYPE:
+                reductionistic_words[word.word] = word.weight
+            elif word_type == COMPLEX_TYPE:
+                complex_words[word.word] = word.weight
 
-    for i in range(1, len(split_text)):
-        current_word = split_text[i]
-        previous_word = split_text[i - 1] if i > 0 else None
+        return cls(
+            antonyms,
+            reductionistic_words,
+            complex_words,
+            db.get_cache_version(session, db.WORDLIST_CACHE)
+        )
 
-        # check word if it exists in reductionistic words
-        if current_word in reductionistic_words:
-            gewicht = reductionistic_words[current_word]['gewicht']
+    def score(self, split_text):
+        # Calculate reductionistic and complex count scores
+        complex_count = 0
+        reductionistic_count = 0
+        frequencies = {}
 
-            if gewicht > 0:
-                if previous_word in antonyms:
+        antonyms = self.antonyms
+        reductionistic_words = self.reductionistic_words
+        complex_words = self.complex_words
+
+        for i in range(1, len(split_text)):
+            current_word = split_text[i]
+
+            # check word if it exists in reductionistic words
+            if current_word in reductionistic_words:
+                gewicht = reductionistic_words[current_word]
+
+                if split_text[i - 1] in antonyms:
                     complex_count += gewicht
                 else:
                     reductionistic_count += gewicht
 
-                reductionistic_words[current_word]['frequentie'] += 1
+            # check word if it exists in complex words
+            elif current_word in complex_words:
+                gewicht = complex_words[current_word]
 
-        # check word if it exists in complex words
-        elif current_word in complex_words:
-            gewicht = complex_words[current_word]['gewicht']
-
-            if gewicht > 0:
-                if previous_word in antonyms:
+                if split_text[i - 1] in antonyms:
                     reductionistic_count += gewicht
                 else:
                     complex_count += gewicht
 
-                complex_words[current_word]['frequentie'] += 1
+            else:
+                continue
 
-    # Filter out words with frequency = 0
-    filtered_word_frequencies = {
-        word: {'frequentie': data['frequentie'], 'gewicht': data['gewicht']}
-        for word, data in {**reductionistic_words, **complex_words}.items()
-        if data['frequentie'] > 0
-    }
+            frequencies[current_word] = frequencies.get(current_word, 0) + 1
+
+        return complex_count, reductionistic_count, frequencies
+
+    def word_frequencies(self, frequencies):
+        weights = {**self.reductionistic_words, **self.complex_words}
+
+        return {
+            word: {'frequentie': frequencies[word], 'gewicht': weights[word]}
+            for word in sorted(frequencies, key=self._order.__getitem__)
+        }
+
+
+def get_lexicon(session=None):
+    """
+    Returns the compiled lexicon, rebuilding it only when the Wordlist
+    table has been edited since it was last compiled.
+    """
+    global _cached_lexicon
+
+    if session is None:
+        with Session(db.DB_ENGINE) as session:
+            return get_lexicon(session)
+
+    version = db.get_cache_version(session, db.WORDLIST_CACHE)
+    if _cached_lexicon is None or _cached_lexicon.version != version:
+        _cached_lexicon = Lexicon.from_session(session)
+
+    return _cached_lexicon
+
+
+def calc_complexity(lexicon, split_text):
+    complex_count, reductionistic_count, frequencies = lexicon.score(split_text)
 
     # Calculate complexity score: difference between counts of complex and reductionistic words
     complexity_score = complex_count - reductionistic_count
 
-    return int(complexity_score), filtered_word_frequencies
+    return int(complexity_score), lexicon.word_frequencies(frequencies)
+
+
+def paragraph_scores(lexicon, split_text):
+    """Returns the score columns of a Paragraph row for a list of words."""
+    complex_count, reductionistic_count, _ = lexicon.score(split_text)
+
+    return {
+        'score': int(complex_count - reductionistic_count),
+        'complex_score': int(complex_count),
+        'reductionistic_score': int(reductionistic_count),
+    }
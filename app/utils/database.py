@@ -1,18 +1,90 @@
+import itertools
 import json
 import os
+import pathlib
+import sqlite3
 import sys
+import zlib
 
-import pandas as pd
-from nltk.corpus import stopwords
-from sqlalchemy import (Column, DateTime, ForeignKey, Integer, String, Text,
-                        create_engine)
-from sqlalchemy.orm import Session, declarative_base, relationship
+from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Index, Integer,
+                        LargeBinary, Select, String, Text, bindparam, case,
+                        create_engine, delete, event, exists, func, insert,
+                        inspect, or_, select, text, update)
+from sqlalchemy.orm import Session, declarative_base, deferred, relationship
+from sqlalchemy.pool import QueuePool
 from utils.logging import build_logger
+from utils.paths import data_dir
 
-DB_ENGINE = create_engine('sqlite:///bigdata.db')
+log = build_logger(__name__)
 
 
-log = build_logger(__name__)
+DB_PATH = os.path.abspath(
+    os.environ.get('BIGDATA_DB_PATH', os.path.join(data_dir(), 'bigdata.db'))
+)
+
+# Applied to every new connection. WAL lets the dashboards read while the
+# ingestion writer commits, and with WAL synchronous=NORMAL only fsyncs at
+# checkpoints. Negative cache sizes are in KiB.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': 10_000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 2**20,
+    'synchronous': 'NORMAL',
+    'temp_store': 'MEMORY',
+}
+# The journal mode is a property of the database file, it is set by writers
+READ_ONLY_SKIPPED_PRAGMAS = ('journal_mode',)
+
+
+def create_db_engine(path=DB_PATH, read_only=False, pragmas=None):
+    """
+    Creates an engine for the SQLite database at `path` that applies the
+    `pragmas` (SQLITE_PRAGMAS by default) to every connection it opens.
+
+    Args:
+        path: Location of the database file.
+        read_only: Open the file read-only, for the pages that only show
+            data. The database must already exist.
+        pragmas: Pragma names and values, replacing SQLITE_PRAGMAS.
+
+    Returns:
+        Engine: The configured engine.
+    """
+    pragmas = dict(SQLITE_PRAGMAS if pragmas is None else pragmas)
+
+    if read_only:
+        for pragma in READ_ONLY_SKIPPED_PRAGMAS:
+            pragmas.pop(pragma, None)
+        pragmas['query_only'] = 'ON'
+        uri = f"{pathlib.Path(path).as_uri()}?mode=ro"
+        engine = create_engine(
+            'sqlite://',
+            creator=lambda: sqlite3.connect(
+                uri, uri=True, check_same_thread=False
+            ),
+            # Every Dash request thread can read at the same time
+            poolclass=QueuePool,
+            pool_size=8,
+            max_overflow=8
+        )
+    else:
+        engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+    return engine
+
+
+DB_ENGINE = create_db_engine()
+
+# Number of pages scored and committed together during ingestion
+PAGE_BATCH_SIZE = 16
 
 
 SQLAlchemyBaseClass = declarative_base()
@@ -23,13 +95,21 @@ class Magazine(SQLAlchemyBaseClass):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String)
-    hash = Column(String)
+    hash = Column(String, index=True)
     creation_date = Column(DateTime)
+    # Number of pages in the PDF, a magazine with fewer stored pages was
+    # interrupted during ingestion and is resumed when it is queued again
+    page_count = Column(Integer)
     pages = relationship(
         "Page",
         back_populates="magazine",
         cascade="all"
     )
+    summary = relationship(
+        "MagazineSummary",
+        cascade="all",
+        uselist=False
+    )
 
 
 class Page(SQLAlchemyBaseClass):
@@ -37,17 +117,104 @@ class Page(SQLAlchemyBaseClass):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     magazine_id = Column(Integer, ForeignKey('Magazine.id'))
-    raw_text = Column(Text)
-    page_text = Column(Text)
-    tokenized_text = Column(Text)
-    complexity_scores = Column(Text)
+    page_number = Column(Integer)
+    # Extracted text of the page, see encode_raw_text. Only read after
+    # ingestion when asked for, ORM queries load it on first access
+    raw_text = deferred(Column(LargeBinary))
     page_topic = Column(Text)
-    par_topics = Column(Text)
+    # Wordlist version the complexity scores were calculated with
+    scored_version = Column(Integer)
+    # Aggregates of the paragraph scores, written together with the scores
+    # so the charts do not have to sum the paragraphs, see page_aggregates
+    total_score = Column(Integer)
+    positive_score = Column(Integer)
+    negative_score = Column(Integer)
+    paragraph_count = Column(Integer)
+    # Set once the words of the page are in the WordOccurrence index, also
+    # for pages without words, see index_unindexed_pages
+    indexed = Column(Boolean)
 
     magazine = relationship(
         "Magazine",
         back_populates="pages"
     )
+    paragraphs = relationship(
+        "Paragraph",
+        back_populates="page",
+        cascade="all",
+        order_by="Paragraph.paragraph_index"
+    )
+
+    __table_args__ = (
+        # Pages of a magazine, in order, and its stored page numbers
+        Index('ix_Page_magazine_id_page_number', 'magazine_id', 'page_number'),
+    )
+
+
+class Paragraph(SQLAlchemyBaseClass):
+    """A paragraph of a page with its complexity score and topic."""
+    __tablename__ = 'Paragraph'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    page_id = Column(Integer, ForeignKey('Page.id'), nullable=False)
+    paragraph_index = Column(Integer, nullable=False)
+    # Vocabulary ids of the cleaned words, as an array of TOKEN_DTYPE
+    tokens = Column(LargeBinary)
+    # Complex minus reductionistic part, the parts are the summed word weights
+    score = Column(Integer)
+    complex_score = Column(Integer)
+    reductionistic_score = Column(Integer)
+    topic = Column(Text)
+
+    page = relationship(
+        "Page",
+        back_populates="paragraphs"
+    )
+
+    __table_args__ = (
+        Index(
+            'ix_Paragraph_page_id_paragraph_index',
+            'page_id',
+            'paragraph_index',
+            unique=True
+        ),
+        Index('ix_Paragraph_topic', 'topic'),
+    )
+
+
+class MagazineSummary(SQLAlchemyBaseClass):
+    """
+    Sums of the page aggregates of a magazine, refreshed by every write of
+    its pages or scores, see refresh_magazine_summaries.
+    """
+    __tablename__ = 'MagazineSummary'
+
+    magazine_id = Column(Integer, ForeignKey('Magazine.id'), primary_key=True)
+    # Number of stored pages
+    page_count = Column(Integer)
+    paragraph_count = Column(Integer)
+    total_score = Column(Integer)
+    positive_score = Column(Integer)
+    negative_score = Column(Integer)
+
+
+class Vocabulary(SQLAlchemyBaseClass):
+    """Every word that occurs in a paragraph, the ids are never reused."""
+    __tablename__ = 'Vocabulary'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    word = Column(String, unique=True, nullable=False)
+
+
+class WordOccurrence(SQLAlchemyBaseClass):
+    """Inverted index: the paragraphs (and positions) a word occurs in."""
+    __tablename__ = 'WordOccurrence'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    word = Column(String, index=True)
+    page_id = Column(Integer, ForeignKey('Page.id'), index=True)
+    paragraph_index = Column(Integer)
+    positions = Column(Text)
 
 
 # team 1 model
@@ -56,7 +223,7 @@ class WordObject(SQLAlchemyBaseClass):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     word = Column(String, unique=True)
-    type = Column(String)  # reductionistic = 1, complex = 2, antonym = 3
+    type = Column(String, index=True)  # reductionistic = 1, complex = 2, antonym = 3
     weight = Column(Integer)
 
 
@@ -66,10 +233,104 @@ class BadWord(SQLAlchemyBaseClass):
     word = Column(String, unique=True)
 
 
-SQLAlchemyBaseClass.metadata.create_all(DB_ENGINE)
+class CacheVersion(SQLAlchemyBaseClass):
+    """Version counters for caches built from editable tables."""
+    __tablename__ = 'CacheVersion'
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# Indexes of earlier versions that a newer index has made redundant
+OBSOLETE_INDEXES = ['ix_Page_magazine_id']
+
+# Page columns of earlier versions that held the paragraphs of a page as
+# parallel JSON lists, moved to the Paragraph table by migrate_page_paragraphs
+LEGACY_PARAGRAPH_COLUMNS = [
+    'page_text',
+    'tokenized_text',
+    'complexity_scores',
+    'par_topics'
+]
+# Number of pages moved to the Paragraph table in one transaction
+MIGRATION_BATCH_SIZE = 500
+# Number of magazines whose pages are numbered in one transaction
+PAGE_NUMBER_MIGRATION_MAGAZINES = 20
+
+# Paragraph tokens are stored as little-endian uint32 Vocabulary ids, and
+# decoded with numpy.frombuffer without parsing
+TOKEN_DTYPE = '<u4'
+# Number of words looked up in one `IN (...)` query
+VOCABULARY_LOOKUP_SIZE = 500
+
+# Words of the Vocabulary by id, loaded from the database by vocabulary_words
+_vocabulary = None
+
+# Page.raw_text is zlib compressed JSON, earlier versions stored the JSON as
+# text until compact_database compresses it
+RAW_TEXT_COMPRESSION_LEVEL = 6
+
+WORDLIST_CACHE = 'wordlist'
+STOPWORDS_CACHE = 'badwords'
+
+
+def upgrade_schema(engine):
+    """
+    Brings an existing database up to date with the models. `create_all`
+    only creates missing tables, so columns and indexes added to existing
+    tables are added here, and indexes that were replaced are dropped. Safe
+    to run on every start.
+    """
+    SQLAlchemyBaseClass.metadata.create_all(engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLAlchemyBaseClass.metadata.sorted_tables:
+            existing_columns = {
+                column['name'] for column in inspector.get_columns(table.name)
+            }
+
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    column_type = column.type.compile(engine.dialect)
+                    connection.execute(text(
+                        f'ALTER TABLE "{table.name}" '
+                        f'ADD COLUMN "{column.name}" {column_type}'
+                    ))
+
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+
+        for index in OBSOLETE_INDEXES:
+            connection.execute(text(f'DROP INDEX IF EXISTS "{index}"'))
+
+        # Refreshes the statistics the query planner picks indexes with
+        connection.execute(text('PRAGMA optimize'))
+
+
+# Opens its first connection when it is first used, a read-only connection
+# cannot create the file, so init_db must have run by then. Worker processes
+# use it without running init_db, the app has created the file before they
+# start.
+DB_READ_ENGINE = create_db_engine(read_only=True)
+
+
+def dispose_inherited_connections():
+    """Drops the pooled connections a forked process inherited."""
+    DB_ENGINE.dispose(close=False)
+    DB_READ_ENGINE.dispose(close=False)
 
 
 def init_db(debug: bool):
+    """
+    Creates or upgrades the database, fills the word lists of a new database
+    and migrates data stored by earlier versions. Run once, by the app
+    before it starts, and not by the processes it starts.
+    """
+    from nltk.corpus import stopwords
+
+    upgrade_schema(DB_ENGINE)
+
     with Session(DB_ENGINE) as session:
         if session.query(BadWord).first() is None:
             wordlist = [{"word": word} for word in stopwords.words('dutch')] \
@@ -80,87 +341,1021 @@ def init_db(debug: bool):
             wordlist = load_word_data('assets' + os.sep + 'wordlist.json', debug)
             insert_first_wordlist(wordlist)
 
+    migrate_page_paragraphs()
+    migrate_page_numbers()
+    migrate_paragraph_tokens()
+    migrate_page_aggregates()
+    index_unindexed_pages()
 
-def add_magazine(df, hash, metadata, filename):
-    from utils.complexity import calc_complexity
 
-    with Session(DB_ENGINE) as session:
-        # magazine table append model
-        new_magazine = Magazine(
-            name=os.path.basename(filename),
-            hash=hash,
-            creation_date=metadata.get('CreationDate', None)
+def migrate_page_paragraphs(engine=None):
+    """
+    Moves the paragraphs of pages stored before the Paragraph table existed
+    out of the JSON columns of Page. The old scores do not keep the complex
+    and reductionistic parts apart, so the paragraphs are scored again with
+    the current Wordlist. Every batch of pages is moved in its own
+    transaction, an interrupted migration continues where it stopped.
+
+    Returns:
+        int: The number of migrated pages.
+    """
+    from utils.complexity import Lexicon
+
+    engine = engine or DB_ENGINE
+    columns = {column['name'] for column in inspect(engine).get_columns('Page')}
+    if not set(LEGACY_PARAGRAPH_COLUMNS) <= columns:
+        return 0
+
+    with Session(engine) as session:
+        lexicon = Lexicon.from_session(session)
+
+    clear_columns = ', '.join(
+        f'"{column}" = NULL' for column in LEGACY_PARAGRAPH_COLUMNS
+    )
+    migrated = 0
+
+    while True:
+        with engine.begin() as connection:
+            pages = connection.execute(
+                text(
+                    'SELECT id, page_text, par_topics FROM "Page" '
+                    'WHERE page_text IS NOT NULL ORDER BY id LIMIT :limit'
+                ),
+                {'limit': MIGRATION_BATCH_SIZE}
+            ).all()
+            if not pages:
+                break
+
+            paragraphs = []
+            for page_id, page_text, par_topics in pages:
+                split_text = json.loads(page_text)
+                topics = json.loads(par_topics) if par_topics else None
+                paragraphs.extend(build_paragraphs(
+                    lexicon,
+                    page_id,
+                    split_text,
+                    topics if topics and len(topics) == len(split_text) else None
+                ))
+
+            if paragraphs:
+                encode_paragraphs(connection, paragraphs)
+                connection.execute(insert(Paragraph), paragraphs)
+
+            connection.execute(
+                text(
+                    f'UPDATE "Page" SET {clear_columns}, '
+                    f'scored_version = :version WHERE id IN :ids'
+                ).bindparams(bindparam('ids', expanding=True)),
+                {
+                    'version': lexicon.version,
+                    'ids': [page_id for page_id, _, _ in pages]
+                }
+            )
+
+        migrated += len(pages)
+        log.info(f'Moved the paragraphs of {migrated} pages to the Paragraph table')
+
+    return migrated
+
+
+def migrate_page_numbers(engine=None):
+    """
+    Numbers the pages stored before Page had a page number. Pages were
+    stored in order, so a page is numbered by its position in its magazine,
+    as the page results listed it before. Every batch of magazines is
+    numbered in its own transaction.
+
+    Returns:
+        int: The number of numbered pages.
+    """
+    engine = engine or DB_ENGINE
+    migrated = 0
+
+    while True:
+        with engine.begin() as connection:
+            magazine_ids = connection.execute(
+                select(Page.magazine_id)
+                .where(Page.page_number.is_(None))
+                .where(Page.magazine_id.is_not(None))
+                .distinct()
+                .limit(PAGE_NUMBER_MIGRATION_MAGAZINES)
+            ).scalars().all()
+            if not magazine_ids:
+                break
+
+            numbered = (
+                select(
+                    Page.id,
+                    func.row_number().over(
+                        partition_by=Page.magazine_id,
+                        order_by=Page.id
+                    ).label('page_number')
+                )
+                .where(Page.magazine_id.in_(magazine_ids))
+                .subquery()
+            )
+            result = connection.execute(
+                update(Page)
+                .where(Page.id == numbered.c.id)
+                .where(Page.page_number.is_(None))
+                .values(page_number=numbered.c.page_number)
+            )
+
+        migrated += result.rowcount
+        log.info(f'Numbered {migrated} pages')
+
+    return migrated
+
+
+def migrate_paragraph_tokens(engine=None):
+    """
+    Encodes paragraph tokens stored as JSON lists of words, by the versions
+    before the Vocabulary table existed, as arrays of Vocabulary ids.
+
+    Returns:
+        int: The number of encoded paragraphs.
+    """
+    engine = engine or DB_ENGINE
+    migrated = 0
+
+    while True:
+        with engine.begin() as connection:
+            paragraphs = connection.execute(
+                text(
+                    'SELECT id, tokens FROM "Paragraph" '
+                    "WHERE typeof(tokens) = 'text' LIMIT :limit"
+                ),
+                {'limit': MIGRATION_BATCH_SIZE * 8}
+            ).all()
+            if not paragraphs:
+                break
+
+            rows = [
+                {'id': paragraph_id, 'tokens': json.loads(tokens)}
+                for paragraph_id, tokens in paragraphs
+            ]
+            encode_paragraphs(connection, rows)
+            connection.execute(
+                text('UPDATE "Paragraph" SET tokens = :tokens WHERE id = :id'),
+                rows
+            )
+
+        migrated += len(paragraphs)
+        log.info(f'Encoded the tokens of {migrated} paragraphs')
+
+    return migrated
+
+
+def migrate_page_aggregates(engine=None):
+    """
+    Calculates the score aggregates of pages stored before Page had them,
+    and the summaries of their magazines.
+
+    Returns:
+        int: The number of updated pages.
+    """
+    engine = engine or DB_ENGINE
+    migrated = 0
+
+    while True:
+        with engine.begin() as connection:
+            page_ids = connection.execute(
+                select(Page.id)
+                .where(Page.paragraph_count.is_(None))
+                .limit(MIGRATION_BATCH_SIZE)
+            ).scalars().all()
+            if not page_ids:
+                break
+
+            refresh_page_aggregates(connection, page_ids)
+
+        migrated += len(page_ids)
+        log.info(f'Calculated the score aggregates of {migrated} pages')
+
+    if migrated:
+        with engine.begin() as connection:
+            refresh_magazine_summaries(connection)
+
+    return migrated
+
+
+def compact_database(engine=None):
+    """
+    Upgrades the schema and compresses the raw text of pages stored before
+    it was compressed, then
+    rewrites the database file with VACUUM so the freed space is returned to
+    the file system. The app should not be running.
+
+    Returns:
+        tuple: The size in bytes of the database, with its write-ahead log,
+            before and after compacting.
+    """
+    engine = engine or DB_ENGINE
+    upgrade_schema(engine)
+    before = database_size(engine.url.database)
+    compressed = 0
+
+    while True:
+        with engine.begin() as connection:
+            pages = connection.execute(
+                text(
+                    'SELECT id, raw_text FROM "Page" '
+                    "WHERE typeof(raw_text) = 'text' LIMIT :limit"
+                ),
+                {'limit': MIGRATION_BATCH_SIZE}
+            ).all()
+            if not pages:
+                break
+
+            connection.execute(
+                text('UPDATE "Page" SET raw_text = :raw_text WHERE id = :id'),
+                [
+                    {
+                        'id': page_id,
+                        'raw_text': zlib.compress(
+                            raw_text.encode('utf-8'),
+                            RAW_TEXT_COMPRESSION_LEVEL
+                        )
+                    }
+                    for page_id, raw_text in pages
+                ]
+            )
+
+        compressed += len(pages)
+        log.info(f'Compressed the raw text of {compressed} pages')
+
+    # VACUUM can not run inside a transaction
+    with engine.connect().execution_options(
+        isolation_level='AUTOCOMMIT'
+    ) as connection:
+        connection.execute(text('VACUUM'))
+        connection.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+
+    return before, database_size(engine.url.database)
+
+
+def database_size(path):
+    return sum(
+        os.path.getsize(file)
+        for file in (path, path + '-wal')
+        if os.path.exists(file)
+    )
+
+
+def intern_words(connection, words):
+    """
+    Returns {word: Vocabulary id} for `words`, adding the words that are not
+    in the Vocabulary yet. Must run inside the transaction that stores the
+    ids, a concurrent writer may add the same words.
+    """
+    words = list(set(words))
+    word_ids = {}
+
+    def lookup(words):
+        for i in range(0, len(words), VOCABULARY_LOOKUP_SIZE):
+            word_ids.update(connection.execute(
+                select(Vocabulary.word, Vocabulary.id)
+                .where(Vocabulary.word.in_(words[i:i + VOCABULARY_LOOKUP_SIZE]))
+            ).all())
+
+    lookup(words)
+    missing = [word for word in words if word not in word_ids]
+
+    if missing:
+        connection.execute(
+            insert(Vocabulary).prefix_with('OR IGNORE'),
+            [{'word': word} for word in missing]
         )
+        lookup(missing)
+
+    return word_ids
 
-        session.add(new_magazine)
 
-        badwords = [bw.word for bw in session.query(BadWord).all()]
+def encode_paragraphs(connection, paragraphs):
+    """Replaces the word lists in `tokens` of Paragraph rows by their ids."""
+    import numpy
+
+    word_ids = intern_words(
+        connection,
+        (word for row in paragraphs for word in row['tokens'])
+    )
 
-        # setup voor page table append
-        for _, row in df.iterrows():
-            complexity_list = []
+    for row in paragraphs:
+        row['tokens'] = numpy.fromiter(
+            (word_ids[word] for word in row['tokens']),
+            dtype=TOKEN_DTYPE,
+            count=len(row['tokens'])
+        ).tobytes()
+
+
+def token_ids(tokens):
+    """Returns the Vocabulary ids in a stored `tokens` value as an array."""
+    import numpy
+
+    return numpy.frombuffer(tokens, dtype=TOKEN_DTYPE)
+
+
+def vocabulary_words(ids):
+    """
+    Returns the words of an array of Vocabulary ids as an array. The
+    vocabulary is loaded once per process, and again when it meets ids that
+    were added after that.
+    """
+    global _vocabulary
+    import numpy
+
+    url = str(DB_READ_ENGINE.url)
+    if (
+        _vocabulary is None
+        or _vocabulary[0] != url
+        or (len(ids) and ids.max() >= len(_vocabulary[1]))
+    ):
+        with Session(DB_READ_ENGINE) as session:
+            rows = session.execute(select(Vocabulary.id, Vocabulary.word)).all()
+
+        words = numpy.empty(max((i for i, _ in rows), default=0) + 1, dtype=object)
+        for word_id, word in rows:
+            words[word_id] = word
+        _vocabulary = (url, words)
+
+    return _vocabulary[1][ids]
+
+
+def decode_paragraphs(tokens):
+    """
+    Returns the words of a sequence of stored `tokens` values, as a list per
+    value. All values are decoded at once, which is much faster than one by
+    one for paragraph sized arrays.
+    """
+    tokens = list(tokens)
+    words = vocabulary_words(token_ids(b''.join(tokens))).tolist()
+    token_size = token_ids(b'').itemsize
+
+    paragraphs = []
+    start = 0
+    for value in tokens:
+        end = start + len(value) // token_size
+        paragraphs.append(words[start:end])
+        start = end
+
+    return paragraphs
+
+
+def encode_raw_text(raw_text):
+    """Returns the raw text of a page as stored in Page.raw_text."""
+    return zlib.compress(
+        json.dumps(raw_text).encode('utf-8'),
+        RAW_TEXT_COMPRESSION_LEVEL
+    )
 
-            # complexity score calculation
-            for paragraph in row['split_text']:
-                score = calc_complexity(session, paragraph)
-                complexity_list.append(score)
 
-            # convert data for sqlite compatibility
-            raw_text_json = json.dumps(row['Page Text'])
-            page_text_json = json.dumps(row['split_text'])
+def decode_raw_text(value):
+    """Returns the raw text of a page from a stored Page.raw_text value."""
+    if value is None:
+        return None
+    # Stored uncompressed, by a version before compact_database
+    if isinstance(value, str):
+        return json.loads(value)
 
-            filtered_split_text = [
-                [word for word in paragraph if word not in badwords] for paragraph in row['split_text']]
+    return json.loads(zlib.decompress(value))
 
-            tokenized_text_json = json.dumps(filtered_split_text)
-            score_json = json.dumps(complexity_list)
 
-            # page table append
-            new_page = Page(
-                magazine=new_magazine,
-                raw_text=raw_text_json,
-                page_text=page_text_json,
-                tokenized_text=tokenized_text_json,
-                complexity_scores=score_json
+def build_paragraphs(lexicon, page_id, split_text, topics=None):
+    """
+    Scores the paragraphs of one page into Paragraph rows, the words in
+    `tokens` are encoded when the rows are written.
+    """
+    from utils.complexity import paragraph_scores
+
+    return [
+        {
+            'page_id': page_id,
+            'paragraph_index': paragraph_index,
+            'tokens': paragraph,
+            **paragraph_scores(lexicon, paragraph),
+            'topic': topics[paragraph_index] if topics else None
+        }
+        for paragraph_index, paragraph in enumerate(split_text)
+    ]
+
+
+def page_aggregates(paragraphs):
+    """Returns the aggregate Page columns of the scored Paragraph rows of a page."""
+    scores = [paragraph['score'] for paragraph in paragraphs]
+
+    return {
+        'total_score': sum(scores),
+        'positive_score': sum(score for score in scores if score > 0),
+        'negative_score': sum(score for score in scores if score < 0),
+        'paragraph_count': len(scores)
+    }
+
+
+def refresh_page_aggregates(connection, page_ids):
+    """Recalculates the aggregate Page columns from the stored paragraphs."""
+    def paragraph_sum(expression):
+        return (
+            select(func.coalesce(func.sum(expression), 0))
+            .where(Paragraph.page_id == Page.id)
+            .scalar_subquery()
+        )
+
+    connection.execute(
+        update(Page)
+        .where(Page.id.in_(list(page_ids)))
+        .values(
+            total_score=paragraph_sum(Paragraph.score),
+            positive_score=paragraph_sum(
+                case((Paragraph.score > 0, Paragraph.score), else_=0)
+            ),
+            negative_score=paragraph_sum(
+                case((Paragraph.score < 0, Paragraph.score), else_=0)
+            ),
+            paragraph_count=(
+                select(func.count(Paragraph.id))
+                .where(Paragraph.page_id == Page.id)
+                .scalar_subquery()
             )
+        )
+    )
 
-            session.add(new_page)
 
-        session.commit()
+def refresh_magazine_summaries(connection, magazine_ids=None):
+    """
+    Recalculates the MagazineSummary rows of the given magazines, or of all
+    magazines, from the aggregates of their pages.
+    """
+    pages = (
+        select(
+            Page.magazine_id,
+            func.count(Page.id),
+            func.coalesce(func.sum(Page.paragraph_count), 0),
+            func.coalesce(func.sum(Page.total_score), 0),
+            func.coalesce(func.sum(Page.positive_score), 0),
+            func.coalesce(func.sum(Page.negative_score), 0)
+        )
+        .group_by(Page.magazine_id)
+    )
+    summaries = delete(MagazineSummary)
+    if magazine_ids is not None:
+        magazine_ids = list(magazine_ids)
+        pages = pages.where(Page.magazine_id.in_(magazine_ids))
+        summaries = summaries.where(MagazineSummary.magazine_id.in_(magazine_ids))
+
+    connection.execute(summaries)
+    connection.execute(
+        insert(MagazineSummary).from_select(
+            [
+                'magazine_id',
+                'page_count',
+                'paragraph_count',
+                'total_score',
+                'positive_score',
+                'negative_score'
+            ],
+            pages
+        )
+    )
+
+
+def build_word_occurrences(page_id, split_text):
+    """Builds the inverted index rows for the paragraphs of one page."""
+    rows = []
+
+    for paragraph_index, paragraph in enumerate(split_text):
+        positions = {}
+        for position, word in enumerate(paragraph):
+            positions.setdefault(word, []).append(position)
+
+        rows.extend(
+            {
+                'word': word,
+                'page_id': page_id,
+                'paragraph_index': paragraph_index,
+                'positions': json.dumps(word_positions)
+            }
+            for word, word_positions in positions.items()
+        )
+
+    return rows
+
+
+def index_unindexed_pages(engine=None):
+    """
+    Adds the words of the pages that are not marked as indexed to the
+    inverted index. These are the pages stored before the index existed, and
+    pages stored before the mark existed, which are only marked. Every range
+    of pages is indexed in its own transaction, an interrupted run continues
+    where it stopped.
+
+    Returns:
+        int: The number of marked pages.
+    """
+    engine = engine or DB_ENGINE
+    marked = 0
+    last_page_id = 0
+
+    while True:
+        with engine.begin() as connection:
+            page_ids = connection.execute(
+                select(Page.id)
+                .where(Page.id > last_page_id)
+                .where(Page.indexed.is_(None))
+                .order_by(Page.id)
+                .limit(MIGRATION_BATCH_SIZE)
+            ).scalars().all()
+            if not page_ids:
+                break
+
+            paragraphs = connection.execute(
+                select(Paragraph.page_id, Paragraph.tokens)
+                .where(Paragraph.page_id.in_(page_ids))
+                .where(~exists().where(WordOccurrence.page_id == Paragraph.page_id))
+                .order_by(Paragraph.page_id, Paragraph.paragraph_index)
+            ).all()
+
+            words = decode_paragraphs(tokens for _, tokens in paragraphs)
+            pages = itertools.groupby(
+                zip(paragraphs, words),
+                key=lambda paragraph: paragraph[0][0]
+            )
+            rows = []
+            for page_id, page_paragraphs in pages:
+                split_text = [paragraph_words for _, paragraph_words in page_paragraphs]
+                rows.extend(build_word_occurrences(page_id, split_text))
+
+            if rows:
+                connection.execute(insert(WordOccurrence), rows)
+            connection.execute(
+                update(Page).where(Page.id.in_(page_ids)).values(indexed=True)
+            )
+
+        marked += len(page_ids)
+        last_page_id = page_ids[-1]
+        log.info(f'Indexed the words of {marked} pages')
+
+    return marked
 
 
-def recalculate_complexity_for_all_magazines():
-    from utils.complexity import calc_complexity
+def add_magazine(pages, hash, metadata, filename, lexicon=None):
+    """
+    Stores a magazine from a stream of (page number, page text, split text)
+    tuples. Pages are scored and written in batches of PAGE_BATCH_SIZE, each
+    in its own transaction, so memory use does not grow with the size of the
+    magazine and a failure late in a document keeps the pages already stored.
+    """
+    magazine_id = create_magazine(hash, metadata, filename)
+    add_magazine_pages(magazine_id, pages, lexicon)
+
+    return magazine_id
+
+
+def create_magazine(hash, metadata, filename, page_count=None):
+    with DB_ENGINE.begin() as connection:
+        return connection.execute(
+            insert(Magazine).values(
+                name=os.path.basename(filename),
+                hash=hash,
+                creation_date=metadata.get('CreationDate', None),
+                page_count=page_count
+            )
+        ).inserted_primary_key[0]
+
+
+def add_magazine_pages(magazine_id, pages, lexicon=None, write_batch=None):
+    """
+    Scores and stores a stream of (page number, page text, split text) tuples
+    for an existing magazine. Every committed batch is a checkpoint: the
+    pages in it are not processed again when the magazine is resumed.
+
+    `write_batch` receives every scored batch of PAGE_BATCH_SIZE pages, by
+    default each batch is written in its own transaction.
+    """
+    from utils.complexity import get_lexicon
+
+    if lexicon is None:
+        lexicon = get_lexicon()
+    if write_batch is None:
+        write_batch = write_page_batch
+
+    batch = []
+    for page in pages:
+        batch.append(page)
+
+        if len(batch) >= PAGE_BATCH_SIZE:
+            write_batch(build_page_batch(magazine_id, batch, lexicon))
+            batch = []
+
+    if batch:
+        write_batch(build_page_batch(magazine_id, batch, lexicon))
+
+
+def build_page_batch(magazine_id, pages, lexicon):
+    """
+    Scores a batch of pages without touching the database.
+
+    Returns:
+        list: A (Page row, Paragraph rows, WordOccurrence rows) tuple per
+            page, the page ids of the paragraphs and occurrences are filled
+            in when the batch is written.
+    """
+    batch = []
+    for page_number, raw_text, split_text in pages:
+        paragraphs = build_paragraphs(lexicon, None, split_text)
+        batch.append((
+            {
+                'magazine_id': magazine_id,
+                'page_number': page_number,
+                'raw_text': encode_raw_text(raw_text),
+                'scored_version': lexicon.version,
+                'indexed': True,
+                **page_aggregates(paragraphs)
+            },
+            paragraphs,
+            build_word_occurrences(None, split_text)
+        ))
 
+    return batch
+
+
+def write_page_batch(batch):
+    write_page_batches([batch])
+
+
+def write_page_batches(batches):
+    """Writes any number of scored page batches in a single transaction."""
+    pages = [page for batch in batches for page in batch]
+    if not pages:
+        return
+
+    with DB_ENGINE.begin() as connection:
+        page_ids = connection.execute(
+            insert(Page).returning(Page.id, sort_by_parameter_order=True),
+            [page_row for page_row, _, _ in pages]
+        ).scalars().all()
+
+        paragraphs = []
+        occurrences = []
+        for page_id, (_, page_paragraphs, page_occurrences) in zip(page_ids, pages):
+            for row in (*page_paragraphs, *page_occurrences):
+                row['page_id'] = page_id
+            paragraphs.extend(page_paragraphs)
+            occurrences.extend(page_occurrences)
+
+        if paragraphs:
+            encode_paragraphs(connection, paragraphs)
+            connection.execute(insert(Paragraph), paragraphs)
+        if occurrences:
+            connection.execute(insert(WordOccurrence), occurrences)
+
+        refresh_magazine_summaries(
+            connection,
+            {page_row['magazine_id'] for page_row, _, _ in pages}
+        )
+
+
+def find_magazine(hash):
+    """
+    Returns the (id, page count, stored page count) of the magazine stored
+    with this file hash, or None.
+    """
     with Session(DB_ENGINE) as session:
-        # Query all existing pages of all magazines
-        pages = session.query(Page).all()
+        return session.execute(
+            select(
+                Magazine.id,
+                Magazine.page_count,
+                select(func.count(Page.id))
+                .where(Page.magazine_id == Magazine.id)
+                .scalar_subquery()
+            )
+            .where(Magazine.hash == hash)
+            .order_by(Magazine.id)
+            .limit(1)
+        ).first()
 
-        # Recalculate complexity for each page
-        for page in pages:
-            split_text = json.loads(page.page_text)
 
-            page.complexity_scores = json.dumps([
-                calc_complexity(session, paragraph)
-                for paragraph in split_text
-            ])
+def is_completely_stored(stored):
+    """Tells if a find_magazine result has all of its pages stored."""
+    magazine_id, page_count, stored_pages = stored
+    return page_count is None or stored_pages >= page_count
 
-        # Commit all changes to the database
-        session.commit()
 
+def magazine_is_stored(hash):
+    stored = find_magazine(hash)
+    return stored is not None and is_completely_stored(stored)
 
-def get_table_as_df(table):
-    return pd.read_sql_table(table.__tablename__, DB_ENGINE)
+
+def completely_stored_magazines():
+    """
+    Returns a select of the ids of the magazines with all of their pages
+    stored. Magazines are registered before their pages are written, so the
+    reads leave out the ones that are still being ingested, or whose
+    ingestion failed or was interrupted.
+    """
+    return (
+        select(Magazine.id)
+        .outerjoin(MagazineSummary, MagazineSummary.magazine_id == Magazine.id)
+        .where(or_(
+            Magazine.page_count.is_(None),
+            func.coalesce(MagazineSummary.page_count, 0) >= Magazine.page_count
+        ))
+    )
 
 
-def delete_row(table, row):
+def stored_page_counts(magazine_ids):
+    """Returns {magazine id: number of stored pages} for the given magazines."""
     with Session(DB_ENGINE) as session:
-        object = session.query(table).filter_by(id=row).first()
-        if object is not None:
-            session.delete(object)
-            session.commit()
-        else:
-            log.info('row not found')
+        return dict(session.execute(
+            select(Page.magazine_id, func.count(Page.id))
+            .where(Page.magazine_id.in_(list(magazine_ids)))
+            .group_by(Page.magazine_id)
+        ).all())
+
+
+def stored_page_numbers(magazine_id):
+    with Session(DB_ENGINE) as session:
+        return set(session.scalars(
+            select(Page.page_number).where(Page.magazine_id == magazine_id)
+        ))
+
+
+def page_paragraphs(magazine_id, page_number):
+    """Returns the (tokens, topic) of the paragraphs of one page, in order."""
+    with Session(DB_READ_ENGINE) as session:
+        paragraphs = session.execute(
+            select(Paragraph.tokens, Paragraph.topic)
+            .join(Page, Page.id == Paragraph.page_id)
+            .where(Page.magazine_id == magazine_id)
+            .where(Page.magazine_id.in_(completely_stored_magazines()))
+            .where(Page.page_number == page_number)
+            .order_by(Paragraph.paragraph_index)
+        ).all()
+
+    return list(zip(
+        decode_paragraphs(tokens for tokens, _ in paragraphs),
+        (topic for _, topic in paragraphs)
+    ))
+
+
+def paragraph_topic_counts(magazine_id, page_number):
+    """Returns {topic: number of paragraphs} of one page."""
+    with Session(DB_READ_ENGINE) as session:
+        return dict(session.execute(
+            select(Paragraph.topic, func.count(Paragraph.id))
+            .join(Page, Page.id == Paragraph.page_id)
+            .where(Page.magazine_id == magazine_id)
+            .where(Page.magazine_id.in_(completely_stored_magazines()))
+            .where(Page.page_number == page_number)
+            .where(Paragraph.topic.is_not(None))
+            .group_by(Paragraph.topic)
+        ).all())
+
+
+def page_complexity(magazine_ids):
+    """
+    Returns the complexity of every page of the given magazines, ordered by
+    magazine and page number.
+
+    Returns:
+        list: (magazine id, page number, total, complex, reductionistic)
+            tuples. The total is the sum of the paragraph scores, the
+            complex and reductionistic sums only add up the positive and
+            negative paragraph scores.
+    """
+    with Session(DB_READ_ENGINE) as session:
+        return session.execute(
+            select(
+                Page.magazine_id,
+                Page.page_number,
+                Page.total_score,
+                Page.positive_score,
+                Page.negative_score
+            )
+            .where(Page.magazine_id.in_(list(magazine_ids)))
+            .where(Page.magazine_id.in_(completely_stored_magazines()))
+            .order_by(Page.magazine_id, Page.page_number)
+        ).all()
+
+
+def magazine_complexity(magazine_ids=None):
+    """Returns {magazine id: sum of its paragraph scores}."""
+    query = (
+        select(MagazineSummary.magazine_id, MagazineSummary.total_score)
+        .where(MagazineSummary.magazine_id.in_(completely_stored_magazines()))
+    )
+    if magazine_ids is not None:
+        query = query.where(MagazineSummary.magazine_id.in_(list(magazine_ids)))
+
+    with Session(DB_READ_ENGINE) as session:
+        return dict(session.execute(query).all())
+
+
+def page_topic_complexity(magazine_ids):
+    """
+    Returns a (page topic, mean complexity, page count) tuple per page topic
+    of the given magazines. The mean complexity is the mean over the pages of
+    the mean paragraph score of each page.
+    """
+    mean_score = Page.total_score * 1.0 / func.nullif(Page.paragraph_count, 0)
+
+    with Session(DB_READ_ENGINE) as session:
+        return [
+            (json.loads(page_topic), mean_complexity, page_count)
+            for page_topic, mean_complexity, page_count in session.execute(
+                select(Page.page_topic, func.avg(mean_score), func.count())
+                .where(Page.magazine_id.in_(list(magazine_ids)))
+                .where(Page.magazine_id.in_(completely_stored_magazines()))
+                .where(Page.page_topic.is_not(None))
+                .group_by(Page.page_topic)
+            )
+        ]
+
+
+def magazine_words(magazine_ids):
+    """Returns the words of every paragraph of the given magazines."""
+    with Session(DB_READ_ENGINE) as session:
+        tokens = b''.join(session.scalars(
+            select(Paragraph.tokens)
+            .join(Page, Page.id == Paragraph.page_id)
+            .where(Page.magazine_id.in_(list(magazine_ids)))
+            .where(Page.magazine_id.in_(completely_stored_magazines()))
+        ))
+
+    return vocabulary_words(token_ids(tokens)).tolist()
+
+
+def recalculate_complexity_for_all_magazines(progress_callback=None):
+    from utils.recalculation import recalculate_complexity
+
+    return recalculate_complexity(progress_callback=progress_callback)
+
+
+def get_cache_version(session, name):
+    version = session.get(CacheVersion, name)
+    return version.version if version is not None else 0
+
+
+def bump_cache_version(session, name):
+    """Invalidate every cache built from the table behind `name`.
+
+    The caller is responsible for committing the session.
+    """
+    version = session.get(CacheVersion, name)
+    if version is None:
+        version = CacheVersion(name=name, version=0)
+        session.add(version)
+
+    version.version += 1
+    return version.version
+
+
+def decode_json(values):
+    return [json.loads(value) if value is not None else None for value in values]
+
+
+# Columns read_table only reads when they are asked for by name
+UNREAD_COLUMNS = {
+    'Page': {'raw_text'},
+    'Paragraph': {'tokens'},
+}
+
+# Decoders of the stored column values, applied to a whole column at once
+COLUMN_DECODERS = {
+    'Page': {
+        'raw_text': lambda values: [decode_raw_text(value) for value in values],
+        'page_topic': decode_json
+    },
+    'Paragraph': {
+        'tokens': lambda values: decode_paragraphs(value or b'' for value in values)
+    },
+    'WordOccurrence': {'positions': decode_json},
+}
+
+
+def belongs_to_magazine(table):
+    return (
+        table is Magazine
+        or hasattr(table, 'magazine_id')
+        or hasattr(table, 'page_id')
+    )
+
+
+def magazine_filter(table, magazine_ids):
+    """
+    Restricts the rows of `table` to those of the given magazines, the ids
+    can also be given as a select.
+    """
+    if not isinstance(magazine_ids, Select):
+        magazine_ids = list(magazine_ids)
+
+    if table is Magazine:
+        return Magazine.id.in_(magazine_ids)
+    if hasattr(table, 'magazine_id'):
+        return table.magazine_id.in_(magazine_ids)
+    if hasattr(table, 'page_id'):
+        return table.page_id.in_(
+            select(Page.id).where(Page.magazine_id.in_(magazine_ids))
+        )
+
+    raise ValueError(f"{table.__tablename__} rows do not belong to a magazine")
+
+
+def read_table(
+    table,
+    columns=None,
+    magazine_ids=None,
+    where=(),
+    order_by=(),
+    chunksize=None
+):
+    """
+    Reads only the needed columns and rows of a table into a DataFrame.
+
+    Args:
+        table: The model of the table.
+        columns: Names of the columns to read, defaults to every column
+            except the large UNREAD_COLUMNS.
+        magazine_ids: Only read the rows belonging to these magazines.
+            Rows of magazines that are not completely stored are never read.
+        where: Further filter clauses.
+        order_by: Columns to sort the rows by.
+        chunksize: Read the rows in DataFrames of at most this many rows.
+
+    Returns:
+        DataFrame: The rows, with the JSON and token columns decoded. With a
+            chunksize, an iterator over the DataFrames of the chunks.
+    """
+    if columns is None:
+        unread = UNREAD_COLUMNS.get(table.__tablename__, set())
+        columns = [
+            column.key
+            for column in table.__table__.columns
+            if column.key not in unread
+        ]
+
+    query = select(*(getattr(table, column) for column in columns))
+    if magazine_ids is not None:
+        query = query.where(magazine_filter(table, magazine_ids))
+    if belongs_to_magazine(table):
+        query = query.where(
+            magazine_filter(table, completely_stored_magazines())
+        )
+    query = query.where(*where).order_by(*order_by)
+
+    decoders = COLUMN_DECODERS.get(table.__tablename__, {})
+    if chunksize is None:
+        with DB_READ_ENGINE.connect() as connection:
+            return rows_to_frame(connection.execute(query).all(), columns, decoders)
+
+    return _read_chunks(query, columns, decoders, chunksize)
+
+
+def _read_chunks(query, columns, decoders, chunksize):
+    with DB_READ_ENGINE.connect() as connection:
+        result = connection.execution_options(yield_per=chunksize).execute(query)
+        for rows in result.partitions():
+            yield rows_to_frame(rows, columns, decoders)
+
+
+def rows_to_frame(rows, columns, decoders):
+    # pandas is only needed by the pages, not by the ingestion workers
+    import pandas as pd
+
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    for column, decode in decoders.items():
+        if column in frame:
+            frame[column] = pd.Series(
+                decode(frame[column].tolist()),
+                index=frame.index,
+                dtype=object
+            )
+
+    return frame
+
+
+def delete_magazines(connection, magazine_ids):
+    """
+    Deletes magazines with everything stored for them: their pages with the
+    page topics and aggregates, the paragraphs with their scores and topics,
+    the word index rows and the magazine summaries. Every table is cleared
+    with one statement for all magazines, in the caller's transaction.
+    """
+    magazine_ids = list(magazine_ids)
+    if not magazine_ids:
+        return
+
+    page_ids = select(Page.id).where(Page.magazine_id.in_(magazine_ids))
+
+    connection.execute(
+        delete(WordOccurrence).where(WordOccurrence.page_id.in_(page_ids))
+    )
+    connection.execute(delete(Paragraph).where(Paragraph.page_id.in_(page_ids)))
+    connection.execute(delete(Page).where(Page.magazine_id.in_(magazine_ids)))
+    connection.execute(
+        delete(MagazineSummary)
+        .where(MagazineSummary.magazine_id.in_(magazine_ids))
+    )
+    connection.execute(delete(Magazine).where(Magazine.id.in_(magazine_ids)))
 
 
 def insert_first_wordlist(wordlist):
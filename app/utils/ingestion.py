@@ -0,0 +1,299 @@
+"""
+ingestion.py
+Schedules the processing of queued PDFs over a pool of worker processes.
+
+Workers stay alive between jobs and receive them over a pipe. The scheduler
+sleeps until a worker reports back, a worker dies or the earliest job
+deadline passes, instead of polling the workers in a loop. A worker that
+exceeds its deadline is terminated together with any processes it started,
+and replaced. Every job ends with a recorded outcome.
+
+Jobs can stream intermediate output back over the same pipe with
+send_output(), which the scheduler hands to its `output_callback`. Every
+worker has its own pipe, so terminating a worker cannot corrupt the output
+of the others.
+"""
+import time
+from collections import deque
+import multiprocessing
+from multiprocessing import cpu_count
+from multiprocessing.connection import wait
+
+import psutil
+
+from .logging import build_logger
+
+log = build_logger(__name__)
+
+JOB_OK = 'ok'
+JOB_DUPLICATE = 'duplicate'
+JOB_FAILED = 'failed'
+JOB_TIMED_OUT = 'timed out'
+JOB_CRASHED = 'crashed'
+JOB_REJECTED = 'rejected'
+
+DEFAULT_JOB_TIMEOUT = 90
+
+# Kinds of messages a worker sends to the scheduler
+MESSAGE_OUTPUT = 'output'
+MESSAGE_RESULT = 'result'
+
+# Pipe to the scheduler, set inside worker processes only
+_scheduler_connection = None
+
+
+class JobResult:
+    def __init__(self, name, status, detail=None, seconds=0.0, job=None):
+        self.name = name
+        self.status = status
+        self.detail = detail
+        self.seconds = seconds
+        # The arguments the job was run with
+        self.job = job
+
+    def __repr__(self):
+        return f"JobResult({self.name!r}, {self.status!r}, {self.detail!r})"
+
+
+def send_output(payload):
+    """Sends intermediate output of the running job to the scheduler."""
+    _scheduler_connection.send((MESSAGE_OUTPUT, payload))
+
+
+def worker_loop(connection, target):
+    """
+    Runs jobs received over `connection` until the scheduler sends None or
+    goes away. `target` returns the job status, exceptions mark the job failed.
+    """
+    global _scheduler_connection
+    _scheduler_connection = connection
+
+    while True:
+        try:
+            job = connection.recv()
+        except (EOFError, OSError):
+            break
+
+        if job is None:
+            break
+
+        try:
+            status = target(*job) or JOB_OK
+            connection.send((MESSAGE_RESULT, status, None))
+        except Exception as e:
+            connection.send((MESSAGE_RESULT, JOB_FAILED, f"{type(e).__name__}: {e}"))
+
+    connection.close()
+
+
+class Worker:
+    def __init__(self, target, context=multiprocessing):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=worker_loop,
+            args=(child_connection, target)
+        )
+        self.process.start()
+        child_connection.close()
+
+        self.job = None
+        self.name = None
+        self.started = None
+        self.timeout = None
+        self.deadline = None
+
+    def assign(self, name, job, timeout):
+        self.connection.send(job)
+        self.name = name
+        self.job = job
+        self.started = time.time()
+        self.timeout = timeout
+        self.deadline = self.started + timeout
+
+    def finish(self, status, detail=None):
+        result = JobResult(
+            self.name,
+            status,
+            detail,
+            time.time() - self.started,
+            self.job
+        )
+        self.job = self.name = self.started = self.timeout = self.deadline = None
+        return result
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+
+        self.process.join(5)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            # Listed first, the processes the job started are orphaned afterwards
+            descendants = child_processes(self.process.pid)
+            self.process.terminate()
+            terminate_processes(descendants)
+        self.process.join()
+        self.connection.close()
+
+
+def child_processes(pid):
+    """Returns the psutil Processes started by `pid` and by its children."""
+    try:
+        return psutil.Process(pid).children(recursive=True)
+    except psutil.NoSuchProcess:
+        return []
+
+
+def terminate_processes(processes, timeout=5):
+    """Terminates `processes`, the ones still running after `timeout` seconds are killed."""
+    for process in processes:
+        try:
+            process.terminate()
+        except psutil.NoSuchProcess:
+            pass
+
+    _, alive = psutil.wait_procs(processes, timeout=timeout)
+    for process in alive:
+        try:
+            process.kill()
+        except psutil.NoSuchProcess:
+            pass
+
+
+class IngestionScheduler:
+    """
+    Runs jobs on at most `workers` reusable worker processes.
+
+    Args:
+        target: Picklable function called in a worker as target(*job).
+        workers: Number of worker processes, defaults to the cpu count.
+        timeout: Seconds a job may take before it is terminated, for jobs
+            that do not set their own timeout.
+        context: Multiprocessing context the workers are started with,
+            defaults to the platform default start method.
+        output_callback: Called in the scheduling process with every payload
+            a job sends with send_output().
+    """
+
+    def __init__(
+        self,
+        target,
+        workers=None,
+        timeout=DEFAULT_JOB_TIMEOUT,
+        context=None,
+        output_callback=None
+    ):
+        self.target = target
+        self.workers = workers or cpu_count()
+        self.timeout = timeout
+        self.context = context or multiprocessing.get_context()
+        self.output_callback = output_callback
+
+    def start_worker(self):
+        return Worker(self.target, self.context)
+
+    def run(self, jobs, progress_callback=None, progress_interval=1.0):
+        """
+        Runs (name, job) or (name, job, timeout) tuples in the given order
+        and returns a JobResult per job, in the order the jobs finished.
+
+        `progress_callback` is called with the results so far when a job
+        finishes, and at least every `progress_interval` seconds.
+        """
+        pending = deque(jobs)
+        results = []
+        idle = []
+        busy = []
+
+        try:
+            for _ in range(min(self.workers, len(pending))):
+                idle.append(self.start_worker())
+
+            while pending or busy:
+                while idle and pending:
+                    worker = idle.pop()
+                    name, job, *timeout = pending.popleft()
+                    worker.assign(name, job, timeout[0] if timeout else self.timeout)
+                    busy.append(worker)
+
+                # Sleep until a worker reports, dies or reaches its deadline
+                timeout = max(0, min(w.deadline for w in busy) - time.time())
+                if progress_callback is not None:
+                    timeout = min(timeout, progress_interval)
+                ready = wait(
+                    [w.connection for w in busy] + [w.process.sentinel for w in busy],
+                    timeout
+                )
+
+                for worker in busy[:]:
+                    result = None
+
+                    if worker.connection in ready or worker.process.sentinel in ready:
+                        try:
+                            result = self.receive(worker)
+                            if result is not None:
+                                idle.append(worker)
+                        except (EOFError, OSError):
+                            worker.kill()
+                            result = worker.finish(
+                                JOB_CRASHED,
+                                f"Worker stopped with exit code "
+                                f"{worker.process.exitcode}"
+                            )
+                            if pending:
+                                idle.append(self.start_worker())
+
+                    if result is None and time.time() >= worker.deadline:
+                        worker.kill()
+                        result = worker.finish(
+                            JOB_TIMED_OUT,
+                            f"Terminated after exceeding {worker.timeout:.0f} seconds"
+                        )
+                        if pending:
+                            idle.append(self.start_worker())
+
+                    if result is not None:
+                        busy.remove(worker)
+                        results.append(result)
+                        self.log_result(result)
+
+                if progress_callback is not None:
+                    progress_callback(results)
+        finally:
+            for worker in idle:
+                worker.stop()
+            for worker in busy:
+                worker.kill()
+
+        return results
+
+    def receive(self, worker):
+        """
+        Handles the messages waiting on the pipe of `worker`. Returns the
+        JobResult if the job finished, otherwise None.
+        """
+        while worker.connection.poll():
+            kind, *message = worker.connection.recv()
+
+            if kind == MESSAGE_OUTPUT:
+                self.output_callback(*message)
+            else:
+                status, detail = message
+                return worker.finish(status, detail)
+
+        return None
+
+    @staticmethod
+    def log_result(result):
+        message = f"{result.name}: {result.status} after {result.seconds:.1f}s"
+        if result.detail:
+            message += f" ({result.detail})"
+
+        if result.status in (JOB_OK, JOB_DUPLICATE):
+            log.info(message)
+        else:
+            log.error(message)
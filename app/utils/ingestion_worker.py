@@ -0,0 +1,70 @@
+"""
+ingestion_worker.py
+Entry point of the ingestion worker processes.
+
+Workers only need to parse, clean, score and store PDFs, so this module keeps
+their import graph small: pdfminer, the cleaning and scoring code and the
+database models. Nothing here may import Dash, pandas or the topic modelling
+modules, which would load torch into every worker.
+
+On platforms that support it the workers are forked from a forkserver that
+has already imported this module, so starting a worker costs a fork instead
+of a fresh interpreter.
+"""
+import multiprocessing
+
+from . import pdf_processing as pdf
+from .database import add_magazine_pages, stored_page_numbers
+from .ingestion import JOB_OK, send_output
+from .logging import build_logger
+
+log = build_logger(__name__)
+
+
+def get_worker_context():
+    """
+    Returns the multiprocessing context the ingestion workers are started
+    with: a forkserver preloaded with this module, or spawn where forkserver
+    is not available (Windows).
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+
+    return multiprocessing.get_context('spawn')
+
+
+def upload_pdf_job(job, lexicon=None):
+    """
+    Runs a PreflightJob inside an ingestion worker, returns the job status.
+
+    Pages committed by an earlier, interrupted attempt are skipped, so a
+    retried job continues after the last committed page. The pages are laid
+    out in this process, the scheduler runs the page ranges of a large PDF
+    as separate jobs.
+    """
+    stored = stored_page_numbers(job.magazine_id)
+    page_numbers = [i for i in job.page_numbers if i + 1 not in stored]
+    if not page_numbers:
+        return JOB_OK
+
+    log.info(f"Uploading {job.name} ({len(page_numbers)} pages)")
+
+    # Parse once, every page comes from the same memory mapped document
+    document = pdf.open_pdf_file(job.data['path'])
+
+    try:
+        # Scored batches go to the single page writer of the scheduler
+        add_magazine_pages(
+            job.magazine_id,
+            pdf.iter_pages(document, page_numbers),
+            lexicon,
+            write_batch=send_output
+        )
+    finally:
+        document.close()
+
+    log.info(f"Uploaded {job.name}")
+
+    return JOB_OK
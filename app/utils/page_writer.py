@@ -0,0 +1,109 @@
+"""
+page_writer.py
+Single writer for the pages produced by the ingestion workers.
+
+SQLite allows one writer at a time. When every worker commits its own page
+batches, the workers queue up on the database lock and may fail with
+"database is locked" when several finish together. Instead, workers only
+parse and score, and send their scored batches to the scheduling process.
+One writer thread there takes every batch that is waiting and commits them
+together in a single transaction (group commit), so the number of commits
+drops as the load goes up.
+"""
+import queue
+import time
+from threading import Thread
+
+from . import database as db
+from .logging import build_logger
+
+log = build_logger(__name__)
+
+# Upper bound of pages committed in one transaction
+GROUP_COMMIT_PAGES = 512
+# Batches waiting to be written before the workers are slowed down
+MAX_QUEUED_BATCHES = 256
+
+
+class PageWriter:
+    """
+    Writes scored page batches from a queue in a background thread.
+
+    Use put() as the output callback of the IngestionScheduler, and flush()
+    before reading back what was written.
+    """
+
+    def __init__(self, group_commit_pages=GROUP_COMMIT_PAGES):
+        self.group_commit_pages = group_commit_pages
+        self.queue = queue.Queue(maxsize=MAX_QUEUED_BATCHES)
+        self.thread = Thread(target=self.run, daemon=True)
+
+        self.pages_written = 0
+        self.commits = 0
+        self.failed_batches = 0
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.queue.put(None)
+        self.thread.join()
+
+    def put(self, batch):
+        self.queue.put(batch)
+
+    def flush(self):
+        """Blocks until every batch put so far has been written."""
+        self.queue.join()
+
+    def run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                self.queue.task_done()
+                return
+
+            # Group every batch that is already waiting into the same commit
+            batches = [batch]
+            pages = len(batch)
+            stop = False
+            while pages < self.group_commit_pages:
+                try:
+                    batch = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if batch is None:
+                    stop = True
+                    break
+
+                batches.append(batch)
+                pages += len(batch)
+
+            self.write(batches, pages)
+
+            for _ in range(len(batches) + stop):
+                self.queue.task_done()
+
+            if stop:
+                return
+
+    def write(self, batches, pages):
+        start = time.time()
+
+        try:
+            db.write_page_batches(batches)
+        except Exception as e:
+            # The pages are missing from their magazine and are retried by
+            # the split-retry of the job, the writer keeps going
+            self.failed_batches += len(batches)
+            log.error(f"Writing {pages} pages failed: {type(e).__name__}: {e}")
+            return
+
+        self.pages_written += pages
+        self.commits += 1
+        log.debug(
+            f"Committed {pages} pages in {len(batches)} batches "
+            f"in {time.time() - start:.3f}s"
+        )
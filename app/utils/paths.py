@@ -0,0 +1,18 @@
+"""
+paths.py
+Location of the files the app keeps between runs.
+"""
+import os
+import sys
+
+
+def data_dir():
+    """
+    Folder the database, the PDF spool and the background callback state
+    are kept in: next to the executable of a packaged app, otherwise the app
+    folder. Unlike the working directory, this does not depend on where the
+    app is started from.
+    """
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(sys.executable)
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -1,48 +1,143 @@
 import hashlib
+import mmap
 import re
+from functools import lru_cache
 from io import BytesIO
 
 import chardet
-import pandas as pd
 from dateutil import parser as pars
-from pdfminer.high_level import extract_pages
+from pdfminer.converter import PDFPageAggregator
 from pdfminer.layout import LAParams, LTChar, LTFigure, LTTextBoxHorizontal
 from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfpage import PDFTextExtractionNotAllowed
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage, PDFTextExtractionNotAllowed
 from pdfminer.pdfparser import PDFParser
 from unidecode import unidecode
 from utils.logging import build_logger
 
-pd.set_option('display.max_colwidth', None)
-
 log = build_logger(__name__)
 
+# Smaller page ranges are not worth the start-up cost of a worker process
+MIN_PAGES_PER_WORKER = 10
+
+
+class ParsedPdf:
+    """
+    A PDF file parsed once. Metadata, extractability, page count and page
+    layouts all come from the same parser and document objects, so the file
+    is not parsed again for every piece of information.
+    """
+
+    def __init__(self, stream: BytesIO):
+        stream.seek(0)
+        self.stream = stream
+        self.parser = PDFParser(stream)
+        self.document = PDFDocument(self.parser)
+        self._page_count = None
+        self._metadata = None
+
+    @property
+    def is_extractable(self):
+        return self.document.is_extractable
+
+    @property
+    def page_count(self):
+        # Counted without keeping the pages, they are created again when laid out
+        if self._page_count is None:
+            self._page_count = sum(1 for _ in PDFPage.create_pages(self.document))
+        return self._page_count
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            self._metadata = decode_metadata(self.document.info)
+        return self._metadata
+
+    def iter_page_layouts(self, page_numbers=None, laparams=None):
+        """
+        Yields the layout of every page, or of the zero-based `page_numbers`,
+        in page order. Pages are created one by one while the page tree is
+        walked, only the page that is laid out is kept.
+        """
+        if page_numbers is not None:
+            page_numbers = set(page_numbers)
+            if not page_numbers:
+                return
+            last_page_number = max(page_numbers)
+
+        resource_manager = PDFResourceManager(caching=True)
+        device = PDFPageAggregator(
+            resource_manager,
+            laparams=laparams or LAParams()
+        )
+        interpreter = PDFPageInterpreter(resource_manager, device)
+
+        for page_number, page in enumerate(PDFPage.create_pages(self.document)):
+            if page_numbers is not None:
+                if page_number > last_page_number:
+                    break
+                if page_number not in page_numbers:
+                    continue
 
-def extract_text_pdf(stream: BytesIO):
-    stream.seek(0)
-    parser = PDFParser(stream)
-    document = PDFDocument(parser)
+            interpreter.process_page(page)
+            yield device.get_result()
+
+    def close(self):
+        self.stream.close()
+
+
+def open_pdf_file(path: str):
+    """
+    Opens a PDF file without reading it into memory. The file is memory
+    mapped, so only the parts the parser reads are loaded, and the operating
+    system shares them between the processes that map the same file.
+    """
+    with open(path, 'rb') as file:
+        stream = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    return ParsedPdf(stream)
 
-    if not document.is_extractable:
+
+def iter_page_texts(pdf: ParsedPdf, page_numbers=None):
+    """
+    Yields the text of every page, or of the zero-based `page_numbers`, in
+    page order. The page ranges of a large PDF are laid out by separate
+    ingestion jobs, see preflight.split_pdf_job.
+    """
+    if not pdf.is_extractable:
         log.error('Unable to extract text.')
         raise PDFTextExtractionNotAllowed
 
-    text_list = []
-    laparams = LAParams()
+    for page_layout in pdf.iter_page_layouts(page_numbers):
+        yield extract_layout_text(page_layout)
+
+
+def split_page_ranges(page_count, workers):
+    """Splits the pages into at most `workers` contiguous, equally sized ranges."""
+    range_count = max(1, min(workers, page_count // MIN_PAGES_PER_WORKER))
+    size, remainder = divmod(page_count, range_count)
+
+    page_ranges = []
+    start = 0
+    for i in range(range_count):
+        end = start + size + (1 if i < remainder else 0)
+        page_ranges.append(range(start, end))
+        start = end
 
-    for page_layout in extract_pages(stream, laparams=laparams):
-        column_text = []
-        for element in page_layout:
-            if isinstance(element, LTTextBoxHorizontal):
-                column_text.append(element.get_text())
+    return page_ranges
 
-            elif isinstance(element, LTFigure):
-                figure_text = process_figure(element)
-                column_text.append(figure_text)
 
-        text_list.append(column_text)
+def extract_layout_text(page_layout):
+    column_text = []
+    for element in page_layout:
+        if isinstance(element, LTTextBoxHorizontal):
+            column_text.append(element.get_text())
 
-    return text_list
+        elif isinstance(element, LTFigure):
+            figure_text = process_figure(element)
+            column_text.append(figure_text)
+
+    return column_text
 
 
 def process_figure(figure):
@@ -111,12 +206,8 @@ def group_words_into_lines(words):
     return lines
 
 
-def extract_metadata_pdf(stream: BytesIO):
-    stream.seek(0)
-    parser = PDFParser(stream)
-
-    document = PDFDocument(parser)
-    metadata = document.info[0]
+def decode_metadata(info):
+    metadata = info[0] if info else {}
 
     final_metadata = {}
 
@@ -147,25 +238,69 @@ def generate_file_hash(stream: BytesIO):
     """Hashes an pdf file """
 
     stream.seek(0)
-    hash = hashlib.md5(stream.read()).hexdigest()
+    hash = hashlib.md5()
+    for chunk in iter(lambda: stream.read(2 ** 20), b''):
+        hash.update(chunk)
 
-    return hash
+    return hash.hexdigest()
 
 
-def extraction(stream: BytesIO):
-    stream.seek(0)
+def iter_pages(pdf: ParsedPdf, page_numbers=None):
+    """
+    Streams the cleaned pages of a PDF one by one as
+    (page number, page text, split text), starting at page number 1.
 
-    df = pd.DataFrame({"Page Text": extract_text_pdf(stream)})
-    df['Page Text'] = df['Page Text'].apply(remove_meta_chars)
-    df['split_text'] = df['Page Text'].apply(split_paragraph).apply(clean_data)
+    `page_numbers` limits the stream to the given zero-based pages, for
+    example the pages that were not stored before a job was interrupted.
+    """
+    if page_numbers is None:
+        page_numbers = range(pdf.page_count)
+    page_numbers = sorted(page_numbers)
 
-    return df
+    page_texts = iter_page_texts(pdf, page_numbers)
+    for page_index, page_text in zip(page_numbers, page_texts):
+        page_text = remove_meta_chars(page_text)
+        yield page_index + 1, page_text, clean_data(split_paragraph(page_text))
+
+
+# Characters removed from every word
+BAD_CHARS_TABLE = str.maketrans('', '', ',.!?:"()')
+NUMERIC_REGEX = re.compile(r'\b\d+\b')
+
+
+@lru_cache(maxsize=2 ** 18)
+def normalise_word(word):
+    """
+    Word level cleaning. Magazines repeat the same words over and over, so
+    the result is memoised per raw word.
+
+    Returns:
+        None if the word has to be removed, otherwise the cleaned word and
+        whether it ends with a hyphen (and has to be merged with the next word).
+    """
+    word = unidecode(word.lower())
+
+    # Remove all numeric words
+    if NUMERIC_REGEX.search(word):
+        return None
+
+    # Remove/skip over words containing 'www' or '@' (to remove website links or emails)
+    if 'www' in word or '@' in word:
+        return None
+
+    # Remove apostrophe from the beginning of the words (bug fix)
+    if word.startswith("'") and not word.endswith("'"):
+        word = word[1:]
+
+    # Remove apostrophe from the end of the words (bug fix)
+    if word.endswith("'") and not word.startswith("'"):
+        word = word[:-1]
+
+    return word.translate(BAD_CHARS_TABLE), word.endswith('-')
 
 
 def clean_data(page_text):
-    bad_chars = (',', '.', '!', '?', ':', '"', '(', ')', '')
     cleaned_page_text = []
-    numeric_regex = re.compile(r'\b\d+\b')
     merge_next_word = False
     next_word = ''
 
@@ -174,31 +309,11 @@ def clean_data(page_text):
 
         # Cleaning separate words
         for word in paragraph:
-
-            # Word level cleaning
-            word = word.lower()
-            word = unidecode(word)
-
-            # Remove all numeric words
-            if numeric_regex.search(word):
+            normalised_word = normalise_word(word)
+            if normalised_word is None:
                 continue
 
-            # Remove/skip over words containing 'www' or '@' (to remove website links or emails)
-            if 'www' in word or '@' in word:
-                continue
-
-            # Remove apostrophe from the beginning of the words (bug fix)
-            if word.startswith("'") and not word.endswith("'"):
-                word = word[1:]
-
-            # Remove apostrophe from the end of the words (bug fix)
-            if word.endswith("'") and not word.startswith("'"):
-                word = word[:-1]
-
-            # Loop over every character in a word to check if it is in bad_chars
-            cleaned_word = ''.join(
-                char for char in word if char not in bad_chars
-            )
+            cleaned_word, ends_with_hyphen = normalised_word
 
             if merge_next_word:
                 # If the current word ends with a hyphen, merge with the current word
@@ -210,14 +325,13 @@ def clean_data(page_text):
                 continue
 
             # If the current word ends with a hyphen, prepare to merge with the next word
-            if word.endswith('-'):
+            if ends_with_hyphen:
                 # Store the word fragment without the hyphen
                 next_word = cleaned_word[:-1]
                 merge_next_word = True
-            else:
-                # Only append non-empty words
-                if cleaned_word:
-                    cleaned_paragraph.append(cleaned_word)
+            # Only append non-empty words
+            elif cleaned_word:
+                cleaned_paragraph.append(cleaned_word)
 
         if cleaned_paragraph:
             cleaned_page_text.append(cleaned_paragraph)
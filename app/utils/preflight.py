@@ -0,0 +1,207 @@
+"""
+preflight.py
+Inspects the queued PDFs before any worker is started.
+
+Reading the hash, the page count and the extractability of a PDF only parses
+its cross-reference table and page tree, which is cheap compared to laying
+out its pages. Duplicates and files that cannot be extracted are rejected
+here instead of after a worker has been started for them. The remaining jobs
+are ordered largest first, so a large magazine does not start last and
+stretch the total processing time, and every job gets a timeout that grows
+with its page count.
+
+Accepted files are registered as a Magazine with their page count before
+they are handed to a worker, the pages and charts leave the magazine out
+until all of its pages are stored. A file that was interrupted earlier is
+resumed with only the pages that were not stored yet.
+
+Large files are split into jobs for contiguous page ranges, which the
+scheduler lays out on different workers at the same time. A worker never
+starts processes of its own, so a terminated worker leaves nothing behind.
+"""
+import time
+from multiprocessing import cpu_count
+
+from . import pdf_processing as pdf
+from .database import (create_magazine, find_magazine, is_completely_stored,
+                       stored_page_numbers)
+from .ingestion import (JOB_DUPLICATE, JOB_REJECTED, IngestionScheduler,
+                        JobResult)
+from .logging import build_logger
+
+log = build_logger(__name__)
+
+# Seconds a job may take: a fixed start-up allowance plus a budget per page
+JOB_TIMEOUT_BASE = 30
+JOB_TIMEOUT_PER_PAGE = 1.5
+
+
+def job_timeout(page_count):
+    return JOB_TIMEOUT_BASE + JOB_TIMEOUT_PER_PAGE * page_count
+
+
+class PreflightJob:
+    """
+    Ingestion of the zero-based `page_numbers` of a PDF into the magazine
+    with id `magazine_id`. Plain and picklable, it is sent to the worker.
+    """
+
+    def __init__(
+        self,
+        name,
+        data,
+        hash,
+        page_count,
+        magazine_id,
+        page_numbers=None,
+        attempt=1
+    ):
+        self.name = name
+        self.data = data
+        self.hash = hash
+        self.page_count = page_count
+        self.magazine_id = magazine_id
+        self.page_numbers = list(
+            range(page_count) if page_numbers is None else page_numbers
+        )
+        self.attempt = attempt
+
+    @property
+    def timeout(self):
+        return job_timeout(len(self.page_numbers))
+
+
+def preflight_pdf(data, queued_hashes):
+    """
+    Inspects one queued PDF.
+
+    Args:
+        data: The spool entry of the queued file.
+        queued_hashes: Hashes of the files accepted earlier in the same queue.
+
+    Returns:
+        PreflightJob if the file should be processed, otherwise a JobResult
+        telling why it was rejected.
+    """
+    start = time.time()
+    name = data['name']
+
+    def reject(status, detail=None):
+        return JobResult(name, status, detail, time.time() - start)
+
+    file_hash = data['hash']
+
+    if file_hash in queued_hashes:
+        return reject(JOB_DUPLICATE)
+
+    # Indexed lookup, duplicates are rejected without opening the file
+    stored = find_magazine(file_hash)
+    if stored is not None:
+        if is_completely_stored(stored):
+            return reject(JOB_DUPLICATE)
+
+        magazine_id, page_count, _ = stored
+
+        done = stored_page_numbers(magazine_id)
+        log.info(f"Resuming {name} after {len(done)} of {page_count} pages")
+
+        return PreflightJob(
+            name,
+            data,
+            file_hash,
+            page_count,
+            magazine_id,
+            [i for i in range(page_count) if i + 1 not in done]
+        )
+
+    try:
+        document = pdf.open_pdf_file(data['path'])
+
+        try:
+            if not document.is_extractable:
+                return reject(JOB_REJECTED, 'Text extraction is not allowed')
+
+            page_count = document.page_count
+            metadata = document.metadata
+        finally:
+            document.close()
+    except Exception as e:
+        return reject(JOB_REJECTED, f"Unreadable PDF: {type(e).__name__}: {e}")
+
+    if page_count == 0:
+        return reject(JOB_REJECTED, 'The PDF has no pages')
+
+    magazine_id = create_magazine(file_hash, metadata, name, page_count)
+
+    return PreflightJob(name, data, file_hash, page_count, magazine_id)
+
+
+def split_pdf_job(job, parts):
+    """
+    Splits `job` into at most `parts` jobs for contiguous ranges of its
+    pages. Ranges are not made smaller than pdf.MIN_PAGES_PER_WORKER pages.
+    """
+    page_ranges = pdf.split_page_ranges(len(job.page_numbers), parts)
+    if len(page_ranges) <= 1:
+        return [job]
+
+    jobs = []
+    for page_range in page_ranges:
+        page_numbers = job.page_numbers[page_range.start:page_range.stop]
+        jobs.append(PreflightJob(
+            f"{job.name} (p. {page_numbers[0] + 1}-{page_numbers[-1] + 1})",
+            job.data,
+            job.hash,
+            job.page_count,
+            job.magazine_id,
+            page_numbers,
+            job.attempt
+        ))
+
+    return jobs
+
+
+def preflight_queue(queue, workers=None):
+    """
+    Inspects every queued PDF.
+
+    Args:
+        queue: The spool entries of the queued files.
+        workers: Number of workers the jobs are run on, defaults to the cpu
+            count. They are spread over the accepted files, a single file
+            can use all of them.
+
+    Returns:
+        tuple: The accepted PreflightJobs ordered by descending number of
+            pages to process, and a JobResult for every rejected file.
+    """
+    accepted = []
+    rejected = []
+    queued_hashes = set()
+
+    for data in queue:
+        result = preflight_pdf(data, queued_hashes)
+
+        if isinstance(result, PreflightJob):
+            queued_hashes.add(result.hash)
+            accepted.append(result)
+        else:
+            IngestionScheduler.log_result(result)
+            rejected.append(result)
+
+    parts = max(1, (workers or cpu_count()) // max(1, len(accepted)))
+    jobs = [
+        range_job
+        for job in accepted
+        for range_job in split_pdf_job(job, parts)
+    ]
+    jobs.sort(key=lambda job: len(job.page_numbers), reverse=True)
+
+    log.info(
+        f"Preflight accepted {len(accepted)} PDFs "
+        f"({sum(len(job.page_numbers) for job in jobs)} pages, "
+        f"{len(jobs)} jobs), "
+        f"rejected {len(rejected)}"
+    )
+
+    return jobs, rejected
@@ -0,0 +1,258 @@
+"""
+recalculation.py
+Recalculates the stored complexity scores after the relevant words have been edited.
+
+Pages are partitioned by id range and scored in a process pool. Results are
+streamed back to the calling process, which writes them in small batches so
+the database is never locked for the whole run. Every written page records
+the Wordlist version it was scored with, so an interrupted run continues with
+the pages that are still outdated when it is started again.
+
+Edits to a few words do not need a full run: the WordOccurrence index tells
+which paragraphs contain an edited word, and only those are rescored.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from os import cpu_count
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from . import database as db
+from .complexity import get_lexicon, paragraph_scores
+from .logging import build_logger
+
+log = build_logger(__name__)
+
+PAGES_PER_PARTITION = 500
+WRITE_BATCH_SIZE = 200
+
+
+def outdated_pages_filter(version):
+    return or_(
+        db.Page.scored_version.is_(None),
+        db.Page.scored_version != version
+    )
+
+
+def partition_outdated_pages(session, version, partition_size=PAGES_PER_PARTITION):
+    """Splits the ids of all outdated pages into (first_id, last_id) ranges."""
+    page_ids = session.scalars(
+        select(db.Page.id)
+        .where(outdated_pages_filter(version))
+        .order_by(db.Page.id)
+    ).all()
+
+    partitions = [
+        (page_ids[i], page_ids[min(i + partition_size, len(page_ids)) - 1])
+        for i in range(0, len(page_ids), partition_size)
+    ]
+
+    return partitions, len(page_ids)
+
+
+def score_partition(lexicon, first_id, last_id):
+    """
+    Scores all outdated pages in an id range, runs inside a worker process.
+
+    Returns:
+        list: A (page id, Paragraph score rows) tuple per page.
+    """
+    with Session(db.DB_ENGINE) as session:
+        page_ids = session.scalars(
+            select(db.Page.id)
+            .where(db.Page.id.between(first_id, last_id))
+            .where(outdated_pages_filter(lexicon.version))
+        ).all()
+        paragraphs = session.execute(
+            select(db.Paragraph.page_id, db.Paragraph.id, db.Paragraph.tokens)
+            .join(db.Page, db.Page.id == db.Paragraph.page_id)
+            .where(db.Page.id.between(first_id, last_id))
+            .where(outdated_pages_filter(lexicon.version))
+        ).all()
+
+    words = db.decode_paragraphs(tokens for _, _, tokens in paragraphs)
+
+    pages = {page_id: [] for page_id in page_ids}
+    for (page_id, paragraph_id, _), paragraph_words in zip(paragraphs, words):
+        pages[page_id].append({
+            'id': paragraph_id,
+            **paragraph_scores(lexicon, paragraph_words)
+        })
+
+    return list(pages.items())
+
+
+def write_scores(pages, version, batch_size=WRITE_BATCH_SIZE):
+    """
+    Writes scored pages in short transactions of at most `batch_size` pages,
+    each page is marked as scored with `version` together with its paragraphs
+    and its score aggregates.
+    """
+    for i in range(0, len(pages), batch_size):
+        batch = pages[i:i + batch_size]
+        paragraphs = [row for _, rows in batch for row in rows]
+        page_ids = [page_id for page_id, _ in batch]
+
+        with Session(db.DB_ENGINE) as session:
+            if paragraphs:
+                session.execute(update(db.Paragraph), paragraphs)
+            session.execute(update(db.Page), [
+                {'id': page_id, 'scored_version': version, **db.page_aggregates(rows)}
+                for page_id, rows in batch
+            ])
+            db.refresh_magazine_summaries(
+                session.connection(),
+                magazines_of_pages(session, page_ids)
+            )
+            session.commit()
+
+
+def magazines_of_pages(session, page_ids):
+    return session.scalars(
+        select(db.Page.magazine_id)
+        .where(db.Page.id.in_(list(page_ids)))
+        .distinct()
+    ).all()
+
+
+def rescore_words(words, previous_version, version=None):
+    """
+    Rescores only the paragraphs containing one of the edited `words`. A word
+    edit can only change the score of a paragraph it occurs in, either as a
+    weighted word or as the antonym in front of one.
+
+    Pages that were up to date with `previous_version` are moved to
+    `version`, the version the edit created, which defaults to the current
+    version. Pages that were already outdated are left for a full
+    recalculation. Rescores run in the background, so a later edit can be
+    stored before the rescore of an earlier one has run. Such an edit
+    increases the current version again, but its words are not rescored here.
+
+    Returns:
+        int: The number of rescored paragraphs.
+    """
+    start = time.time()
+
+    with Session(db.DB_ENGINE) as session:
+        lexicon = get_lexicon(session)
+
+        paragraphs = session.execute(
+            select(db.Paragraph.id, db.Paragraph.page_id, db.Paragraph.tokens)
+            .join(
+                db.WordOccurrence,
+                (db.WordOccurrence.page_id == db.Paragraph.page_id)
+                & (db.WordOccurrence.paragraph_index == db.Paragraph.paragraph_index)
+            )
+            .join(db.Page, db.Page.id == db.Paragraph.page_id)
+            .where(db.WordOccurrence.word.in_(list(words)))
+            .where(db.Page.scored_version == previous_version)
+            .distinct()
+        ).all()
+
+        split_text = db.decode_paragraphs(tokens for _, _, tokens in paragraphs)
+        rows = [
+            {'id': paragraph_id, **paragraph_scores(lexicon, paragraph_words)}
+            for (paragraph_id, _, _), paragraph_words in zip(paragraphs, split_text)
+        ]
+
+        if rows:
+            session.execute(update(db.Paragraph), rows)
+
+            page_ids = {page_id for _, page_id, _ in paragraphs}
+            db.refresh_page_aggregates(session.connection(), page_ids)
+            db.refresh_magazine_summaries(
+                session.connection(),
+                magazines_of_pages(session, page_ids)
+            )
+
+        # The remaining up to date pages do not contain any edited word
+        session.execute(
+            update(db.Page)
+            .where(db.Page.scored_version == previous_version)
+            .values(scored_version=version or lexicon.version)
+        )
+        session.commit()
+
+    log.info(
+        f"Rescored {len(rows)} paragraphs "
+        f"on {len({page_id for _, page_id, _ in paragraphs})} pages "
+        f"for {len(words)} edited words in {time.time() - start:.2f}s"
+    )
+
+    return len(rows)
+
+
+def _init_worker():
+    # Connections inherited from the parent process must not be reused
+    db.dispose_inherited_connections()
+
+
+def log_progress(done, total, elapsed):
+    log.info(
+        f"Recalculated {done}/{total} pages "
+        f"({done / elapsed if elapsed else 0:.0f} pages/s)"
+    )
+
+
+def recalculate_complexity(
+    workers=None,
+    partition_size=PAGES_PER_PARTITION,
+    progress_callback=None
+):
+    """
+    Recalculates the complexity scores of every page that was not scored with
+    the current Wordlist.
+
+    Args:
+        workers: Number of worker processes, defaults to the cpu count.
+        partition_size: Number of pages handed to a worker at once.
+        progress_callback: Called as callback(done, total, elapsed_seconds)
+            after every written partition.
+
+    Returns:
+        int: The number of recalculated pages.
+    """
+    progress_callback = progress_callback or log_progress
+
+    with Session(db.DB_ENGINE) as session:
+        lexicon = get_lexicon(session)
+        partitions, total = partition_outdated_pages(
+            session,
+            lexicon.version,
+            partition_size
+        )
+
+    if not partitions:
+        log.info('All complexity scores are up to date.')
+        return 0
+
+    log.info(
+        f"Recalculating {total} pages in {len(partitions)} partitions "
+        f"(wordlist version {lexicon.version})"
+    )
+
+    start = time.time()
+    done = 0
+
+    if len(partitions) == 1:
+        pages = score_partition(lexicon, *partitions[0])
+        write_scores(pages, lexicon.version)
+        progress_callback(len(pages), total, time.time() - start)
+        return len(pages)
+
+    workers = min(workers or cpu_count() or 1, len(partitions))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        futures = [
+            executor.submit(score_partition, lexicon, first_id, last_id)
+            for first_id, last_id in partitions
+        ]
+
+        for future in as_completed(futures):
+            pages = future.result()
+            write_scores(pages, lexicon.version)
+
+            done += len(pages)
+            progress_callback(done, total, time.time() - start)
+
+    return done
@@ -1,24 +1,16 @@
-import json
-
 import matplotlib.pyplot as plt
+from sqlalchemy import select
 from utils.logging import build_logger
 
-from app.utils.database import Page
+from app.utils.database import MagazineSummary, completely_stored_magazines
 
 log = build_logger(__name__)
 
 def total_complexity_scores_per_magazine(session):
-    pages = session.query(Page).all()
-
-    magazine_complexity_sums = {}
-
-    for page in pages:
-        complexity_scores = json.loads(page.complexity_scores)
-        page_complexity_sum = sum(
-            scores[0] for scores in complexity_scores if scores
-        )
-        magazine_complexity_sums[page.magazine_id] = page_complexity_sum \
-            + magazine_complexity_sums.get(page.magazine_id, 0)
+    magazine_complexity_sums = dict(session.execute(
+        select(MagazineSummary.magazine_id, MagazineSummary.total_score)
+        .where(MagazineSummary.magazine_id.in_(completely_stored_magazines()))
+    ).all())
 
     for magazine_id, complexity_sum in magazine_complexity_sums.items():
         log.info(f"""
@@ -10,7 +10,6 @@ Note:
 - Avoid using the testing browser for casual browsing, as it not updated automaticly.
 """
 
-import base64
 import os
 import sys
 import shutil
@@ -25,6 +24,7 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+from utils import spool
 from utils.logging import build_logger
 
 
@@ -127,7 +127,8 @@ def download_file(driver, url):
 def scrape():
     """
     Main function to set up the driver, collect all target URLs for download,
-    and manage the file downloading process.
+    and manage the file downloading process. The downloaded PDFs are moved
+    into the processing queue, their queue entries are returned.
     """
 
     driver = setup_driver()
@@ -172,11 +173,15 @@ def scrape():
                  for file in os.listdir(OUTPUT_DIR_PATH)
                  if file.endswith('.pdf')]
 
-    pdfs = []
-    for file in pdf_files:
-        with open(f"{OUTPUT_DIR_PATH}{os.sep}{file}", "rb") as binary_file:
-            pdfs.append({"name": file, "content": base64.b64encode(
-                binary_file.read()).decode('utf-8')})
+    # Debug runs keep the downloaded files
+    pdfs = [
+        spool.spool_file(
+            file,
+            f"{OUTPUT_DIR_PATH}{os.sep}{file}",
+            move=not current_app.config['DEBUG']
+        )
+        for file in pdf_files
+    ]
 
     if not current_app.config['DEBUG']:
         shutil.rmtree(OUTPUT_DIR_PATH)
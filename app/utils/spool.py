@@ -0,0 +1,225 @@
+"""
+spool.py
+Disk spool holding the PDFs that are queued for processing.
+
+Uploaded and scraped files are written to the spool directory as raw bytes,
+so the server does not keep their (base64 encoded) content in memory. Every
+queued file is a `<id>.pdf` with a small `<id>.json` manifest next to it,
+holding its name, hash and size. The manifests are the queue: every process
+sees the same queue, and it survives a restart of the app. The outcome of
+the last processing run is kept next to them, for the same reason.
+"""
+import base64
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from .logging import build_logger
+from .paths import data_dir
+
+log = build_logger(__name__)
+
+SPOOL_DIR = os.environ.get('PDF_SPOOL_DIR', os.path.join(data_dir(), 'spool'))
+
+# Bytes hashed and written at once, base64 chunks are a multiple of 4 characters
+CHUNK_SIZE = 2 ** 20
+BASE64_CHUNK_SIZE = CHUNK_SIZE // 3 * 4
+
+RESULTS_FILE = 'results.json'
+
+
+def _pdf_path(entry_id):
+    return os.path.join(SPOOL_DIR, f"{entry_id}.pdf")
+
+
+def _manifest_path(entry_id):
+    return os.path.join(SPOOL_DIR, f"{entry_id}.json")
+
+
+def _write_manifest(entry):
+    manifest = {key: value for key, value in entry.items() if key != 'path'}
+    temporary_path = _manifest_path(entry['id']) + '.tmp'
+
+    with open(temporary_path, 'w') as file:
+        json.dump(manifest, file)
+
+    # The manifest appears last and at once, a listed entry is always complete
+    os.replace(temporary_path, _manifest_path(entry['id']))
+
+
+def _add_entry(entry_id, name, file_hash, size):
+    entry = {
+        'id': entry_id,
+        'name': name,
+        'path': _pdf_path(entry_id),
+        'hash': file_hash,
+        'size': size,
+        'queued': time.time(),
+    }
+    _write_manifest(entry)
+
+    log.info(f"Queued {name} ({size / 2**20:.1f} MiB)")
+
+    return entry
+
+
+def _write_chunks(entry_id, chunks):
+    """Writes and hashes the chunks in one pass, returns (hash, size)."""
+    file_hash = hashlib.md5()
+    size = 0
+
+    with open(_pdf_path(entry_id), 'wb') as file:
+        for chunk in chunks:
+            file_hash.update(chunk)
+            file.write(chunk)
+            size += len(chunk)
+
+    return file_hash.hexdigest(), size
+
+
+def spool_pdf(name, data):
+    """Queues the PDF in `data` (bytes), returns its queue entry."""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    entry_id = uuid.uuid4().hex
+
+    file_hash, size = _write_chunks(
+        entry_id,
+        (data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE))
+    )
+
+    return _add_entry(entry_id, name, file_hash, size)
+
+
+def spool_base64(name, content):
+    """
+    Queues a base64 encoded PDF, returns its queue entry. The content is
+    decoded, hashed and written chunk by chunk, so the decoded file is never
+    held in memory as a whole.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    entry_id = uuid.uuid4().hex
+
+    file_hash, size = _write_chunks(
+        entry_id,
+        (
+            base64.b64decode(content[i:i + BASE64_CHUNK_SIZE])
+            for i in range(0, len(content), BASE64_CHUNK_SIZE)
+        )
+    )
+
+    return _add_entry(entry_id, name, file_hash, size)
+
+
+def spool_file(name, path, move=True):
+    """
+    Moves (or copies) the PDF file at `path` into the queue, returns its
+    queue entry.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    entry_id = uuid.uuid4().hex
+
+    if move:
+        shutil.move(path, _pdf_path(entry_id))
+        file_hash = hash_file(_pdf_path(entry_id))
+        size = os.path.getsize(_pdf_path(entry_id))
+    else:
+        with open(path, 'rb') as file:
+            file_hash, size = _write_chunks(
+                entry_id,
+                iter(lambda: file.read(CHUNK_SIZE), b'')
+            )
+
+    return _add_entry(entry_id, name, file_hash, size)
+
+
+def hash_file(path):
+    file_hash = hashlib.md5()
+
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def queued_pdfs():
+    """Returns the queue entries in the order they were queued."""
+    if not os.path.isdir(SPOOL_DIR):
+        return []
+
+    entries = []
+    for file_name in os.listdir(SPOOL_DIR):
+        if not file_name.endswith('.json') or file_name == RESULTS_FILE:
+            continue
+
+        try:
+            with open(os.path.join(SPOOL_DIR, file_name)) as file:
+                entry = json.load(file)
+        except (OSError, ValueError):
+            # Removed while listing
+            continue
+
+        entry['path'] = _pdf_path(entry['id'])
+        entries.append(entry)
+
+    return sorted(entries, key=lambda entry: entry['queued'])
+
+
+def rename(entry_id, name):
+    with open(_manifest_path(entry_id)) as file:
+        entry = json.load(file)
+
+    entry['name'] = name
+    _write_manifest(entry)
+
+
+def remove(entry_id):
+    """Removes a file from the queue, missing files are ignored."""
+    # Manifest first, so the entry is never listed without its PDF
+    for path in (_manifest_path(entry_id), _pdf_path(entry_id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.error(f"Unable to remove {path} from the spool: {e}")
+
+
+def _result_row(result):
+    return {
+        'name': result.name,
+        'status': result.status,
+        'detail': result.detail or ''
+    }
+
+
+def _write_results(rows):
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    path = os.path.join(SPOOL_DIR, RESULTS_FILE)
+
+    with open(path + '.tmp', 'w') as file:
+        json.dump(rows, file)
+
+    os.replace(path + '.tmp', path)
+
+
+def save_results(results):
+    """Stores the JobResults of a processing run, replacing the previous run."""
+    _write_results([_result_row(result) for result in results])
+
+
+def add_results(results):
+    """Adds JobResults to the stored results of the last run."""
+    _write_results(load_results() + [_result_row(result) for result in results])
+
+
+def load_results():
+    """Returns the stored results as {'name', 'status', 'detail'} rows."""
+    try:
+        with open(os.path.join(SPOOL_DIR, RESULTS_FILE)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
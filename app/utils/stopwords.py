@@ -0,0 +1,32 @@
+"""
+stopwords.py
+Process-wide cache of the stop words stored in the BadWord table.
+
+The words are read once and kept as a frozenset until the bad words editor
+bumps the table's version, so code filtering thousands of pages no longer
+reads the table per page.
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import database as db
+
+_cached_stopwords = None
+_cached_version = None
+
+
+def get_stopwords(session=None):
+    global _cached_stopwords, _cached_version
+
+    if session is None:
+        with Session(db.DB_ENGINE) as session:
+            return get_stopwords(session)
+
+    version = db.get_cache_version(session, db.STOPWORDS_CACHE)
+    if _cached_stopwords is None or _cached_version != version:
+        _cached_stopwords = frozenset(
+            session.scalars(select(db.BadWord.word)).all()
+        )
+        _cached_version = version
+
+    return _cached_stopwords
@@ -4,10 +4,12 @@ import shutil
 import re
 from bertopic import BERTopic
 from hdbscan import HDBSCAN
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from utils import database
 from utils.database import DB_ENGINE
 from utils.logging import build_logger
+from utils.stopwords import get_stopwords
 
 from .topic_utils import remove_stopwords_from_text
 
@@ -25,13 +27,34 @@ def load_and_preprocess_data(model_exists: bool):
         docs: A list of strings ready for BERTopic fitting.
     """
 
-    data = database.get_table_as_df(database.Page)
+    # Only load data with null page_topic if the model already exists
+    where = [database.Page.page_topic.is_(None)] if model_exists else []
+    data = database.read_table(
+        database.Page,
+        ['id'],
+        where=where,
+        order_by=[database.Page.id]
+    )
+    paragraphs = database.read_table(
+        database.Paragraph,
+        ['page_id', 'tokens'],
+        where=[database.Paragraph.page_id.in_(
+            select(database.Page.id).where(*where)
+        )],
+        order_by=[database.Paragraph.page_id, database.Paragraph.paragraph_index]
+    )
 
-    if model_exists:  # Only load data with null page_topic if the model already exists
-        data = data[data['page_topic'].isnull()]
+    pages = {page_id: [] for page_id in data['id'].tolist()}
+    for page_id, tokens in zip(paragraphs['page_id'].tolist(), paragraphs['tokens']):
+        # Pages stored between the two reads are left for the next run,
+        # they have no topic yet
+        if page_id in pages:
+            pages[page_id].append(tokens)
+    data['tokenized_text'] = list(pages.values())
 
+    stopwords = get_stopwords()
     data['tokenized_text'] = data['tokenized_text']\
-        .apply(eval).apply(remove_stopwords_from_text)
+        .apply(remove_stopwords_from_text, stopwords=stopwords)
     docs = [' '.join(doc) for doc in data['tokenized_text']]
     return data, docs
 
@@ -1,37 +1,36 @@
-import json
 import os
 import shutil
 import re
 from umap import UMAP
 from bertopic import BERTopic
 from hdbscan import HDBSCAN
-from pandas import DataFrame
+from sqlalchemy import update
 from sqlalchemy.orm import Session
-from utils.database import DB_ENGINE, Page, get_table_as_df
+from utils.database import DB_ENGINE, Paragraph, read_table
 from utils.logging import build_logger
+from utils.stopwords import get_stopwords
 
 from .topic_utils import remove_stopwords_from_text
 
 log = build_logger(__name__)
 
+PARAGRAPH_CHUNK_SIZE = 5000
 
-def load_and_run_par_model(data):
+
+def load_and_run_par_model():
     """
-    Loads a pre-trained model, transforms paragraph data, and labels topics.
+    Loads the pre-trained paragraph model.
     """
     log.info('load & run paragraph model')
-    data = data[data['par_topics'].isnull()]
-    return BERTopic.load('models/paragraph_model'), parse_str_data(data), data
+    return BERTopic.load('models/paragraph_model')
 
 
-def train_and_run_par_model(data: DataFrame):
+def train_and_run_par_model(str_data):
     """
-    Trains a new model, transforms paragraph data, and labels topics.
+    Trains a new model on the paragraph data.
     """
     log.info('running paragraph model')
 
-    str_data = parse_str_data(data)
-
     hdbscan_model = HDBSCAN(
         min_cluster_size=60,
         prediction_data=True
@@ -53,56 +52,59 @@ def train_and_run_par_model(data: DataFrame):
         serialization="safetensors"
     )
 
-    return topic_model, str_data
+    return topic_model
 
 
-def results_par(data: DataFrame, topic_label, topics):
+def results_par(paragraph_ids, topic_label):
     """
-    This function handles paragraph-level topic labeling and database updates.
+    This function stores the topic label of every paragraph.
     """
-    total_paragraphs = sum(
-        len(row['tokenized_text']) for _, row in data.iterrows()
-    )
-    if len(topics) < total_paragraphs:
+    if len(topic_label) < len(paragraph_ids):
         raise ValueError("topic & paragraph index not matching")
 
     with Session(DB_ENGINE) as session:
-        topic_idx = 0
-        for _, row in data.iterrows():
-            row_list = []
-            for _ in row['tokenized_text']:
-                row_list.append(topic_label[topic_idx])
-                topic_idx += 1
-
-            stored_page = (
-                session
-                .query(Page)
-                .filter_by(id=row['id'])
-                .first()
-            )
-            if stored_page:
-                stored_page.par_topics = json.dumps(row_list)
-
+        session.execute(
+            update(Paragraph),
+            [
+                {'id': paragraph_id, 'topic': label}
+                for paragraph_id, label in zip(paragraph_ids, topic_label)
+            ]
+        )
         session.commit()
 
 
-def parse_str_data(data: DataFrame):
-    return [par for row in data['tokenized_text'] for par in row]
-
-
 def run(override_existing: bool = False):
     """
     Main function to orchestrate topic modeling process for paragraphs.
     """
-    data = get_table_as_df(Page)
-
-    data['tokenized_text'] = \
-        data['tokenized_text'].apply(eval).apply(remove_stopwords_from_text)
-
-    if os.path.exists('models/paragraph_model') and not override_existing:
-        topic_model, str_data, data = load_and_run_par_model(data)
+    model_exists = (
+        os.path.exists('models/paragraph_model') and not override_existing
+    )
+    # Only the paragraphs without a topic are labeled by an existing model
+    paragraph_ids = []
+    str_data = []
+    stopwords = get_stopwords()
+    for paragraphs in read_table(
+        Paragraph,
+        ['id', 'tokens'],
+        where=[Paragraph.topic.is_(None)] if model_exists else [],
+        order_by=[Paragraph.page_id, Paragraph.paragraph_index],
+        chunksize=PARAGRAPH_CHUNK_SIZE
+    ):
+        # Only the cleaned text of a chunk is kept, not its word lists
+        paragraph_ids.extend(paragraphs['id'].tolist())
+        str_data.extend(
+            remove_stopwords_from_text(paragraphs['tokens'], stopwords=stopwords)
+        )
+
+    if not paragraph_ids:
+        log.info('No paragraphs to label.')
+        return
+
+    if model_exists:
+        topic_model = load_and_run_par_model()
     else:
-        topic_model, str_data = train_and_run_par_model(data)
+        topic_model = train_and_run_par_model(str_data)
 
     topics, __ = topic_model.transform(str_data)
 
@@ -120,4 +122,4 @@ def run(override_existing: bool = False):
 
     log.info(f'Topics generated: {len(set(topic_label))}')
 
-    results_par(data, topic_label, topics)
+    results_par(paragraph_ids, topic_label)
@@ -1,9 +1,10 @@
 
-from utils.database import BadWord, get_table_as_df
+from utils.stopwords import get_stopwords
 
 
-def remove_stopwords_from_text(text):
-    stopwords = set(get_table_as_df(BadWord)['word'].to_list())
+def remove_stopwords_from_text(text, stopwords=None):
+    if stopwords is None:
+        stopwords = get_stopwords()
 
     return [
         ' '.join([
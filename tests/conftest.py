@@ -0,0 +1,82 @@
+import os
+import sys
+
+import pytest
+
+# The app modules import each other from the app folder, as when the app runs
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app'))
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """
+    Points the database module at an empty database file of the test, and
+    drops the caches that were filled from another database.
+    """
+    from utils import complexity
+    from utils import database as db
+    from utils import stopwords
+
+    path = str(tmp_path / 'bigdata.db')
+    engine = db.create_db_engine(path)
+    read_engine = db.create_db_engine(path, read_only=True)
+
+    monkeypatch.setattr(db, 'DB_ENGINE', engine)
+    monkeypatch.setattr(db, 'DB_READ_ENGINE', read_engine)
+    monkeypatch.setattr(db, '_vocabulary', None)
+    monkeypatch.setattr(complexity, '_cached_lexicon', None)
+    monkeypatch.setattr(stopwords, '_cached_stopwords', None)
+
+    yield engine
+
+    read_engine.dispose()
+    engine.dispose()
+
+
+# (word, type, weight) rows of the Wordlist of the `database` fixture
+WORDLIST = [
+    ('complex', '2', 2),
+    ('systeem', '2', 1),
+    ('simpel', '1', 1),
+    ('oorzaak', '1', 3),
+    ('niet', '3', None),
+]
+
+
+@pytest.fixture
+def database(engine):
+    """A database file with the current schema and a small Wordlist."""
+    from sqlalchemy.orm import Session
+    from utils import database as db
+
+    db.upgrade_schema(engine)
+    with Session(engine) as session:
+        session.add_all(
+            db.WordObject(word=word, type=word_type, weight=weight)
+            for word, word_type, weight in WORDLIST
+        )
+        session.commit()
+
+    return engine
+
+
+@pytest.fixture
+def store_magazine(database):
+    """
+    Stores a magazine from a list of pages of paragraphs of words, and
+    returns its id.
+    """
+    from utils import database as db
+
+    def store(name, pages):
+        return db.add_magazine(
+            [
+                (page_number, [' '.join(words) for words in page], page)
+                for page_number, page in enumerate(pages, start=1)
+            ],
+            name,
+            {},
+            name
+        )
+
+    return store
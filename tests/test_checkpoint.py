@@ -0,0 +1,167 @@
+import pytest
+from benchmarks.corpus import generate_pdf
+from utils import database as db
+from utils import ingestion_worker, spool
+from utils.checkpoint import MAX_ATTEMPTS, plan_retries, split_job
+from utils.ingestion import (JOB_DUPLICATE, JOB_FAILED, JOB_OK, JOB_REJECTED,
+                             JOB_TIMED_OUT, JobResult)
+from utils.preflight import PreflightJob, preflight_pdf
+
+PAGE_COUNT = 6
+
+
+@pytest.fixture
+def magazine(database):
+    """A registered magazine of PAGE_COUNT pages without stored pages."""
+    return db.create_magazine('hash', {}, 'magazine.pdf', PAGE_COUNT)
+
+
+def store_pages(magazine_id, page_numbers):
+    """Stores the given one-based pages of a magazine."""
+    db.add_magazine_pages(magazine_id, [
+        (page_number, [f'pagina {page_number}'], [['pagina', 'complex']])
+        for page_number in page_numbers
+    ])
+
+
+def make_job(magazine_id, page_numbers=None, attempt=1):
+    return PreflightJob(
+        'magazine.pdf',
+        {'name': 'magazine.pdf'},
+        'hash',
+        PAGE_COUNT,
+        magazine_id,
+        page_numbers,
+        attempt
+    )
+
+
+def test_split_job():
+    job = make_job(1, attempt=2)
+
+    sub_jobs = split_job(job, [0, 1, 3, 4, 5, 7, 8, 9, 11, 12], parts=4)
+
+    assert [sub_job.page_numbers for sub_job in sub_jobs] == [
+        [0, 1, 3], [4, 5, 7], [8, 9, 11], [12]
+    ]
+    assert [sub_job.name for sub_job in sub_jobs] == [
+        'magazine.pdf (p. 1-4)',
+        'magazine.pdf (p. 5-8)',
+        'magazine.pdf (p. 9-12)',
+        'magazine.pdf (p. 13-13)',
+    ]
+    for sub_job in sub_jobs:
+        assert sub_job.attempt == 3
+        assert (sub_job.magazine_id, sub_job.page_count) == (1, PAGE_COUNT)
+        assert sub_job.timeout < job.timeout
+
+
+def test_interrupted_job_is_retried_with_its_missing_pages(magazine):
+    store_pages(magazine, [1, 2, 4])
+    job = make_job(magazine)
+
+    retries, finished = plan_retries([
+        JobResult(job.name, JOB_TIMED_OUT, 'Timed out', 10, (job, None))
+    ])
+
+    assert finished == []
+    assert [retry.page_numbers for retry in retries] == [[2], [4], [5]]
+    assert {retry.attempt for retry in retries} == {2}
+
+
+def test_retries_are_ordered_largest_first(database):
+    small = db.create_magazine('small', {}, 'small.pdf', 2)
+    large = db.create_magazine('large', {}, 'large.pdf', 12)
+    small_job = make_job(small, [0, 1])
+    large_job = make_job(large, list(range(12)))
+
+    retries, _ = plan_retries([
+        JobResult('small.pdf', JOB_TIMED_OUT, job=(small_job, None)),
+        JobResult('large.pdf', JOB_TIMED_OUT, job=(large_job, None)),
+    ])
+
+    assert [len(retry.page_numbers) for retry in retries] == [3, 3, 3, 3, 1, 1]
+
+
+def test_job_with_all_pages_committed_is_done(magazine):
+    store_pages(magazine, range(1, PAGE_COUNT + 1))
+    job = make_job(magazine)
+
+    retries, finished = plan_retries([
+        JobResult(job.name, JOB_TIMED_OUT, 'Timed out', 10, (job, None))
+    ])
+
+    assert retries == []
+    assert [result.status for result in finished] == [JOB_OK]
+
+
+def test_finished_job_with_missing_pages_is_retried(magazine):
+    store_pages(magazine, [1, 2, 3])
+    job = make_job(magazine, [0, 1, 2, 3])
+
+    retries, finished = plan_retries([JobResult(job.name, JOB_OK, job=(job, None))])
+
+    assert finished == []
+    assert [retry.page_numbers for retry in retries] == [[3]]
+
+
+def test_job_is_given_up_after_the_last_attempt(magazine):
+    store_pages(magazine, [1])
+    job = make_job(magazine, [1, 2], attempt=MAX_ATTEMPTS)
+
+    retries, finished = plan_retries([
+        JobResult(job.name, JOB_TIMED_OUT, 'Timed out', 10, (job, None)),
+        JobResult(job.name, JOB_OK, job=(job, None)),
+    ])
+
+    assert retries == []
+    assert [(result.status, result.detail) for result in finished] == [
+        (JOB_TIMED_OUT, f'Timed out, 2 pages were not stored after {MAX_ATTEMPTS} attempts'),
+        (JOB_FAILED, f'Writing pages failed, 2 pages were not stored after {MAX_ATTEMPTS} attempts'),
+    ]
+
+
+@pytest.mark.parametrize('status', [JOB_FAILED, JOB_REJECTED, JOB_DUPLICATE])
+def test_other_results_are_final(magazine, status):
+    job = make_job(magazine)
+    results = [
+        JobResult(job.name, status, job=(job, None)),
+        # Rejected by the preflight, never run
+        JobResult('rejected.pdf', status),
+    ]
+
+    assert plan_retries(results) == ([], results)
+
+
+def test_interrupted_pdf_is_resumed_with_its_missing_pages(
+    database,
+    tmp_path,
+    monkeypatch
+):
+    monkeypatch.setattr(spool, 'SPOOL_DIR', str(tmp_path / 'spool'))
+    # Batches are written directly instead of through the scheduler
+    monkeypatch.setattr(ingestion_worker, 'send_output', db.write_page_batch)
+    monkeypatch.setattr(db, 'PAGE_BATCH_SIZE', 2)
+    entry = spool.spool_pdf('magazine.pdf', generate_pdf(pages=PAGE_COUNT))
+
+    job = preflight_pdf(entry, set())
+    assert job.page_numbers == list(range(PAGE_COUNT))
+
+    # The first attempt only got to commit some of its pages
+    job.page_numbers = [0, 1, 4]
+    ingestion_worker.upload_pdf_job(job)
+    assert not db.magazine_is_stored(entry['hash'])
+
+    resumed = preflight_pdf(entry, set())
+    assert resumed.magazine_id == job.magazine_id
+    assert resumed.page_numbers == [2, 3, 5]
+
+    # Pages committed meanwhile are skipped by the worker as well
+    store_pages(job.magazine_id, [3])
+    ingestion_worker.upload_pdf_job(resumed)
+
+    assert db.magazine_is_stored(entry['hash'])
+    assert sorted(db.stored_page_numbers(job.magazine_id)) == list(
+        range(1, PAGE_COUNT + 1)
+    )
+    assert preflight_pdf(entry, set()).status == JOB_DUPLICATE
@@ -0,0 +1,66 @@
+"""
+Golden output of pdf_processing.clean_data, recorded with the previous
+character-by-character implementation. Its throughput is measured by
+benchmarks/clean_data_benchmark.py.
+"""
+import pytest
+from utils import pdf_processing as pdf
+
+# Words that exercise every cleaning rule
+EDGE_CASE_WORDS = [
+    'Fysiotherapie', 'ÉÉN', 'café', 'Straße', 'ﬁbromyalgie', 'İstanbul',
+    '2024', '12,5%', 'p.1', 'a1', 'covid-19', '(n=42)', 'www.kngf.nl',
+    'info@kngf.nl', "'citaat", "citaat'", "'citaat'", "'", "''", "patiënt's",
+    'be-', 'handeling', 'zelf-', 'management-', 'plan', '-', 'x', 'y-', 'z',
+    'e.g.', '"Complex"', 'vraag?', 'ja!', 'dit:', '(zie', 'ook)', '...', '',
+    'rug-', '', 'klachten', 'niet-', '2-', 'lineair', 'multi-', "'factorieel",
+]
+
+EDGE_CASE_OUTPUT = [
+    'fysiotherapie', 'een', 'cafe', 'strasse', 'fibromyalgie', 'istanbul',
+    'a1', 'citaat', 'citaat', "'citaat'", "''", "patient's", 'behandeling',
+    'zelfmanagementplan', 'yz', 'eg', 'complex', 'vraag', 'ja', 'dit', 'zie',
+    'ook', 'rug', 'klachten', 'nietlineair', 'multifactorieel',
+]
+
+REVERSED_EDGE_CASE_OUTPUT = [
+    'factorieel', 'multilineair', 'nietklachten', 'rug', 'ook', 'zie', 'dit',
+    'ja', 'vraag', 'complex', 'eg', 'yx', 'plan', 'managementzelfhandeling',
+    "bepatient's", "''", "'citaat'", 'citaat', 'citaat', 'a1', 'istanbul',
+    'fibromyalgie', 'strasse', 'cafe', 'een', 'fysiotherapie',
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_word_cache():
+    # Words memoised by an earlier test would hide a difference
+    pdf.normalise_word.cache_clear()
+
+
+def test_edge_cases():
+    assert pdf.clean_data([EDGE_CASE_WORDS]) == [EDGE_CASE_OUTPUT]
+
+
+def test_edge_cases_reversed():
+    assert pdf.clean_data([EDGE_CASE_WORDS[::-1]]) == [REVERSED_EDGE_CASE_OUTPUT]
+
+
+def test_memoised_words():
+    pdf.clean_data([EDGE_CASE_WORDS])
+
+    assert pdf.clean_data([EDGE_CASE_WORDS]) == [EDGE_CASE_OUTPUT]
+
+
+@pytest.mark.parametrize('page_text, expected', [
+    # A hyphenated word is merged with the first word of the next paragraph
+    ([['rug-'], ['klachten', 'x']], [['rugklachten']]),
+    (
+        [['Multi-', 'factorieel', 'niet-'], ['2-', 'lineair']],
+        [['multifactorieel'], ['nietlineair']]
+    ),
+    # Paragraphs without any word left are dropped
+    ([['2024', 'www.kngf.nl', 'x'], ['Rug', 'A']], [['rug']]),
+    ([], []),
+])
+def test_paragraphs(page_text, expected):
+    assert pdf.clean_data(page_text) == expected
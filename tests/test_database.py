@@ -0,0 +1,156 @@
+import json
+
+from sqlalchemy import func, insert, select, text
+from utils import database as db
+
+# Schema of the versions before Page had a page number, with the
+# paragraphs as JSON lists in the Page row
+LEGACY_SCHEMA = [
+    'CREATE TABLE "Magazine" (id INTEGER PRIMARY KEY, name VARCHAR, '
+    'hash VARCHAR, creation_date DATETIME)',
+    'CREATE TABLE "Page" (id INTEGER PRIMARY KEY, magazine_id INTEGER '
+    'REFERENCES "Magazine" (id), raw_text TEXT, page_text TEXT, '
+    'tokenized_text TEXT, complexity_scores TEXT, page_topic TEXT, '
+    'par_topics TEXT)',
+    'CREATE TABLE "Wordlist" (id INTEGER PRIMARY KEY, word VARCHAR UNIQUE, '
+    'type VARCHAR, weight INTEGER)',
+    'CREATE TABLE "BadWord" (id INTEGER PRIMARY KEY, word VARCHAR UNIQUE)',
+]
+
+
+def create_legacy_database(engine, magazine_pages):
+    """Stores `magazine_pages`, (magazine id, paragraphs) tuples, in order."""
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.execute(text(statement))
+
+        connection.execute(text(
+            'INSERT INTO "Wordlist" (word, type, weight) '
+            "VALUES ('complex', '2', 2), ('simpel', '1', 1)"
+        ))
+        connection.execute(text('INSERT INTO "BadWord" (word) VALUES (\'de\')'))
+        for magazine_id in sorted({magazine_id for magazine_id, _ in magazine_pages}):
+            connection.execute(
+                text('INSERT INTO "Magazine" (id, name) VALUES (:id, :name)'),
+                {'id': magazine_id, 'name': f'magazine {magazine_id}.pdf'}
+            )
+        for magazine_id, paragraphs in magazine_pages:
+            connection.execute(
+                text(
+                    'INSERT INTO "Page" (magazine_id, raw_text, page_text, '
+                    'tokenized_text, complexity_scores) '
+                    'VALUES (:magazine_id, :raw_text, :page_text, :page_text, '
+                    "'[]')"
+                ),
+                {
+                    'magazine_id': magazine_id,
+                    'raw_text': json.dumps([' '.join(p) for p in paragraphs]),
+                    'page_text': json.dumps(paragraphs),
+                }
+            )
+
+
+def test_legacy_pages_are_numbered_in_order(engine):
+    create_legacy_database(engine, [
+        (1, [['eerste', 'complex']]),
+        (2, [['andere', 'simpel']]),
+        (1, [['tweede', 'simpel'], ['nog', 'complex']]),
+        (2, [['laatste', 'complex']]),
+        (1, [['derde', 'complex']]),
+    ])
+
+    db.init_db(debug=False)
+
+    pages = db.read_table(
+        db.Page,
+        columns=['id', 'magazine_id', 'page_number'],
+        order_by=[db.Page.id]
+    )
+    assert pages['magazine_id'].tolist() == [1, 2, 1, 2, 1]
+    assert pages['page_number'].tolist() == [1, 1, 2, 2, 3]
+
+    assert db.page_paragraphs(1, 2) == [
+        (['tweede', 'simpel'], None),
+        (['nog', 'complex'], None),
+    ]
+    assert db.page_paragraphs(2, 1) == [(['andere', 'simpel'], None)]
+    assert [
+        (magazine_id, page_number, total)
+        for magazine_id, page_number, total, _, _ in db.page_complexity([1, 2])
+    ] == [(1, 1, 2), (1, 2, 1), (1, 3, 2), (2, 1, -1), (2, 2, 2)]
+
+
+def test_numbering_pages_is_resumed_and_keeps_numbered_pages(database):
+    with database.begin() as connection:
+        connection.execute(insert(db.Magazine), [{'id': 1}, {'id': 2}])
+        connection.execute(insert(db.Page), [
+            {'magazine_id': 1, 'page_number': 1},
+            {'magazine_id': 1, 'page_number': 2},
+            {'magazine_id': 2, 'page_number': None},
+            {'magazine_id': 2, 'page_number': None},
+            # A page without a magazine is left alone
+            {'magazine_id': None, 'page_number': None},
+        ])
+
+    assert db.migrate_page_numbers() == 2
+    assert db.migrate_page_numbers() == 0
+
+    with database.connect() as connection:
+        assert connection.execute(
+            select(db.Page.magazine_id, db.Page.page_number).order_by(db.Page.id)
+        ).all() == [(1, 1), (1, 2), (2, 1), (2, 2), (None, None)]
+
+
+
+def magazine_page_ids(connection, magazine_id):
+    return connection.execute(
+        select(db.Page.id).where(db.Page.magazine_id == magazine_id)
+    ).scalars().all()
+
+
+def row_counts(connection, magazine_id, page_ids):
+    """
+    Returns the number of rows stored for a magazine per table, the rows of
+    its pages are found by the `page_ids` it had when they were read.
+    """
+    return {
+        table.__tablename__: connection.execute(
+            select(func.count()).select_from(table).where(where)
+        ).scalar()
+        for table, where in [
+            (db.Magazine, db.Magazine.id == magazine_id),
+            (db.Page, db.Page.magazine_id == magazine_id),
+            (db.Paragraph, db.Paragraph.page_id.in_(page_ids)),
+            (db.WordOccurrence, db.WordOccurrence.page_id.in_(page_ids)),
+            (db.MagazineSummary, db.MagazineSummary.magazine_id == magazine_id),
+        ]
+    }
+
+
+def test_delete_magazines_leaves_no_rows_behind(database, store_magazine):
+    deleted = store_magazine('deleted.pdf', [
+        [['een', 'complex', 'systeem'], ['niet', 'simpel']],
+        [['oorzaak', 'en', 'gevolg']],
+    ])
+    kept = store_magazine('kept.pdf', [
+        [['simpel', 'systeem']],
+        [['complex'], ['niet', 'oorzaak', 'complex']],
+    ])
+
+    with database.connect() as connection:
+        deleted_pages = magazine_page_ids(connection, deleted)
+        kept_pages = magazine_page_ids(connection, kept)
+        assert all(row_counts(connection, deleted, deleted_pages).values())
+        kept_before = row_counts(connection, kept, kept_pages)
+
+    with database.begin() as connection:
+        db.delete_magazines(connection, [deleted])
+
+    with database.connect() as connection:
+        assert set(row_counts(connection, deleted, deleted_pages).values()) == {0}
+        assert row_counts(connection, kept, kept_pages) == kept_before
+
+    assert db.page_paragraphs(kept, 2) == [
+        (['complex'], None),
+        (['niet', 'oorzaak', 'complex'], None),
+    ]
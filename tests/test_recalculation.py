@@ -0,0 +1,115 @@
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from utils import database as db
+from utils.recalculation import recalculate_complexity, rescore_words
+
+PAGES = [
+    [['een', 'complex', 'systeem'], ['niet', 'simpel', 'en', 'complex']],
+    [['geen', 'oorzaak', 'zonder', 'systeem'], ['alleen', 'woorden']],
+    [['niet', 'complex'], ['simpel', 'simpel', 'geen', 'complex']],
+]
+
+
+def stored_scores(engine):
+    """Returns the paragraph scores, page aggregates and magazine summaries."""
+    with engine.connect() as connection:
+        return (
+            connection.execute(
+                select(
+                    db.Paragraph.id,
+                    db.Paragraph.score,
+                    db.Paragraph.complex_score,
+                    db.Paragraph.reductionistic_score
+                ).order_by(db.Paragraph.id)
+            ).all(),
+            connection.execute(
+                select(
+                    db.Page.id,
+                    db.Page.total_score,
+                    db.Page.positive_score,
+                    db.Page.negative_score,
+                    db.Page.paragraph_count
+                ).order_by(db.Page.id)
+            ).all(),
+            connection.execute(
+                select(db.MagazineSummary).order_by(db.MagazineSummary.magazine_id)
+            ).all(),
+        )
+
+
+def edit_words(engine, edits):
+    """
+    Applies {word: {column: value}} edits to the Wordlist as the words page
+    does, and returns the edited words with the version before and after.
+    """
+    edited_words = set(edits)
+
+    with Session(engine) as session:
+        previous_version = db.get_cache_version(session, db.WORDLIST_CACHE)
+        for word, values in edits.items():
+            word_object = session.scalars(
+                select(db.WordObject).where(db.WordObject.word == word)
+            ).one()
+            for column, value in values.items():
+                setattr(word_object, column, value)
+            edited_words.add(word_object.word)
+
+        version = db.bump_cache_version(session, db.WORDLIST_CACHE)
+        session.commit()
+
+    return edited_words, previous_version, version
+
+
+@pytest.mark.parametrize('edits', [
+    # A weight change
+    {'complex': {'weight': 5}},
+    # An antonym renamed, paragraphs with the old and the new word change
+    {'niet': {'word': 'geen'}},
+    # Both at once, and a word that becomes reductionistic
+    {'complex': {'weight': 4}, 'niet': {'word': 'geen'}, 'systeem': {'type': '1'}},
+])
+def test_rescore_words_matches_full_recalculation(database, store_magazine, edits):
+    store_magazine('eerste.pdf', PAGES)
+    store_magazine('tweede.pdf', PAGES[::-1])
+    before = stored_scores(database)
+
+    words, previous_version, version = edit_words(database, edits)
+    assert rescore_words(words, previous_version, version) > 0
+
+    rescored = stored_scores(database)
+    assert rescored != before
+
+    # Every page is up to date, a full recalculation has nothing left to do
+    assert recalculate_complexity(workers=1) == 0
+
+    with database.begin() as connection:
+        connection.execute(update(db.Page).values(scored_version=None))
+    assert recalculate_complexity(workers=1) == 2 * len(PAGES)
+
+    assert stored_scores(database) == rescored
+
+
+def test_rescore_words_leaves_outdated_pages_for_full_recalculation(
+    database,
+    store_magazine
+):
+    store_magazine('eerste.pdf', PAGES)
+
+    words, previous_version, version = edit_words(
+        database,
+        {'complex': {'weight': 5}}
+    )
+    # A page that was already outdated when the edit was made
+    with database.begin() as connection:
+        connection.execute(
+            update(db.Page).where(db.Page.page_number == 1).values(scored_version=None)
+        )
+
+    rescore_words(words, previous_version, version)
+
+    with database.connect() as connection:
+        assert connection.execute(
+            select(db.Page.page_number, db.Page.scored_version)
+            .order_by(db.Page.page_number)
+        ).all() == [(1, None), (2, version), (3, version)]
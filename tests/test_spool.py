@@ -0,0 +1,82 @@
+import base64
+import hashlib
+import os
+
+import pytest
+from utils import spool
+from utils.ingestion import JOB_FAILED, JOB_OK, JobResult
+
+
+@pytest.fixture(autouse=True)
+def spool_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / 'spool')
+    monkeypatch.setattr(spool, 'SPOOL_DIR', path)
+    return path
+
+
+# Larger than a chunk, so the files are written in several chunks
+DATA = bytes(range(256)) * (spool.CHUNK_SIZE // 256 * 2 + 3)
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+def test_spooled_files_are_queued_in_order(tmp_path):
+    source = tmp_path / 'bestand.pdf'
+    source.write_bytes(DATA)
+
+    entries = [
+        spool.spool_pdf('bytes.pdf', DATA),
+        spool.spool_base64('base64.pdf', base64.b64encode(DATA).decode()),
+        spool.spool_file('copied.pdf', str(source), move=False),
+        spool.spool_file('moved.pdf', str(source)),
+    ]
+
+    assert not source.exists()
+    assert spool.queued_pdfs() == entries
+    for entry in entries:
+        assert entry['hash'] == hashlib.md5(DATA).hexdigest()
+        assert entry['size'] == len(DATA)
+        assert read(entry['path']) == DATA
+
+
+def test_rename_and_remove():
+    first = spool.spool_pdf('eerste.pdf', b'%PDF-1')
+    second = spool.spool_pdf('tweede.pdf', b'%PDF-2')
+
+    spool.rename(first['id'], 'hernoemd.pdf')
+    spool.remove(second['id'])
+    # Removing a file that is no longer queued is ignored
+    spool.remove(second['id'])
+
+    assert [entry['name'] for entry in spool.queued_pdfs()] == ['hernoemd.pdf']
+    assert not os.path.exists(second['path'])
+
+
+def test_incomplete_manifests_are_not_listed(spool_dir):
+    entry = spool.spool_pdf('eerste.pdf', b'%PDF-1')
+
+    # A manifest that is still being written, and an unreadable one
+    with open(os.path.join(spool_dir, 'half.json.tmp'), 'w') as file:
+        file.write('{"id": "half"')
+    with open(os.path.join(spool_dir, 'broken.json'), 'w') as file:
+        file.write('{"id": ')
+
+    assert spool.queued_pdfs() == [entry]
+
+
+def test_results_of_the_last_run():
+    assert spool.load_results() == []
+
+    spool.save_results([JobResult('oud.pdf', JOB_FAILED, 'kapot')])
+    spool.save_results([JobResult('eerste.pdf', JOB_OK)])
+    spool.add_results([JobResult('tweede.pdf', JOB_FAILED, 'kapot')])
+
+    assert spool.load_results() == [
+        {'name': 'eerste.pdf', 'status': JOB_OK, 'detail': ''},
+        {'name': 'tweede.pdf', 'status': JOB_FAILED, 'detail': 'kapot'},
+    ]
+    # The results file is not a queued PDF
+    assert spool.queued_pdfs() == []